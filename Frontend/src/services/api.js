@@ -4,6 +4,8 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
 export const apiClient = axios.create({
   baseURL: API_BASE_URL,
+  // Sends back the API's short-lived read-after-write cookie (primary_pin).
+  withCredentials: true,
 })
 
 export const setAuthHeader = (token) => {
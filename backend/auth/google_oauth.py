@@ -1,19 +1,140 @@
-from typing import Any, Dict
+import asyncio
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
 
 import httpx
 from fastapi import HTTPException, status
+from jose import JWTError, jwt
 
 from utils.settings import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
 GOOGLE_TOKEN_INFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
 
+_http_client: Optional[httpx.AsyncClient] = None
 
-async def verify_google_token(id_token: str) -> Dict[str, Any]:
-    """Validate a Google ID token and return the payload."""
+
+class JWKSUnavailable(Exception):
+    """Raised when signing keys cannot be fetched, so the caller may fall back."""
+
+
+async def start_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Create the shared client used for Google calls; called from app startup."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=10, transport=transport)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    return _http_client if _http_client is not None else await start_http_client()
+
+
+class JWKSCache:
+    """Google signing keys held in memory until their Cache-Control max-age expires.
+
+    Keys come from ``url`` or, for tests and offline environments, a local JWKS
+    ``path``. An unknown ``kid`` forces a refresh at most once per
+    ``min_refresh_seconds`` so forged tokens cannot hammer the key endpoint.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        path: Optional[str] = None,
+        default_ttl_seconds: int = 3600,
+        min_refresh_seconds: int = 60,
+    ):
+        self.url = url
+        self.path = path
+        self.default_ttl_seconds = default_ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        if now >= self._expires_at or (kid not in self._keys and now - self._fetched_at >= self.min_refresh_seconds):
+            async with self._lock:
+                # Another request may have refreshed while we waited for the lock.
+                now = time.monotonic()
+                if now >= self._expires_at or (
+                    kid not in self._keys and now - self._fetched_at >= self.min_refresh_seconds
+                ):
+                    await self.refresh()
+        return self._keys.get(kid)
+
+    async def refresh(self) -> None:
+        ttl = self.default_ttl_seconds
+        try:
+            if self.path:
+                document = json.loads(Path(self.path).read_text())
+            else:
+                client = await get_http_client()
+                response = await client.get(self.url)
+                response.raise_for_status()
+                document = response.json()
+                match = MAX_AGE_PATTERN.search(response.headers.get("cache-control", ""))
+                if match:
+                    ttl = int(match.group(1))
+        except (httpx.HTTPError, OSError, ValueError) as exc:
+            raise JWKSUnavailable(str(exc)) from exc
+        self._keys = {key["kid"]: key for key in document.get("keys", []) if "kid" in key}
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + ttl
+
+
+google_jwks = JWKSCache(url=settings.google_jwks_url, path=settings.google_jwks_file)
+
+
+async def verify_google_token_locally(id_token: str) -> Dict[str, Any]:
+    """Check the RS256 signature against cached Google keys without a network round trip."""
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except JWTError as exc:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token") from exc
+    if header.get("alg") != "RS256":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token")
+    key = await google_jwks.get_key(header.get("kid"))
+    if key is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token")
+    try:
+        payload = jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            issuer=GOOGLE_ISSUERS,
+            options={"verify_aud": False, "verify_at_hash": False},
+        )
+    except JWTError as exc:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token") from exc
+    if payload.get("aud") != settings.google_client_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token audience mismatch")
+    return payload
+
+
+async def verify_google_token_remotely(id_token: str) -> Dict[str, Any]:
+    """Validate the token through Google's tokeninfo endpoint."""
     params = {"id_token": id_token}
-    async with httpx.AsyncClient() as client:
-        response = await client.get(GOOGLE_TOKEN_INFO_URL, params=params, timeout=10)
+    client = await get_http_client()
+    response = await client.get(GOOGLE_TOKEN_INFO_URL, params=params, timeout=10)
     if response.status_code != 200:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token")
     payload = response.json()
@@ -21,3 +142,12 @@ async def verify_google_token(id_token: str) -> Dict[str, Any]:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token audience mismatch")
     return payload
 
+
+async def verify_google_token(id_token: str) -> Dict[str, Any]:
+    """Validate a Google ID token and return the payload."""
+    if settings.google_token_verification == "local":
+        try:
+            return await verify_google_token_locally(id_token)
+        except JWKSUnavailable as exc:
+            logger.warning("Google JWKS unavailable, falling back to tokeninfo: %s", exc)
+    return await verify_google_token_remotely(id_token)
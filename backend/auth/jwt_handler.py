@@ -1,18 +1,38 @@
+import hashlib
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
-from database.database import get_db
+from database.database import get_session, read_async_db, read_db, run_db
 from database.models import User
+from schemas import UserResponse
+from utils import invalidation
+from utils.cache import TTLCache
 from utils.settings import get_settings
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/google")
 
+# Verified claims keyed by token digest; entries never outlive the token's ``exp``.
+_claims_cache = TTLCache(maxsize=settings.auth_cache_size, ttl_seconds=settings.jwt_expiration_minutes * 60)
+# Read-only profile snapshots; write paths call ``notify_user`` before and ``invalidate_user`` after committing.
+_user_cache = TTLCache(maxsize=settings.auth_cache_size, ttl_seconds=settings.user_cache_ttl_seconds)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identity taken from verified token claims, without a database lookup."""
+
+    user_id: int
+    email: Optional[str]
+    is_admin: bool
+
 
 def _create_token(data: Dict[str, Any], expires_delta: timedelta) -> str:
     expire = datetime.utcnow() + expires_delta
@@ -43,19 +63,91 @@ def decode_token(token: str) -> Dict[str, Any]:
         ) from exc
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
-    payload = decode_token(token)
+def decode_token_cached(token: str) -> Dict[str, Any]:
+    """``decode_token`` memoized by token digest until the token expires."""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = _claims_cache.get(digest)
+    if claims is not None and claims["exp"] > time.time():
+        return claims
+    claims = decode_token(token)
+    _claims_cache.set(digest, claims, ttl_seconds=claims.get("exp", 0) - time.time())
+    return claims
+
+
+USERS_TOPIC = "users"
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop the cached snapshot after the user's row changes."""
+    _user_cache.pop(user_id)
+
+
+def notify_user(db: Session, user_id: int) -> None:
+    """Drop the user's snapshot in every API worker when ``db`` commits; allergies must not lag."""
+    invalidation.notify(db, USERS_TOPIC, [user_id])
+
+
+def _drop_snapshots(user_ids: Optional[List[int]]) -> None:
+    if user_ids is None:
+        _user_cache.clear()
+    else:
+        for user_id in user_ids:
+            _user_cache.pop(user_id)
+
+
+invalidation.subscribe(USERS_TOPIC, _drop_snapshots)
+
+
+def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    payload = decode_token_cached(token)
     user_id = payload.get("user_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token missing user_id")
+    return Principal(user_id=user_id, email=payload.get("email"), is_admin=bool(payload.get("is_admin")))
+
+
+def get_read_db(principal: Principal = Depends(get_current_principal)):
+    """Session for an authenticated read-only route: a replica unless the user just wrote."""
+    yield from read_db(principal.user_id)
+
+
+async def get_read_async_db(principal: Principal = Depends(get_current_principal)):
+    async for db in read_async_db(principal.user_id):
+        yield db
+
+
+get_read_session = get_read_async_db if settings.database_mode == "async" else get_read_db
+
+
+def load_user(db: Session, user_id: int) -> User:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
+async def get_current_user(
+    db: Session = Depends(get_session),
+    principal: Principal = Depends(get_current_principal),
+) -> User:
+    """Load the ORM user; use for routes that modify the user row."""
+    return await run_db(db, load_user, principal.user_id)
+
+
+async def get_current_user_snapshot(
+    db: Session = Depends(get_session),
+    principal: Principal = Depends(get_current_principal),
+) -> UserResponse:
+    """Cached read-only view of the user; hits the database only on a cache miss."""
+    snapshot = _user_cache.get(principal.user_id)
+    if snapshot is None:
+        user = await run_db(db, load_user, principal.user_id)
+        snapshot = UserResponse.model_validate(user)
+        _user_cache.set(principal.user_id, snapshot)
+    return snapshot
+
+
+def require_admin(user: UserResponse = Depends(get_current_user_snapshot)) -> UserResponse:
     if not user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return user
-
@@ -0,0 +1,104 @@
+"""Latency of bulk delivery-status batches at dispatcher scale.
+
+Run from ``backend/`` against a migrated database:
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate python -m benchmarks.bulk_delivery --sizes 1000 10000 50000
+
+For each size, assignments for one synthetic user are inserted on a far-future
+date, and ``services.deliveries.apply_transitions`` is timed twice. First an
+id batch: everything goes OUT_FOR_DELIVERY, then most go DELIVERED and the
+rest FAILED, with a handful of unknown ids mixed in. Then a date selector
+that moves a second day's rows. It all runs inside an outer transaction that
+is rolled back (the service's commit only releases a savepoint), so the
+database is left untouched. Exits non-zero if any batch exceeds
+``--max-seconds``.
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.database import engine
+from schemas import DeliveryTransition
+from services.deliveries import apply_transitions
+
+SEED_USER = """
+INSERT INTO users (google_id, email, name, created_at)
+VALUES ('bulk-delivery-bench', 'bulk-delivery-bench@example.com', 'Bulk Delivery', now())
+RETURNING id
+"""
+SEED_MEAL = """
+INSERT INTO meals (name, meal_type, ingredients, calories, is_active, created_at)
+VALUES ('Bulk Delivery Bowl', 'LUNCH', ARRAY['rice'], 500, true, now())
+RETURNING id
+"""
+SEED_ASSIGNMENTS = """
+INSERT INTO daily_meal_assignments (user_id, meal_id, assignment_date, delivery_status, created_at)
+SELECT :user_id, :meal_id, :day, 'PENDING', now() FROM generate_series(1, :rows)
+RETURNING id
+"""
+
+
+def timed(db: Session, transitions) -> tuple:
+    started = time.perf_counter()
+    results, _ = apply_transitions(db, transitions)
+    return time.perf_counter() - started, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--max-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as connection:
+        outer = connection.begin()
+        db = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            user_id = db.execute(text(SEED_USER)).scalar_one()
+            meal_id = db.execute(text(SEED_MEAL)).scalar_one()
+            day = date.today() + timedelta(days=1000)
+            for size in args.sizes:
+                ids = db.scalars(
+                    text(SEED_ASSIGNMENTS), {"user_id": user_id, "meal_id": meal_id, "day": day, "rows": size}
+                ).all()
+                db.scalars(
+                    text(SEED_ASSIGNMENTS),
+                    {"user_id": user_id, "meal_id": meal_id, "day": day + timedelta(days=1), "rows": size},
+                ).all()
+                db.execute(text("ANALYZE daily_meal_assignments"))
+                failed = ids[: max(1, size // 20)]
+                delivered = ids[len(failed):]
+                by_ids, results = timed(
+                    db,
+                    [
+                        DeliveryTransition(status="OUT_FOR_DELIVERY", assignment_ids=ids[:-2] + [-1, -2]),
+                        DeliveryTransition(status="DELIVERED", assignment_ids=delivered),
+                        DeliveryTransition(status="FAILED", assignment_ids=failed),
+                    ],
+                )
+                assert [len(result.updated) for result in results] == [size - 2, len(delivered), len(failed)], "id batch"
+                assert results[0].not_found == [-2, -1], "unknown ids"
+                by_date, results = timed(
+                    db, [DeliveryTransition(status="OUT_FOR_DELIVERY", assignment_date=day + timedelta(days=1), meal_type="LUNCH")]
+                )
+                assert len(results[0].updated) == size, "date selector"
+                print(f"{size:>7,} rows  ids: {by_ids * 1000:8.1f} ms ({3 * size / by_ids:>9,.0f} rows/s)  "
+                      f"date selector: {by_date * 1000:8.1f} ms")
+                if max(by_ids, by_date) > args.max_seconds:
+                    failures += 1
+                    print(f"FAIL: {size} rows took longer than {args.max_seconds}s")
+                day += timedelta(days=2)
+        finally:
+            db.close()
+            outer.rollback()
+    print("ok" if not failures else f"{failures} size(s) over budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Import-to-first-request latency of a fresh worker process.
+
+Run from ``backend/`` against a migrated database:
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate python -m benchmarks.cold_start --runs 5
+
+Each run starts a new interpreter with ``STARTUP_TASKS=false`` (as ``serve.py``
+workers do) and times ``import main``, the lifespan startup and the first
+request to a DB-backed route. ``--serve`` also times ``python serve.py`` from
+spawn until ``/health`` answers. Exits non-zero if the median import-to-first-
+request time exceeds ``--max-seconds``.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+ready = time.perf_counter()
+with client:
+    booted = time.perf_counter()
+    status = client.get("/api/subscriptions/plans").status_code
+    answered = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_s": imported - started,
+    "startup_s": booted - ready,
+    "first_request_s": answered - booted,
+    "total_s": (imported - started) + (answered - ready),
+}))
+"""
+
+
+def worker_run() -> dict:
+    env = {**os.environ, "STARTUP_TASKS": "false"}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def serve_run(port: int) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "1", "--port", str(port), "--no-prepare"],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"serve.py exited with code {process.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                time.sleep(0.01)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--serve", action="store_true", help="also time serve.py spawn-to-healthy")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    worker_run()  # warm the bytecode cache so runs measure imports, not compilation
+    runs = [worker_run() for _ in range(args.runs)]
+    report = {
+        key: round(statistics.median(run[key] for run in runs), 3)
+        for key in ("import_s", "startup_s", "first_request_s", "total_s")
+    }
+    if args.serve:
+        report["serve_to_healthy_s"] = round(statistics.median(serve_run(args.port) for _ in range(args.runs)), 3)
+    print(json.dumps(report, indent=2))
+
+    if any(run["status"] != 200 for run in runs):
+        print("FAIL: first request did not succeed")
+        return 1
+    if report["total_s"] > args.max_seconds:
+        print(f"FAIL: cold start {report['total_s']}s exceeds {args.max_seconds}s")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
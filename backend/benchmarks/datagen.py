@@ -0,0 +1,440 @@
+"""Deterministic synthetic dataset at production scale, bulk-loaded with COPY.
+
+Run from ``backend/`` against a migrated, disposable database:
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate_bench python -m benchmarks.datagen --profile 1x --reset
+
+The same ``--seed``, ``--anchor`` date and scale always produce the same rows,
+so benchmark and query-plan runs can be compared across commits. Profiles set
+the scale, and ``--users``/``--days``/``--meals``/``--complaint-rate`` override it:
+
+    tiny  2k users, 14 days of history, 120 meals     (CI / smoke)
+    1x    100k users, 30 days, 400 meals              (~4M assignments)
+    10x   1M users, 30 days, 1,000 meals              (~40M assignments)
+
+Users get realistic allergy/dislike arrays and diets. Subscription histories
+run back-to-back. Assignments cover ``days`` of history plus ``FUTURE_DAYS``
+ahead, with delivery outcomes, and complaints arrive at ``complaint_rate`` per
+delivered meal. Rows are produced with NumPy and streamed through
+``COPY ... FROM STDIN`` in batches, so nothing goes through the ORM. The
+dashboard counters and daily series are rebuilt from the loaded data at the
+end. Row ids are explicit and start at 1, so the target tables must be empty
+(``--reset`` truncates them).
+"""
+import argparse
+import io
+import time
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from database.database import SessionLocal, engine
+from services import metrics
+from services.meal_index import preference_signature
+
+MEAL_TYPES = ("BREAKFAST", "LUNCH", "DINNER")
+MEAL_HOURS = {"BREAKFAST": 7, "LUNCH": 12, "DINNER": 19}
+FUTURE_DAYS = 7
+BATCH_ROWS = 100_000
+PLANS = [(1, "Weekly Wellness", 7, 18.0, "7-day sampler with balanced meals."), (2, "Monthly Momentum", 28, 15.0, "Best for habit building with premium nutrition.")]
+
+ALLERGENS = ["peanut", "tree-nut", "milk", "egg", "soy", "wheat", "fish", "shellfish", "sesame", "mustard"]
+DIETS = ["omnivore", "vegetarian", "vegan"]
+DIET_WEIGHTS = [0.6, 0.3, 0.1]
+SPICE = ["MILD", "MEDIUM", "HOT"]
+GOALS = ["weight_loss", "muscle_gain", "maintenance", "energy"]
+CONDITIONS = ["diabetes", "hypertension", "celiac", "ibs", "high-cholesterol"]
+COMPLAINT_TYPES = ["Delivery", "Taste", "Nutrition", "Other"]
+MEAT = ["chicken", "turkey", "beef", "lamb", "fish", "shrimp", "tuna", "salmon"]
+DAIRY_EGG = ["milk", "egg", "paneer", "cheese", "yogurt", "butter"]
+PLANTS = [
+    "rice", "quinoa", "oats", "lentils", "chickpeas", "tofu", "spinach", "kale", "broccoli", "tomato",
+    "potato", "sweet-potato", "mushroom", "avocado", "banana", "berries", "almond", "peanut", "sesame",
+    "soy", "wheat", "corn", "pepper", "onion", "garlic", "ginger", "coconut", "beans", "carrot", "zucchini",
+]
+INGREDIENTS = PLANTS + MEAT + DAIRY_EGG
+EXTRA_TAGS = ["high-protein", "gluten-free", "low-carb", "low-sodium"]
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    days: int
+    meals: int
+    complaint_rate: float
+    subscriber_share: float = 0.45
+    churned_share: float = 0.25
+
+
+PROFILES: Dict[str, Scale] = {
+    "tiny": Scale(users=2_000, days=14, meals=120, complaint_rate=0.01),
+    "1x": Scale(users=100_000, days=30, meals=400, complaint_rate=0.004),
+    "10x": Scale(users=1_000_000, days=30, meals=1_000, complaint_rate=0.004),
+}
+
+TABLES = [
+    "users", "subscription_plans", "meals", "user_subscriptions", "payments",
+    "daily_meal_assignments", "complaints", "metric_counters", "daily_metrics",
+]
+
+
+NO_CONSTRAINTS = preference_signature(None, None, None, None)
+
+
+def _array(values: Iterable[str]) -> str:
+    return '"{' + ",".join(values) + '}"'
+
+
+def _ts(value: datetime) -> str:
+    return value.isoformat(sep=" ", timespec="seconds")
+
+
+class Loader:
+    """Stream CSV lines into ``COPY table (columns) FROM STDIN`` in batches."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+
+    def copy(self, table: str, columns: Sequence[str], lines: Iterator[str]) -> int:
+        started = time.perf_counter()
+        statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        total = 0
+        with self.connection.cursor() as cursor:
+            buffer: List[str] = []
+            for line in lines:
+                buffer.append(line)
+                if len(buffer) >= BATCH_ROWS:
+                    cursor.copy_expert(statement, io.StringIO("\n".join(buffer) + "\n"))
+                    total += len(buffer)
+                    buffer = []
+            if buffer:
+                cursor.copy_expert(statement, io.StringIO("\n".join(buffer) + "\n"))
+                total += len(buffer)
+        self.counts[table] = self.counts.get(table, 0) + total
+        self.seconds[table] = self.seconds.get(table, 0.0) + time.perf_counter() - started
+        return total
+
+
+@dataclass
+class Population:
+    created: np.ndarray  # seconds before the anchor's midnight, index = user_id - 1
+    diet: np.ndarray  # index into DIETS
+
+
+def generate_users(rng: np.random.Generator, scale: Scale, anchor: date, out: List[str]) -> Iterator[str]:
+    n = scale.users
+    history_seconds = max(scale.days, 365) * 86400
+    midnight = datetime.combine(anchor, datetime.min.time())
+    created = rng.integers(3600, history_seconds, n)
+    diet = rng.choice(len(DIETS), n, p=DIET_WEIGHTS)
+    ages = rng.integers(18, 75, n)
+    genders = rng.choice(["female", "male", "other"], n, p=[0.49, 0.48, 0.03])
+    heights = np.round(rng.normal(170, 9, n).clip(145, 205), 1)
+    weights = np.round(rng.normal(74, 14, n).clip(42, 160), 1)
+    spice = rng.choice(len(SPICE), n, p=[0.4, 0.4, 0.2])
+    goals = rng.choice(len(GOALS), n)
+    allergy_counts = rng.choice([0, 1, 2, 3], n, p=[0.7, 0.2, 0.08, 0.02])
+    dislike_counts = rng.choice([0, 1, 2, 3, 4], n, p=[0.35, 0.3, 0.2, 0.1, 0.05])
+    condition_counts = rng.choice([0, 1, 2], n, p=[0.75, 0.2, 0.05])
+    quiz_taken = rng.random(n) < 0.8
+    diet[~quiz_taken] = 0  # no quiz, no dietary restriction for the planner
+    out.append(Population(created=created, diet=diet))
+
+    for chunk_start in range(0, n, BATCH_ROWS):
+        chunk = slice(chunk_start, min(n, chunk_start + BATCH_ROWS))
+        size = chunk.stop - chunk.start
+        allergy_order = rng.random((size, len(ALLERGENS))).argsort(axis=1)
+        dislike_order = rng.random((size, len(INGREDIENTS))).argsort(axis=1)
+        condition_order = rng.random((size, len(CONDITIONS))).argsort(axis=1)
+        for offset in range(size):
+            index = chunk.start + offset
+            user_id = index + 1
+            created_at = _ts(midnight - timedelta(seconds=int(created[index])))
+            if quiz_taken[index]:
+                allergies = [ALLERGENS[i] for i in allergy_order[offset, : allergy_counts[index]]]
+                dislikes = [INGREDIENTS[i] for i in dislike_order[offset, : dislike_counts[index]]]
+                profile = (
+                    f"{ages[index]},{genders[index]},{heights[index]},{weights[index]},{DIETS[diet[index]]},"
+                    f"{SPICE[spice[index]]},{_array(allergies)},{_array(dislikes)},"
+                    f"{_array(CONDITIONS[i] for i in condition_order[offset, : condition_counts[index]])},"
+                    f"{GOALS[goals[index]]}"
+                )
+                signature = preference_signature(DIETS[diet[index]], SPICE[spice[index]], allergies, dislikes)
+            else:
+                profile = ",,,,,,,,,"
+                signature = NO_CONSTRAINTS
+            yield (
+                f"{user_id},synthetic-{user_id},user{user_id}@synthetic.example,Synthetic User {user_id},"
+                f"{profile},{signature},{'t' if user_id == 1 else 'f'},{created_at},{created_at}"
+            )
+
+
+USER_COLUMNS = [
+    "id", "google_id", "email", "name", "age", "gender", "height_cm", "weight_kg", "dietary_preference",
+    "spice_level", "allergies", "disliked_foods", "health_conditions", "health_goals", "preference_signature",
+    "is_admin", "created_at", "updated_at",
+]
+
+
+def generate_meals(rng: np.random.Generator, scale: Scale, anchor: date, out: List[Dict]) -> Iterator[str]:
+    pools = {(meal_type, diet): [] for meal_type in MEAL_TYPES for diet in range(len(DIETS))}
+    created_at = _ts(datetime.combine(anchor - timedelta(days=max(scale.days, 365)), datetime.min.time()))
+    for meal_id in range(1, scale.meals + 1):
+        meal_type = MEAL_TYPES[(meal_id - 1) % len(MEAL_TYPES)]
+        kind = rng.choice(3, p=[0.45, 0.3, 0.25])  # 0 meat, 1 vegetarian, 2 vegan
+        ingredients = list(rng.choice(PLANTS, rng.integers(2, 5), replace=False))
+        if kind == 0:
+            ingredients.append(str(rng.choice(MEAT)))
+        if kind <= 1 and rng.random() < 0.6:
+            ingredients.append(str(rng.choice(DAIRY_EGG)))
+        vegan = kind == 2
+        vegetarian = kind >= 1
+        tags = (["vegetarian"] if vegetarian else []) + (["vegan"] if vegan else [])
+        tags += list(rng.choice(EXTRA_TAGS, rng.integers(0, 3), replace=False))
+        calories = int(rng.integers(250, 900))
+        protein = round(calories * rng.uniform(0.15, 0.35) / 4, 1)
+        fats = round(calories * rng.uniform(0.2, 0.35) / 9, 1)
+        carbs = round(max(0.0, (calories - protein * 4 - fats * 9) / 4), 1)
+        active = rng.random() < 0.95
+        if active:
+            for diet in range(len(DIETS)):
+                if diet == 0 or (diet == 1 and vegetarian) or (diet == 2 and vegan):
+                    pools[(meal_type, diet)].append(meal_id)
+        yield (
+            f"{meal_id},{meal_type.title()} Bowl {meal_id},Synthetic {meal_type.lower()} meal,{meal_type},"
+            f"{_array(ingredients)},{calories},{protein},{carbs},{fats},{_array(tags)},"
+            f"{'t' if vegetarian else 'f'},{SPICE[int(rng.choice(3, p=[0.45, 0.4, 0.15]))]},{'t' if active else 'f'},{created_at}"
+        )
+    out.append({key: np.array(ids, dtype=np.int64) for key, ids in pools.items()})
+
+
+MEAL_COLUMNS = [
+    "id", "name", "description", "meal_type", "ingredients", "calories", "protein_g", "carbs_g", "fats_g",
+    "dietary_tags", "is_vegetarian", "spice_level", "is_active", "created_at",
+]
+
+
+@dataclass
+class Subscriptions:
+    user_id: np.ndarray
+    start: np.ndarray  # date ordinals, inclusive
+    end: np.ndarray  # date ordinals, inclusive
+
+
+def generate_subscriptions(
+    rng: np.random.Generator, scale: Scale, anchor: date, population: Population, out: List[Subscriptions]
+) -> Iterator[str]:
+    anchor_ordinal = anchor.toordinal()
+    midnight = datetime.combine(anchor, datetime.min.time())
+    state = rng.choice(3, scale.users, p=[scale.subscriber_share, scale.churned_share, 1 - scale.subscriber_share - scale.churned_share])
+    user_ids, starts, ends = [], [], []
+    subscription_id = 0
+    for index in np.flatnonzero(state < 2):
+        created_ordinal = (midnight - timedelta(seconds=int(population.created[index]))).date().toordinal()
+        plan = PLANS[int(rng.random() < 0.55)]
+        if state[index] == 0:
+            start = anchor_ordinal - int(rng.integers(0, plan[2]))
+        else:
+            start = anchor_ordinal - int(rng.integers(1, 120)) - plan[2]
+        chain = []
+        while start >= created_ordinal and len(chain) < 12:
+            chain.append((start, plan))
+            if rng.random() > 0.7:
+                break
+            plan = PLANS[int(rng.random() < 0.55)]
+            start -= plan[2] + 1
+        for start, plan in reversed(chain):
+            subscription_id += 1
+            end = start + plan[2]
+            created_at = _ts(datetime.combine(date.fromordinal(start), datetime.min.time()) + timedelta(hours=9))
+            status = "ACTIVE" if end >= anchor_ordinal else "EXPIRED"
+            user_ids.append(index + 1)
+            starts.append(start)
+            ends.append(end)
+            yield (
+                f"{subscription_id},{index + 1},{plan[0]},{date.fromordinal(start)},{date.fromordinal(end)},"
+                f"{status},{created_at},{plan[3] * plan[2]}"
+            )
+    out.append(Subscriptions(np.array(user_ids), np.array(starts), np.array(ends)))
+
+
+SUBSCRIPTION_COLUMNS = ["id", "user_id", "plan_id", "start_date", "end_date", "status", "created_at"]
+
+
+def subscription_rows(lines: Iterator[str], payments: List[str]) -> Iterator[str]:
+    """Split generator output: the trailing amount becomes a payment row."""
+    for line in lines:
+        row, amount = line.rsplit(",", 1)
+        subscription_id, user_id, _, _, _, _, created_at = row.split(",")
+        payments.append(f"{subscription_id},{user_id},{subscription_id},{amount},USD,PAID,ONLINE,txn-{int(subscription_id):010d},{created_at}")
+        yield row
+
+
+PAYMENT_COLUMNS = ["id", "user_id", "subscription_id", "amount", "currency", "status", "payment_method", "transaction_id", "created_at"]
+
+
+def generate_assignments(
+    rng: np.random.Generator,
+    scale: Scale,
+    anchor: date,
+    population: Population,
+    pools: Dict,
+    subscriptions: Subscriptions,
+    complaints: List[str],
+) -> Iterator[str]:
+    anchor_ordinal = anchor.toordinal()
+    assignment_id = 0
+    complaint_id = 0
+    for ordinal in range(anchor_ordinal - scale.days, anchor_ordinal + FUTURE_DAYS):
+        day = date.fromordinal(ordinal)
+        active = (subscriptions.start <= ordinal) & (subscriptions.end >= ordinal)
+        users = subscriptions.user_id[active]
+        if not len(users):
+            continue
+        diets = population.diet[users - 1]
+        planned_at = _ts(datetime.combine(day - timedelta(days=1), datetime.min.time()) + timedelta(hours=2))
+        for meal_type in MEAL_TYPES:
+            meals = np.empty(len(users), dtype=np.int64)
+            for diet in range(len(DIETS)):
+                mask = diets == diet
+                pool = pools[(meal_type, diet)]
+                if len(pool) == 0:
+                    pool = pools[(meal_type, 0)]
+                meals[mask] = pool[rng.integers(0, len(pool), int(mask.sum()))]
+            ids = range(assignment_id + 1, assignment_id + len(users) + 1)
+            assignment_id += len(users)
+            if ordinal >= anchor_ordinal:
+                yield from (f"{i},{u},{m},{day},PENDING,,{planned_at}" for i, u, m in zip(ids, users.tolist(), meals.tolist()))
+                continue
+            failed = rng.random(len(users)) < 0.03
+            complained = (rng.random(len(users)) < scale.complaint_rate) | (failed & (rng.random(len(users)) < 0.3))
+            minutes = rng.integers(0, 90, len(users))
+            served = datetime.combine(day, datetime.min.time()) + timedelta(hours=MEAL_HOURS[meal_type])
+            delivered_at = [_ts(served + timedelta(minutes=minute)) for minute in range(90)]
+            yield from (
+                f"{i},{u},{m},{day},FAILED,,{planned_at}" if f else f"{i},{u},{m},{day},DELIVERED,{delivered_at[t]},{planned_at}"
+                for i, u, m, f, t in zip(ids, users.tolist(), meals.tolist(), failed.tolist(), minutes.tolist())
+            )
+            opened = served + timedelta(hours=2)
+            for offset in np.flatnonzero(complained).tolist():
+                complaint_id += 1
+                kind = "Delivery" if failed[offset] else COMPLAINT_TYPES[int(rng.integers(0, len(COMPLAINT_TYPES)))]
+                if anchor_ordinal - ordinal > 3 or rng.random() < 0.4:
+                    resolved = opened + timedelta(hours=int(rng.integers(1, 48)))
+                    tail = f"RESOLVED,Resolved by admin,{_ts(opened)},{_ts(resolved)}"
+                else:
+                    tail = f"OPEN,,{_ts(opened)},"
+                complaints.append(
+                    f"{complaint_id},{users[offset]},{ids[offset]},{kind},Synthetic {kind.lower()} complaint,{tail}"
+                )
+
+
+ASSIGNMENT_COLUMNS = ["id", "user_id", "meal_id", "assignment_date", "delivery_status", "delivered_at", "created_at"]
+COMPLAINT_COLUMNS = ["id", "user_id", "assignment_id", "type", "description", "status", "admin_notes", "created_at", "resolved_at"]
+
+DAILY_SERIES_SQL = [
+    ("signups", "SELECT created_at::date, count(*) FROM users GROUP BY 1"),
+    ("deliveries_confirmed", "SELECT delivered_at::date, count(*) FROM daily_meal_assignments WHERE delivered_at IS NOT NULL GROUP BY 1"),
+    ("complaints_opened", "SELECT created_at::date, count(*) FROM complaints GROUP BY 1"),
+    ("complaints_resolved", "SELECT resolved_at::date, count(*) FROM complaints WHERE resolved_at IS NOT NULL GROUP BY 1"),
+    ("subscriptions_started", "SELECT start_date, count(*) FROM user_subscriptions GROUP BY 1"),
+    ("subscriptions_expired", "SELECT end_date + 1, count(*) FROM user_subscriptions WHERE status = 'EXPIRED' GROUP BY 1"),
+]
+
+
+def generate(scale: Scale, seed: int, anchor: date, reset: bool) -> Dict[str, Dict[str, float]]:
+    streams = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(4)]
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            if reset:
+                cursor.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+            else:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM meals)")
+                if cursor.fetchone()[0]:
+                    raise SystemExit("target tables are not empty; pass --reset to truncate them")
+        loader = Loader(raw)
+        populations: List[Population] = []
+        pools: List[Dict] = []
+        subscriptions: List[Subscriptions] = []
+        payments: List[str] = []
+        complaints: List[str] = []
+
+        loader.copy("users", USER_COLUMNS, generate_users(streams[0], scale, anchor, populations))
+        loader.copy(
+            "subscription_plans",
+            ["id", "name", "duration_days", "price_per_day", "description", "is_active"],
+            iter(f"{plan_id},{name},{days},{price},{description},t" for plan_id, name, days, price, description in PLANS),
+        )
+        loader.copy("meals", MEAL_COLUMNS, generate_meals(streams[1], scale, anchor, pools))
+        loader.copy(
+            "user_subscriptions",
+            SUBSCRIPTION_COLUMNS,
+            subscription_rows(generate_subscriptions(streams[2], scale, anchor, populations[0], subscriptions), payments),
+        )
+        loader.copy("payments", PAYMENT_COLUMNS, iter(payments))
+        loader.copy(
+            "daily_meal_assignments",
+            ASSIGNMENT_COLUMNS,
+            generate_assignments(streams[3], scale, anchor, populations[0], pools[0], subscriptions[0], complaints),
+        )
+        loader.copy("complaints", COMPLAINT_COLUMNS, iter(complaints))
+
+        started = time.perf_counter()
+        with raw.cursor() as cursor:
+            for table in ("users", "subscription_plans", "meals", "user_subscriptions", "payments", "daily_meal_assignments", "complaints"):
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT max(id) FROM {table}), 1))")
+            for name, query in DAILY_SERIES_SQL:
+                cursor.execute(f"INSERT INTO daily_metrics (metric_date, name, value) SELECT d, '{name}', n FROM ({query}) AS s(d, n)")
+        raw.commit()
+        with raw.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f"ANALYZE {table}")
+        raw.commit()
+        loader.seconds["finalize"] = time.perf_counter() - started
+    finally:
+        raw.close()
+
+    db = SessionLocal()
+    try:
+        metrics.reconcile(db)
+        db.commit()
+    finally:
+        db.close()
+    return {table: {"rows": loader.counts.get(table, 0), "seconds": round(seconds, 2)} for table, seconds in loader.seconds.items()}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="tiny")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--days", type=int, help="days of assignment history before the anchor date")
+    parser.add_argument("--meals", type=int, help="catalog size")
+    parser.add_argument("--complaint-rate", type=float, help="complaints per delivered meal")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=date.fromisoformat, default=date.today(), help="'today' of the dataset")
+    parser.add_argument("--reset", action="store_true", help="truncate the target tables first")
+    args = parser.parse_args(argv)
+
+    overrides = {
+        field: value
+        for field, value in (("users", args.users), ("days", args.days), ("meals", args.meals), ("complaint_rate", args.complaint_rate))
+        if value is not None
+    }
+    scale = replace(PROFILES[args.profile], **overrides)
+    started = time.perf_counter()
+    report = generate(scale, args.seed, args.anchor, args.reset)
+    elapsed = time.perf_counter() - started
+    print(f"profile={args.profile} seed={args.seed} anchor={args.anchor} {scale}")
+    for table, stats in report.items():
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"  {table:<24} {stats['rows']:>11,} rows  {stats['seconds']:7.2f}s  {rate:>12,.0f} rows/s")
+    print(f"done in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Requests/sec and p99 for the sync (threadpool) and async (asyncpg) database modes.
+
+Run from ``backend/`` against a local Postgres:
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate python -m benchmarks.db_modes
+
+Each mode starts its own ``uvicorn main:app`` process with ``DATABASE_MODE`` set
+and hammers an authenticated read endpoint plus the public plans listing.
+"""
+import argparse
+import asyncio
+import json
+
+from auth.jwt_handler import create_access_token
+from benchmarks.common import app_server, hammer
+from database.database import SessionLocal
+from database.models import User
+
+PATHS = ["/api/meals/upcoming?days=30", "/api/subscriptions/plans"]
+
+
+def benchmark_token() -> str:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == "bench-db-modes@example.com").first()
+        if not user:
+            user = User(google_id="bench-db-modes", email="bench-db-modes@example.com", name="Bench")
+            db.add(user)
+            db.commit()
+        return create_access_token({"user_id": user.id, "email": user.email, "is_admin": False, "token_type": "access"})
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {benchmark_token()}"}
+    results = {}
+    for mode in ("sync", "async"):
+        with app_server(args.port, env={"DATABASE_MODE": mode}) as base_url:
+            for path in PATHS:
+                stats = asyncio.run(hammer(base_url, path, headers, args.duration, args.concurrency))
+                results[f"{mode} {path}"] = stats
+                print(f"{mode:<6} {path:<32} {stats['throughput_rps']:8.1f} req/s  p99={stats['p99_ms']:8.2f} ms  errors={stats['errors']}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
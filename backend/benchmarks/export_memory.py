@@ -0,0 +1,94 @@
+"""Verify that bulk exports run in constant memory.
+
+Run from ``backend/`` against a local Postgres (a scratch schema is created and
+dropped, the real tables are untouched):
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate python -m benchmarks.export_memory --rows 3000000
+
+A synthetic ``payments`` table is filled with ``generate_series`` and exported at
+10% and 100% of ``--rows``; the Python heap peak must not grow with table size.
+Exits non-zero if the full export peaks above ``--max-mb`` or more than 2x the
+small one.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from services.exports import stream_export
+from utils.settings import get_settings
+
+SCHEMA = "export_memory_bench"
+
+
+def fill(engine, rows: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.execute(
+            text(
+                f"""
+                CREATE TABLE {SCHEMA}.payments AS
+                SELECT g AS id, (g % 100000) + 1 AS user_id, (g % 250000) + 1 AS subscription_id,
+                       round((random() * 500)::numeric, 2)::float AS amount, 'USD'::varchar(10) AS currency,
+                       'PAID'::varchar(50) AS status, 'ONLINE'::varchar(50) AS payment_method,
+                       md5(g::text)::varchar(255) AS transaction_id,
+                       timestamp '2024-01-01' + (g || ' seconds')::interval AS created_at
+                FROM generate_series(1, :rows) AS g
+                """
+            ),
+            {"rows": rows},
+        )
+
+
+def measure(engine, date_to=None):
+    tracemalloc.start()
+    started = time.perf_counter()
+    written = 0
+    with Session(engine) as db:
+        for chunk in stream_export(db, "payments", "csv", date_to=date_to):
+            written += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return written, elapsed, peak / 2**20
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--max-mb", type=float, default=64.0)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        get_settings().database_url,
+        connect_args={"options": f"-csearch_path={SCHEMA}"},
+    )
+    try:
+        fill(engine, args.rows)
+        results = {}
+        for label, rows in (("10%", args.rows // 10), ("100%", args.rows)):
+            with engine.begin() as connection:
+                cutoff = connection.execute(
+                    text("SELECT created_at::date FROM payments WHERE id = :id"), {"id": rows}
+                ).scalar()
+            written, elapsed, peak_mb = measure(engine, date_to=cutoff)
+            results[label] = peak_mb
+            print(f"{label:>5}: ~{rows:>9} rows  {written / 2**20:8.1f} MiB written  {elapsed:6.1f}s  heap peak {peak_mb:6.1f} MiB")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+    if results["100%"] > args.max_mb or results["100%"] > 2 * max(results["10%"], 1.0):
+        print("FAIL: export memory grows with table size")
+        return 1
+    print("ok: export memory is independent of table size")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Latency of local JWKS verification versus the tokeninfo round trip.
+
+Run from ``backend/``: ``python -m benchmarks.google_verify --requests 2000 --rtt-ms 60``.
+A throwaway RSA key signs Google-shaped ID tokens and is published through a
+local JWKS file; tokeninfo is served by a stub transport that sleeps for the
+given round-trip time, so no network access is needed.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from auth import google_oauth
+from utils.settings import get_settings
+
+settings = get_settings()
+KID = "benchmark-key"
+
+
+def build_key_material():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, algorithm="RS256").to_dict()
+    public_jwk.update({"kid": KID, "use": "sig", "alg": "RS256"})
+    public_jwk = {key: value.decode() if isinstance(value, bytes) else value for key, value in public_jwk.items()}
+    return private_pem, {"keys": [public_jwk]}
+
+
+def mint_token(private_pem: bytes) -> str:
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com",
+        "aud": settings.google_client_id,
+        "sub": "1234567890",
+        "email": "bench@example.com",
+        "name": "Bench User",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": KID})
+
+
+def stub_tokeninfo(rtt_seconds: float, claims: dict) -> httpx.AsyncBaseTransport:
+    class StubTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            await asyncio.sleep(rtt_seconds)
+            return httpx.Response(200, json=claims)
+
+    return StubTransport()
+
+
+async def measure(verify, token: str, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await verify(token)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - started
+
+
+def report(label: str, latencies, elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(
+        f"{label:<10} p50={statistics.median(ordered) * 1000:7.2f} ms  p99={p99 * 1000:7.2f} ms  "
+        f"throughput={len(ordered) / elapsed:9.0f} req/s"
+    )
+
+
+async def run(args) -> None:
+    private_pem, jwks = build_key_material()
+    token = mint_token(private_pem)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as handle:
+        json.dump(jwks, handle)
+    google_oauth.google_jwks = google_oauth.JWKSCache(path=handle.name)
+    claims = jwt.get_unverified_claims(token)
+    await google_oauth.start_http_client(transport=stub_tokeninfo(args.rtt_ms / 1000, claims))
+    try:
+        assert (await google_oauth.verify_google_token_locally(token))["sub"] == claims["sub"]
+        report("local", *await measure(google_oauth.verify_google_token_locally, token, args.requests, args.concurrency))
+        report("tokeninfo", *await measure(google_oauth.verify_google_token_remotely, token, args.requests, args.concurrency))
+    finally:
+        await google_oauth.close_http_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=60.0, help="Simulated tokeninfo round-trip time.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
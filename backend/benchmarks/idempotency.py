@@ -0,0 +1,165 @@
+"""Duplicate request bursts against the ``Idempotency-Key`` endpoints.
+
+Run from ``backend/`` against a disposable database (it reuses the load-test
+users and adds subscriptions, complaints and confirmations):
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate_bench python -m benchmarks.idempotency --rounds 20 --burst 16
+
+Each round picks another load-test user and a fresh key, then fires ``--burst``
+identical concurrent requests at subscribe, complaint submission and delivery
+confirmation. The harness then counts the rows each endpoint wrote. A keyed
+burst must write exactly once, with every other response a replay of the same
+body. A keyless subscribe burst runs as the control and shows the duplicates
+the key prevents. Exits non-zero if any keyed burst wrote more or less than
+once or any request failed.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func, select
+
+from benchmarks.common import app_server, summarize
+from benchmarks.load_test import bearer, seed
+from database.database import SessionLocal
+from database.models import Complaint, DailyMealAssignment, DailyMetric, UserSubscription
+
+# (user, assignment_id, tag) -> (path, json body)
+Target = Callable[[Tuple[int, str], int, str], Tuple[str, Optional[dict]]]
+
+
+def subscribe(fixture):
+    return lambda user, assignment_id, tag: ("/api/subscriptions/subscribe", {"plan_id": fixture.plan_ids[0]})
+
+
+def complaint(user, assignment_id: int, tag: str):
+    return "/api/complaints/", {"assignment_id": assignment_id, "type": "QUALITY", "description": f"burst {tag}"}
+
+
+def confirm(user, assignment_id: int, tag: str):
+    return f"/api/meals/{assignment_id}/confirm-delivery", None
+
+
+def count_writes(db, name: str, user_ids: List[int], tag: str) -> int:
+    if name.startswith("subscribe"):
+        return db.scalar(select(func.count()).select_from(UserSubscription).where(UserSubscription.user_id.in_(user_ids)))
+    if name == "complaint":
+        return db.scalar(select(func.count()).select_from(Complaint).where(Complaint.description.like(f"burst {tag}%")))
+    return db.scalar(
+        select(func.coalesce(func.sum(DailyMetric.value), 0)).where(
+            DailyMetric.metric_date == date.today(), DailyMetric.name == "deliveries_confirmed"
+        )
+    )
+
+
+async def burst(client, path: str, body: Optional[dict], headers: Dict[str, str], size: int):
+    async def send():
+        started = time.perf_counter()
+        response = await client.post(path, json=body, headers=headers)
+        return response, time.perf_counter() - started
+
+    return await asyncio.gather(*(send() for _ in range(size)))
+
+
+async def run(base_url, fixture, targets, rounds: int, size: int, pending: Dict[int, int], tag: str) -> Dict[str, dict]:
+    report = {}
+    users = [user for user in fixture.users if user[0] in pending][: rounds * len(targets)]
+    limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for index, (name, (target, keyed)) in enumerate(targets.items()):
+            chosen = users[index * rounds:(index + 1) * rounds]
+            round_tag = f"{tag}-{name}"
+            db = SessionLocal()
+            before = count_writes(db, name, [user_id for user_id, _ in chosen], round_tag)
+            db.close()
+            latencies: List[float] = []
+            errors = replays = mismatched = 0
+            started = time.perf_counter()
+            for user in chosen:
+                path, body = target(user, pending[user[0]], round_tag)
+                headers = bearer(*user)
+                if keyed:
+                    headers["Idempotency-Key"] = str(uuid.uuid4())
+                responses = await burst(client, path, body, headers, size)
+                bodies = {response.text for response, _ in responses if response.status_code < 400}
+                mismatched += keyed and len(bodies) > 1
+                for response, latency in responses:
+                    if response.status_code >= 400:
+                        errors += 1
+                    else:
+                        latencies.append(latency)
+                    replays += response.headers.get("Idempotent-Replayed") == "true"
+            elapsed = time.perf_counter() - started
+            db = SessionLocal()
+            writes = count_writes(db, name, [user_id for user_id, _ in chosen], round_tag) - before
+            db.close()
+            report[name] = {
+                **summarize(latencies, errors, elapsed),
+                "keyed": keyed,
+                "requests": rounds * size,
+                "writes": writes,
+                "replays": replays,
+                "mismatched_bodies": mismatched,
+            }
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=16, help="Identical concurrent requests per round.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    fixture = seed(args.rounds * 4, 1)
+    targets = {
+        "subscribe": (subscribe(fixture), True),
+        "complaint": (complaint, True),
+        "confirm": (confirm, True),
+        "subscribe_unkeyed": (subscribe(fixture), False),
+    }
+    db = SessionLocal()
+    pending = dict(
+        db.execute(
+            select(DailyMealAssignment.user_id, func.min(DailyMealAssignment.id))
+            .where(
+                DailyMealAssignment.user_id.in_([user_id for user_id, _ in fixture.users]),
+                DailyMealAssignment.delivery_status == "PENDING",
+            )
+            .group_by(DailyMealAssignment.user_id)
+        ).all()
+    )
+    db.close()
+    if len(pending) < args.rounds * len(targets):
+        print("FAIL: not enough load-test users with a pending assignment; reset the database")
+        return 1
+
+    with app_server(args.port, workers=args.workers) as base_url:
+        report = asyncio.run(run(base_url, fixture, targets, args.rounds, args.burst, pending, tag))
+
+    failed = False
+    for name, result in report.items():
+        print(
+            f"{name:<18} {result['requests']:5} requests  writes={result['writes']:<4} replays={result['replays']:<4} "
+            f"p50={result['p50_ms']:7.2f}  p99={result['p99_ms']:7.2f} ms  errors={result['error_rate']:.2%}"
+        )
+        if result["keyed"] and (
+            result["writes"] != args.rounds or result["mismatched_bodies"] or result["error_rate"]
+        ):
+            failed = True
+    if failed:
+        print("FAIL: a keyed burst did not collapse into exactly one write")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
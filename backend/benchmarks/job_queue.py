@@ -0,0 +1,109 @@
+"""Enqueue and dequeue throughput of the Postgres job queue.
+
+Run from ``backend/`` against a migrated, disposable database (the workers run
+whatever is due, so the queue must hold nothing but benchmark jobs):
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate_bench python -m benchmarks.job_queue --jobs 20000 --workers 4
+
+Enqueues ``--jobs`` no-op jobs twice: one transaction per job, as request
+handlers do, and in bulk transactions of ``--bulk`` jobs. Then drains the queue
+with ``--workers`` worker processes claiming ``--batch`` jobs per round trip,
+each job completed in its own transaction. Exits non-zero if draining runs
+below ``--min-rate`` jobs/s.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+
+from sqlalchemy import func, select, text
+
+from database.database import SessionLocal, engine
+from database.models import Job
+from services import jobs
+
+
+def enqueue_one_by_one(count: int) -> float:
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        for number in range(count):
+            jobs.enqueue(db, "noop", {"benchmark": number})
+            db.commit()
+    finally:
+        db.close()
+    return time.perf_counter() - started
+
+
+def enqueue_bulk(count: int, bulk: int) -> float:
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        for start in range(0, count, bulk):
+            for number in range(start, min(count, start + bulk)):
+                jobs.enqueue(db, "noop", {"benchmark": number})
+            db.commit()
+    finally:
+        db.close()
+    return time.perf_counter() - started
+
+
+def drain(name: str, batch: int, results) -> None:
+    engine.dispose(close=False)
+    outcomes = jobs.work(name, once=True, batch_size=batch, poll_seconds=0)
+    results.put(outcomes["done"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20_000)
+    parser.add_argument("--bulk", type=int, default=1000, help="Jobs per transaction in the bulk enqueue.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=50, help="Jobs claimed per round trip.")
+    parser.add_argument("--min-rate", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(Job).where(Job.status.in_(("QUEUED", "RUNNING")))):
+            print("FAIL: the queue is not empty; run against a disposable database")
+            return 1
+
+    single_seconds = enqueue_one_by_one(args.jobs)
+    bulk_seconds = enqueue_bulk(args.jobs, args.bulk)
+    total = 2 * args.jobs
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE jobs"))
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [
+        context.Process(target=drain, args=(f"bench/{number}", args.batch, results)) for number in range(args.workers)
+    ]
+    engine.dispose()
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    processed = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    drain_seconds = time.perf_counter() - started
+    drain_rate = processed / drain_seconds
+
+    print(f"enqueue, 1 per transaction     {args.jobs / single_seconds:10,.0f} jobs/s")
+    print(f"enqueue, {args.bulk} per transaction {args.jobs / bulk_seconds:10,.0f} jobs/s")
+    print(
+        f"dequeue, {args.workers} workers x {args.batch}      {drain_rate:10,.0f} jobs/s "
+        f"({processed:,} of {total:,} in {drain_seconds:.2f}s)"
+    )
+    if processed != total:
+        print("FAIL: not every job was processed exactly once")
+        return 1
+    if drain_rate < args.min_rate:
+        print(f"FAIL: dequeue below {args.min_rate:,.0f} jobs/s")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""HTTP load test replaying weighted VitalPlate traffic mixes.
+
+Run from ``backend/`` against a disposable database (it seeds load-test users,
+subscriptions and a week of assignments, and the write scenarios add rows):
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate_bench python -m benchmarks.load_test \\
+        --scenario all --duration 20 --concurrency 64 --out results/load.json
+
+Each scenario is a weighted mix of operations. Every virtual client picks an
+operation by weight and a random synthetic user, and sends the request with a
+JWT from ``create_access_token``. The harness reports throughput, p50/p95/p99
+and error rate per scenario and per operation, plus the git commit, and
+writes them as JSON so runs can be diffed across commits.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func, insert, select
+
+from auth.jwt_handler import create_access_token
+from benchmarks.common import BACKEND_DIR, app_server, summarize
+from database.database import SessionLocal
+from database.models import DailyMealAssignment, Meal, SubscriptionPlan, User, UserSubscription
+from services.meal_planner import plan_assignments
+from utils.settings import get_settings
+
+USER_PREFIX = "load-test-"
+ADMIN_EMAIL = "load-test-admin@example.com"
+STARTER_MEALS = [
+    ("Oat Bowl", "BREAKFAST", ["oats", "banana"], True, "MILD"),
+    ("Egg Wrap", "BREAKFAST", ["egg", "tortilla"], False, "MEDIUM"),
+    ("Dal Rice", "LUNCH", ["lentils", "rice"], True, "MEDIUM"),
+    ("Chicken Salad", "LUNCH", ["chicken", "lettuce"], False, "MILD"),
+    ("Paneer Curry", "DINNER", ["paneer", "tomato"], True, "HOT"),
+    ("Grilled Fish", "DINNER", ["fish", "lemon"], False, "MILD"),
+]
+
+
+@dataclass
+class Fixture:
+    users: List[Tuple[int, str]]  # (user_id, email)
+    admin: Tuple[int, str]
+    plan_ids: List[int]
+    assignments: Dict[int, int]  # user_id -> one of today's assignment ids
+
+
+def seed(user_count: int, plan_days: int) -> Fixture:
+    db = SessionLocal()
+    try:
+        existing = db.scalar(select(func.count(User.id)).where(User.google_id.like(f"{USER_PREFIX}%")))
+        if existing < user_count:
+            now = datetime.utcnow()
+            db.execute(
+                insert(User),
+                [
+                    {
+                        "google_id": f"{USER_PREFIX}{index}",
+                        "email": f"{USER_PREFIX}{index}@example.com",
+                        "name": f"Load Test {index}",
+                        "is_admin": False,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for index in range(existing, user_count)
+                ],
+            )
+        if not db.scalar(select(User.id).where(User.email == ADMIN_EMAIL)):
+            db.add(User(google_id="load-test-admin", email=ADMIN_EMAIL, name="Load Test Admin", is_admin=True))
+        if not db.scalar(select(func.count(Meal.id)).where(Meal.is_active.is_(True))):
+            db.add_all(
+                Meal(name=name, meal_type=meal_type, ingredients=ingredients, calories=550, is_vegetarian=veg, spice_level=spice)
+                for name, meal_type, ingredients, veg, spice in STARTER_MEALS
+            )
+        db.commit()
+
+        plan_ids = list(db.scalars(select(SubscriptionPlan.id).where(SubscriptionPlan.is_active.is_(True))))
+        users = db.execute(
+            select(User.id, User.email)
+            .where(User.google_id.like(f"{USER_PREFIX}%"))
+            .order_by(User.id)
+            .limit(user_count)
+        ).all()
+        user_ids = [user_id for user_id, _ in users]
+        today = date.today()
+        subscribed = set(
+            db.scalars(
+                select(UserSubscription.user_id).where(
+                    UserSubscription.user_id.in_(user_ids),
+                    UserSubscription.status == "ACTIVE",
+                    UserSubscription.end_date >= today + timedelta(days=plan_days),
+                )
+            )
+        )
+        missing = [user_id for user_id in user_ids if user_id not in subscribed]
+        if missing:
+            db.execute(
+                insert(UserSubscription),
+                [
+                    {
+                        "user_id": user_id,
+                        "plan_id": plan_ids[0],
+                        "start_date": today,
+                        "end_date": today + timedelta(days=max(plan_days, 28)),
+                        "status": "ACTIVE",
+                        "created_at": datetime.utcnow(),
+                    }
+                    for user_id in missing
+                ],
+            )
+            db.commit()
+        for offset in range(plan_days):
+            plan_assignments(db, today + timedelta(days=offset), user_ids=user_ids)
+
+        assignments = dict(
+            db.execute(
+                select(DailyMealAssignment.user_id, func.min(DailyMealAssignment.id))
+                .where(DailyMealAssignment.user_id.in_(user_ids), DailyMealAssignment.assignment_date == today)
+                .group_by(DailyMealAssignment.user_id)
+            ).all()
+        )
+        admin = db.execute(select(User.id, User.email).where(User.email == ADMIN_EMAIL)).one()
+        return Fixture(users=[tuple(row) for row in users], admin=tuple(admin), plan_ids=plan_ids, assignments=assignments)
+    finally:
+        db.close()
+
+
+def bearer(user_id: int, email: str, is_admin: bool = False) -> Dict[str, str]:
+    token = create_access_token({"user_id": user_id, "email": email, "is_admin": is_admin, "token_type": "access"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+# An operation turns (fixture, rng, user) into (method, path, json body, use admin token).
+Request = Tuple[str, str, Optional[dict], bool]
+Operation = Callable[[Fixture, random.Random, Tuple[int, str]], Request]
+
+
+def today_poll(fixture, rng, user) -> Request:
+    return "GET", "/api/meals/today", None, False
+
+
+def calendar_view(fixture, rng, user) -> Request:
+    return "GET", "/api/meals/upcoming?days=30", None, False
+
+
+def subscribe(fixture, rng, user) -> Request:
+    return "POST", "/api/subscriptions/subscribe", {"plan_id": rng.choice(fixture.plan_ids)}, False
+
+
+def submit_complaint(fixture, rng, user) -> Request:
+    assignment_id = fixture.assignments.get(user[0])
+    if assignment_id is None:
+        return "GET", "/api/complaints/", None, False
+    body = {"assignment_id": assignment_id, "type": "QUALITY", "description": "Load test: meal arrived cold"}
+    return "POST", "/api/complaints/", body, False
+
+
+def admin_browse(fixture, rng, user) -> Request:
+    path = rng.choice(
+        [
+            "/api/admin/dashboard",
+            "/api/admin/customers?limit=50",
+            "/api/admin/customers?sort=-created_at&limit=50",
+            "/api/admin/complaints?limit=50",
+            "/api/admin/complaints?status=OPEN&limit=50",
+            "/api/admin/meals?limit=50",
+        ]
+    )
+    return "GET", path, None, True
+
+
+SCENARIOS: Dict[str, Dict[str, Tuple[Operation, int]]] = {
+    "morning_poll": {"today": (today_poll, 1)},
+    "calendar": {"upcoming": (calendar_view, 1)},
+    "subscribe_burst": {"subscribe": (subscribe, 1)},
+    "complaints": {"submit": (submit_complaint, 3), "today": (today_poll, 1)},
+    "admin_console": {"admin": (admin_browse, 1)},
+    "mixed": {
+        "today": (today_poll, 60),
+        "upcoming": (calendar_view, 25),
+        "subscribe": (subscribe, 3),
+        "complaint": (submit_complaint, 4),
+        "admin": (admin_browse, 8),
+    },
+}
+
+
+async def run_scenario(
+    base_url: str,
+    fixture: Fixture,
+    mix: Dict[str, Tuple[Operation, int]],
+    duration: float,
+    concurrency: int,
+    seed_value: int,
+) -> Dict[str, dict]:
+    names = list(mix)
+    weights = [mix[name][1] for name in names]
+    headers = {user: bearer(*user) for user in fixture.users}
+    admin_headers = bearer(*fixture.admin, is_admin=True)
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def virtual_client(index: int):
+            rng = random.Random(seed_value * 7919 + index)
+            while time.perf_counter() < stop_at:
+                name = rng.choices(names, weights)[0]
+                user = rng.choice(fixture.users)
+                method, path, body, as_admin = mix[name][0](fixture, rng, user)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(
+                        method, path, json=body, headers=admin_headers if as_admin else headers[user]
+                    )
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[name].append(time.perf_counter() - started)
+                else:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_client(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = {"total": summarize([value for values in latencies.values() for value in values], sum(errors.values()), elapsed)}
+    for name in names:
+        report[name] = summarize(latencies[name], errors[name], elapsed)
+    return report
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--plan-days", type=int, default=7, help="days of assignments to seed")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args()
+
+    fixture = seed(args.users, args.plan_days)
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    settings = get_settings()
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "database_mode": settings.database_mode,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "users": len(fixture.users),
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    with app_server(args.port, workers=args.workers) as base_url:
+        for name in scenarios:
+            result = asyncio.run(
+                run_scenario(base_url, fixture, SCENARIOS[name], args.duration, args.concurrency, args.seed)
+            )
+            report["scenarios"][name] = result
+            total = result["total"]
+            print(
+                f"{name:<16} {total['throughput_rps']:8.1f} req/s  p50={total['p50_ms']:7.2f}  "
+                f"p95={total['p95_ms']:7.2f}  p99={total['p99_ms']:7.2f} ms  errors={total['error_rate']:.2%}"
+            )
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"wrote {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
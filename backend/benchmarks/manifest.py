@@ -0,0 +1,89 @@
+"""Kitchen manifest latency for a busy production day.
+
+Run from ``backend/`` against a migrated database:
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate python -m benchmarks.manifest --assignments 100000
+
+Inserts ``--meals`` meals and ``--assignments`` assignments on one past date
+inside a transaction, ``ANALYZE``s, and times ``build_manifest`` for that day
+cold (database aggregation) and warm (finalized-day cache), then rolls back.
+Exits non-zero if the cold build exceeds ``--max-seconds``.
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.database import engine
+from services import manifest
+
+SEED = [
+    """
+    INSERT INTO users (google_id, email, name, created_at)
+    VALUES ('manifest-bench', 'manifest-bench@example.com', 'Manifest Bench', now())
+    """,
+    """
+    INSERT INTO meals (name, meal_type, ingredients, calories, is_active, created_at)
+    SELECT 'Manifest Meal ' || g, (ARRAY['BREAKFAST', 'LUNCH', 'DINNER'])[g % 3 + 1],
+           ARRAY['rice', 'ingredient-' || g % 40, 'ingredient-' || g % 17, 'ingredient-' || g % 7], 500, true, now()
+    FROM generate_series(1, :meals) AS g
+    """,
+    """
+    INSERT INTO daily_meal_assignments (user_id, meal_id, assignment_date, delivery_status, created_at)
+    SELECT u.id, m.ids[1 + (g * 7919) % array_length(m.ids, 1)], :day, 'DELIVERED', now()
+    FROM generate_series(1, :assignments) AS g
+    CROSS JOIN (SELECT id FROM users WHERE google_id = 'manifest-bench') u
+    CROSS JOIN (SELECT array_agg(id) AS ids FROM meals WHERE name LIKE 'Manifest Meal %') m
+    """,
+    "ANALYZE daily_meal_assignments",
+    "ANALYZE meals",
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assignments", type=int, default=100_000)
+    parser.add_argument("--meals", type=int, default=400)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    day = date.today() - timedelta(days=4000)
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        db = Session(bind=connection)
+        try:
+            for statement in SEED:
+                db.execute(text(statement), {"meals": args.meals, "assignments": args.assignments, "day": day})
+            cold, warm = [], []
+            for _ in range(args.runs):
+                manifest.invalidate()
+                started = time.perf_counter()
+                report = manifest.build_manifest(db, day, day)
+                cold.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                manifest.build_manifest(db, day, day)
+                warm.append(time.perf_counter() - started)
+        finally:
+            db.close()
+            transaction.rollback()
+
+    assert report.portions == args.assignments, f"expected {args.assignments} portions, got {report.portions}"
+    ingredients = sum(len(meal_type.ingredients) for meal_type in report.days[0].meal_types)
+    cold_s, warm_s = statistics.median(cold), statistics.median(warm)
+    print(f"{args.assignments:,} assignments over {args.meals} meals -> {ingredients} ingredient lines")
+    print(f"cold {cold_s * 1000:8.1f} ms   cached {warm_s * 1000:6.3f} ms")
+    if cold_s > args.max_seconds:
+        print(f"FAIL: cold manifest above {args.max_seconds}s")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Compare the bitmap meal index against a naive per-meal string scan.
+
+Run from ``backend/``: ``python -m benchmarks.meal_index --meals 2000 --users 20000``.
+No database is needed; the catalog and users are synthetic.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from services.meal_index import MealIndex, normalize_term, spice_rank
+
+MEAL_TYPES = ["BREAKFAST", "LUNCH", "DINNER", "SNACK"]
+SPICES = ["MILD", "MEDIUM", "HOT"]
+PREFERENCES = [None, "vegetarian", "vegan", "keto"]
+
+
+def build_catalog(rng: random.Random, meals: int, vocabulary: int):
+    return [
+        SimpleNamespace(
+            id=meal_id,
+            meal_type=rng.choice(MEAL_TYPES),
+            ingredients=[f"ingredient-{rng.randrange(vocabulary)}" for _ in range(rng.randint(4, 12))],
+            dietary_tags=rng.sample(["vegan", "keto", "gluten-free", "high-protein"], rng.randint(0, 2)),
+            is_vegetarian=rng.random() < 0.5,
+            spice_level=rng.choice(SPICES),
+            is_active=True,
+            calories=rng.randint(250, 900),
+            protein_g=None,
+            carbs_g=None,
+            fats_g=None,
+        )
+        for meal_id in range(1, meals + 1)
+    ]
+
+
+def build_users(rng: random.Random, users: int, vocabulary: int):
+    return [
+        SimpleNamespace(
+            allergies=[f"ingredient-{rng.randrange(vocabulary)}" for _ in range(rng.randint(0, 3))],
+            disliked_foods=[f"Ingredient-{rng.randrange(vocabulary)}" for _ in range(rng.randint(0, 5))],
+            dietary_preference=rng.choice(PREFERENCES),
+            spice_level=rng.choice(SPICES),
+        )
+        for _ in range(users)
+    ]
+
+
+def naive_compatible(catalog, user):
+    """The pre-index approach: compare every meal's strings against the user's lists."""
+    avoid = {normalize_term(term) for term in (user.allergies or []) + (user.disliked_foods or [])}
+    preference = normalize_term(user.dietary_preference)
+    limit = spice_rank(user.spice_level, 2)
+    matches = []
+    for meal in catalog:
+        terms = [normalize_term(term) for term in meal.ingredients + meal.dietary_tags]
+        if any(term in avoid for term in terms):
+            continue
+        if preference in ("vegetarian", "vegan") and not meal.is_vegetarian:
+            continue
+        if preference in ("vegan", "keto") and preference not in terms:
+            continue
+        if spice_rank(meal.spice_level, 0) > limit:
+            continue
+        matches.append(meal.id)
+    return matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--meals", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--vocabulary", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = build_catalog(rng, args.meals, args.vocabulary)
+    users = build_users(rng, args.users, args.vocabulary)
+
+    started = time.perf_counter()
+    index = MealIndex()
+    index.load(catalog)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive = [naive_compatible(catalog, user) for user in users]
+    naive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed = [index.compatible_with_user(user) for user in users]
+    index_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for meal in catalog[:100]:
+        meal.ingredients = meal.ingredients + ["saffron"]
+        index.upsert(meal)
+    upsert_seconds = (time.perf_counter() - started) / 100
+
+    assert naive == indexed, "index and naive scan disagree"
+    print(f"catalog={args.meals} meals, users={args.users}, vocabulary={args.vocabulary}")
+    print(f"index build:      {build_seconds * 1000:9.1f} ms")
+    print(f"naive scan:       {naive_seconds * 1e6 / args.users:9.1f} us/user")
+    print(f"bitmap index:     {index_seconds * 1e6 / args.users:9.1f} us/user")
+    print(f"speedup:          {naive_seconds / index_seconds:9.1f}x")
+    print(f"incremental upsert: {upsert_seconds * 1e6:7.1f} us/meal")
+
+
+if __name__ == "__main__":
+    main()
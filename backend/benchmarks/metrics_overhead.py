@@ -0,0 +1,90 @@
+"""Per-request cost of ``MetricsMiddleware``.
+
+Run from ``backend/`` (no database needed):
+
+    python -m benchmarks.metrics_overhead --requests 20000
+
+Drives a one-route FastAPI app directly through its ASGI callable, without
+sockets, with and without the middleware, and reports the difference per
+request. Exits non-zero if it exceeds ``--max-us`` microseconds.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from fastapi import FastAPI
+
+from utils import telemetry
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(telemetry.MetricsMiddleware)
+    return app
+
+
+async def drive(app: FastAPI, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for index in range(requests):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/items/{index}",
+            "raw_path": f"/items/{index}".encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [],
+            "client": ("127.0.0.1", 1234),
+            "server": ("127.0.0.1", 80),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-us", type=float, default=50.0)
+    args = parser.parse_args()
+
+    plain, instrumented = build_app(False), build_app(True)
+    baseline, measured = [], []
+    for _ in range(args.rounds):
+        baseline.append(asyncio.run(drive(plain, args.requests)))
+        measured.append(asyncio.run(drive(instrumented, args.requests)))
+    base_us = statistics.median(baseline) * 1e6
+    with_us = statistics.median(measured) * 1e6
+    overhead = with_us - base_us
+    render_started = time.perf_counter()
+    telemetry.render()
+    render_ms = (time.perf_counter() - render_started) * 1000
+    print(f"baseline {base_us:7.1f} us/request")
+    print(f"metrics  {with_us:7.1f} us/request  (+{overhead:.1f} us, {overhead / base_us:+.1%})")
+    print(f"render   {render_ms:7.2f} ms for {len(telemetry.registry.routes)} route(s)")
+    if overhead > args.max_us:
+        print(f"FAIL: middleware overhead above {args.max_us} us")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Nutrition targets and macro-fitted selection versus the daily rotation.
+
+Run from ``backend/``: ``python -m benchmarks.nutrition --users 100000 --meals 400``.
+No database is needed; users, body data and the catalog (with per-meal
+macros) are synthetic. Times ``compute_targets`` and ``fit_meals`` and
+compares the fit quality of ``fit_meals`` picks against ``select_meals``.
+Exits non-zero if fitting exceeds ``--max-seconds`` or does not beat the
+rotation's mean loss.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from benchmarks.meal_index import build_catalog, build_users
+from services import nutrition
+from services.meal_planner import MealCatalog, SubscriberProfiles, eligibility_matrix, select_meals
+
+GENDERS = ["male", "female", "Female", None]
+GOALS = ["Weight loss", "Build muscle", "Stay healthy", None]
+
+
+def body_rows(rng: random.Random, users: int):
+    return [
+        (
+            user_id,
+            rng.randint(18, 75) if rng.random() < 0.9 else None,
+            rng.choice(GENDERS),
+            rng.uniform(150, 195) if rng.random() < 0.85 else None,
+            rng.uniform(48, 120) if rng.random() < 0.85 else None,
+            rng.choice(GOALS),
+        )
+        for user_id in range(1, users + 1)
+    ]
+
+
+def with_macros(rng: random.Random, catalog):
+    for meal in catalog:
+        protein_share = rng.uniform(0.12, 0.40)
+        fat_share = rng.uniform(0.20, 0.40)
+        meal.protein_g = round(meal.calories * protein_share / 4, 1)
+        meal.fats_g = round(meal.calories * fat_share / 9, 1)
+        meal.carbs_g = round(meal.calories * max(0.05, 1 - protein_share - fat_share) / 4, 1)
+    return catalog
+
+
+def rotation_totals(selections, nutrients: np.ndarray, users: int) -> np.ndarray:
+    totals = np.zeros((users, len(nutrition.NUTRIENTS)), dtype=np.float32)
+    for positions in selections.values():
+        picked = positions >= 0
+        totals[picked] += nutrients[positions[picked]]
+    return totals
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--meals", type=int, default=400)
+    parser.add_argument("--vocabulary", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = MealCatalog.from_meals(with_macros(rng, build_catalog(rng, args.meals, args.vocabulary)))
+    rows = [
+        (user_id, user.allergies, user.disliked_foods, user.dietary_preference, user.spice_level)
+        for user_id, user in enumerate(build_users(rng, args.users, args.vocabulary), start=1)
+    ]
+    eligible = eligibility_matrix(SubscriberProfiles.from_rows(rows, catalog), catalog)
+    bodies = body_rows(rng, args.users)
+    target_date = date(2025, 1, 31)
+
+    started = time.perf_counter()
+    targets = nutrition.compute_targets(bodies)
+    targets_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fitted = nutrition.fit_meals(
+        eligible, catalog.type_codes, len(catalog.meal_types), catalog.nutrients, targets, target_date
+    )
+    fit_seconds = time.perf_counter() - started
+
+    rotation = select_meals(eligible, targets.user_ids, catalog, target_date)
+    planned = np.isfinite(fitted.loss)
+    rotated = nutrition.fit_quality(
+        rotation_totals(rotation, catalog.nutrients, args.users)[planned], targets.daily[planned]
+    )
+    fit = nutrition.fit_quality(fitted.totals[planned], targets.daily[planned])
+
+    print(f"{args.users:,} users x {args.meals} meals ({len(catalog.meal_types)} types)")
+    print(f"compute_targets {targets_seconds * 1000:8.1f} ms   ({targets.estimated.mean():.0%} estimated)")
+    print(f"fit_meals       {fit_seconds * 1000:8.1f} ms   ({args.users / fit_seconds:,.0f} users/s)")
+    for label, quality in (("rotation", rotated), ("fitted", fit)):
+        print(
+            f"{label:<9} mean loss {quality['mean_loss']:.4f}  median kcal error {quality['median_calorie_error']:.1%}  "
+            f"p90 {quality['p90_calorie_error']:.1%}  within 10% {quality['within_10_percent']:.1%}"
+        )
+    if fit_seconds > args.max_seconds:
+        print(f"FAIL: fit_meals above {args.max_seconds}s")
+        return 1
+    if fit["mean_loss"] >= rotated["mean_loss"]:
+        print("FAIL: fitted selection does not improve on the rotation")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Fail when an endpoint issues more SQL statements than its budget.
+
+Run from ``backend/`` against a disposable database (it seeds a fixture user
+with a month of assignments and an active subscription):
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate_test python -m benchmarks.query_budget
+
+Budgets are independent of the number of rows returned, so an N+1 regression
+(e.g. a lazy ``meal`` or ``plan`` load per item) trips them immediately.
+``CACHED_PATHS`` are then polled again: the repeat must issue no statements,
+and a repeat carrying the ETag must get an empty 304. Exits non-zero on any
+violation.
+
+This is a manual gate: the repo has no test suite or CI, so nothing runs it
+automatically. Run it before merging changes to the routes above, to their
+schemas' relationships, or to ``services/response_cache.py``.
+"""
+import sys
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from auth.jwt_handler import create_access_token
+from database.database import SessionLocal
+from database.models import DailyMealAssignment, Meal, SubscriptionPlan, User, UserSubscription
+from utils.query_counter import assert_max_queries
+
+FIXTURE_EMAIL = "query-budget@example.com"
+
+# (method, path, max statements)
+BUDGETS = [
+    ("GET", "/api/meals/today", 1),
+    ("GET", "/api/meals/upcoming?days=30", 1),
+    ("GET", "/api/subscriptions/current", 1),
+    ("GET", "/api/subscriptions/plans", 1),
+    ("GET", "/api/complaints/", 1),
+    ("GET", "/api/users/profile", 1),
+]
+CACHED_PATHS = ["/api/meals/today", "/api/meals/upcoming?days=30", "/api/subscriptions/plans"]
+
+
+def seed_fixture() -> User:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == FIXTURE_EMAIL).first()
+        if user:
+            return user
+        user = User(google_id="query-budget", email=FIXTURE_EMAIL, name="Query Budget")
+        meal = Meal(name="Budget Bowl", meal_type="LUNCH", ingredients=["rice"], calories=500)
+        plan = db.query(SubscriptionPlan).first() or SubscriptionPlan(name="Budget", duration_days=30, price_per_day=1)
+        db.add_all([user, meal, plan])
+        db.flush()
+        today = date.today()
+        db.add(UserSubscription(user_id=user.id, plan_id=plan.id, start_date=today, end_date=today + timedelta(days=30)))
+        db.add_all(
+            DailyMealAssignment(user_id=user.id, meal_id=meal.id, assignment_date=today + timedelta(days=offset))
+            for offset in range(31)
+        )
+        db.commit()
+        db.refresh(user)
+        return user
+    finally:
+        db.close()
+
+
+def main() -> int:
+    import main as app_module
+
+    user = seed_fixture()
+    token = create_access_token({"user_id": user.id, "email": user.email, "is_admin": False, "token_type": "access"})
+    headers = {"Authorization": f"Bearer {token}"}
+    failures = 0
+    with TestClient(app_module.app) as client:
+        for method, path, budget in BUDGETS:
+            try:
+                with assert_max_queries(budget, label=f"{method} {path}") as stats:
+                    response = client.request(method, path, headers=headers)
+                response.raise_for_status()
+                print(f"ok    {method} {path}: {stats.count}/{budget} queries")
+            except AssertionError as exc:
+                failures += 1
+                print(f"FAIL  {exc}")
+        for path in CACHED_PATHS:
+            try:
+                with assert_max_queries(0, label=f"repeat GET {path}"):
+                    etag = client.get(path, headers=headers).headers["ETag"]
+                    revalidated = client.get(path, headers={**headers, "If-None-Match": etag})
+                assert revalidated.status_code == 304 and not revalidated.content, f"GET {path} did not revalidate"
+                print(f"ok    repeat GET {path}: 0 queries, 304 on If-None-Match")
+            except AssertionError as exc:
+                failures += 1
+                print(f"FAIL  {exc}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Fail when a hot route query plans a sequential scan on a large table.
+
+Run from ``backend/`` against a migrated database (``alembic upgrade head``):
+
+    DATABASE_URL=postgresql://postgres@localhost/vitalplate python -m benchmarks.query_plans --users 20000
+
+Synthetic users, subscriptions, payments, assignments and complaints are bulk
+inserted with ``generate_series`` and ``ANALYZE``d inside one transaction; every
+statement below is ``EXPLAIN``ed with those statistics, then everything is
+rolled back, so the database is left untouched. Exits non-zero if any plan
+contains a ``Seq Scan`` on one of ``CHECKED_TABLES``.
+"""
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload
+
+from database.models import Complaint, DailyMealAssignment, Payment, User, UserSubscription
+from routes.admin import customers_query
+from utils.pagination import keyset_page
+from utils.settings import get_settings
+
+CHECKED_TABLES = {"users", "user_subscriptions", "daily_meal_assignments", "complaints", "payments"}
+
+SEED = [
+    """
+    INSERT INTO users (google_id, email, name, created_at)
+    SELECT 'query-plan-' || g, 'query-plan-' || g || '@example.com', 'Query Plan ' || g,
+           now() - g * interval '1 minute'
+    FROM generate_series(1, :users) AS g
+    """,
+    """
+    INSERT INTO meals (name, meal_type, ingredients, calories, is_active, created_at)
+    SELECT 'Query Plan Meal ' || g, (ARRAY['BREAKFAST', 'LUNCH', 'DINNER'])[g % 3 + 1], ARRAY['rice'], 500, true, now()
+    FROM generate_series(1, 60) AS g
+    """,
+    """
+    INSERT INTO subscription_plans (name, duration_days, price_per_day, is_active)
+    VALUES ('Query Plan', 30, 10, true)
+    """,
+    """
+    INSERT INTO user_subscriptions (user_id, plan_id, start_date, end_date, status, created_at)
+    SELECT u.id, p.id, current_date - s * 30 - u.id % 30, current_date - s * 30 - u.id % 30 + 30,
+           CASE WHEN s = 0 THEN 'ACTIVE' ELSE 'EXPIRED' END, now()
+    FROM users u
+    CROSS JOIN generate_series(0, 3) AS s
+    CROSS JOIN (SELECT max(id) AS id FROM subscription_plans WHERE name = 'Query Plan') p
+    WHERE u.google_id LIKE 'query-plan-%'
+    """,
+    """
+    INSERT INTO payments (user_id, subscription_id, amount, currency, status, payment_method, created_at)
+    SELECT s.user_id, s.id, 300, 'USD', 'PAID', 'ONLINE', s.created_at
+    FROM user_subscriptions s JOIN users u ON u.id = s.user_id
+    WHERE u.google_id LIKE 'query-plan-%'
+    """,
+    """
+    INSERT INTO daily_meal_assignments (user_id, meal_id, assignment_date, delivery_status, created_at)
+    SELECT u.id, m.first_id + (u.id + d + :days) % 60, current_date + d,
+           CASE WHEN d < 0 THEN 'DELIVERED' ELSE 'PENDING' END, now()
+    FROM users u
+    CROSS JOIN generate_series(-:days, :days) AS d
+    CROSS JOIN (SELECT min(id) AS first_id FROM meals WHERE name LIKE 'Query Plan Meal %') m
+    WHERE u.google_id LIKE 'query-plan-%'
+    """,
+    """
+    INSERT INTO complaints (user_id, assignment_id, type, description, status, created_at)
+    SELECT a.user_id, a.id, 'QUALITY', 'query plan', CASE WHEN a.id % 10 = 0 THEN 'OPEN' ELSE 'RESOLVED' END,
+           now() - (a.id % 10000) * interval '1 minute'
+    FROM daily_meal_assignments a JOIN users u ON u.id = a.user_id
+    WHERE u.google_id LIKE 'query-plan-%' AND a.id % 20 = 0
+    """,
+]
+
+
+def statements(user_id: int, subscription_id: int):
+    """(label, statement) pairs mirroring the queries issued by the routes and jobs."""
+    today = date.today()
+    return [
+        (
+            "meals.today",
+            select(DailyMealAssignment)
+            .options(joinedload(DailyMealAssignment.meal))
+            .where(DailyMealAssignment.user_id == user_id, DailyMealAssignment.assignment_date == today),
+        ),
+        (
+            "meals.upcoming",
+            select(DailyMealAssignment)
+            .options(joinedload(DailyMealAssignment.meal))
+            .where(
+                DailyMealAssignment.user_id == user_id,
+                DailyMealAssignment.assignment_date >= today,
+                DailyMealAssignment.assignment_date <= today + timedelta(days=30),
+            )
+            .order_by(DailyMealAssignment.assignment_date.asc()),
+        ),
+        (
+            "subscriptions.current",
+            select(UserSubscription)
+            .options(joinedload(UserSubscription.plan))
+            .where(
+                UserSubscription.user_id == user_id,
+                UserSubscription.status == "ACTIVE",
+                UserSubscription.end_date >= today,
+            )
+            .order_by(UserSubscription.end_date.desc())
+            .limit(1),
+        ),
+        ("complaints.list", select(Complaint).where(Complaint.user_id == user_id)),
+        ("payments.by_subscription", select(Payment).where(Payment.subscription_id == subscription_id)),
+        ("admin.customers", keyset_page(customers_query(), [User.id], False, None, 50)),
+        (
+            "admin.customers?sort=-created_at",
+            keyset_page(customers_query(), [User.created_at, User.id], True, None, 50),
+        ),
+        (
+            "admin.complaints",
+            keyset_page(select(Complaint), [Complaint.created_at, Complaint.id], True, None, 50),
+        ),
+        (
+            "admin.complaints?status=OPEN",
+            keyset_page(select(Complaint).where(Complaint.status == "OPEN"), [Complaint.id], False, None, 50),
+        ),
+        (
+            "metrics.expire_subscriptions",
+            select(UserSubscription.id).where(UserSubscription.status == "ACTIVE", UserSubscription.end_date < today),
+        ),
+    ]
+
+
+def seq_scans(plan: dict) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in CHECKED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=14, help="assignments per user on each side of today")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    engine = create_engine(get_settings().database_url)
+    dialect = postgresql.dialect()
+    failures = 0
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            for sql in SEED:
+                connection.execute(text(sql), {"users": args.users, "days": args.days})
+            for table in sorted(CHECKED_TABLES):
+                connection.execute(text(f"ANALYZE {table}"))
+            user_id, subscription_id = connection.execute(
+                text(
+                    "SELECT s.user_id, s.id FROM user_subscriptions s JOIN users u ON u.id = s.user_id "
+                    "WHERE u.google_id = 'query-plan-1' ORDER BY s.id LIMIT 1"
+                )
+            ).one()
+
+            for label, statement in statements(user_id, subscription_id):
+                sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+                plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scanned = seq_scans(plan[0]["Plan"])
+                verdict = "FAIL seq scan on " + ", ".join(scanned) if scanned else "ok"
+                print(f"{label:<34} {verdict}")
+                if args.verbose or scanned:
+                    print(json.dumps(plan[0]["Plan"], indent=2))
+                failures += bool(scanned)
+        finally:
+            transaction.rollback()
+    engine.dispose()
+
+    if failures:
+        print(f"FAIL: {failures} statement(s) fall back to sequential scans")
+        return 1
+    print("ok: every hot query is index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Recommendation scoring latency, incremental rebuilds and batch throughput.
+
+Run from ``backend/``: ``python -m benchmarks.recommendations --meals 2000 --users 100000``.
+No database is needed; the catalog, profiles and delivery history are
+synthetic. Measures the full feature build, one incremental ``sync`` after a
+meal edit, per-user scoring (vector + mask + matrix product + top-k), and
+batch scoring of every user against the planner's eligibility mask. Exits non-zero if the per-user p99 exceeds
+``--max-ms``.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.meal_index import build_catalog, build_users
+from benchmarks.nutrition import body_rows, with_macros
+from services.meal_index import IndexedMeal, MealIndex, bitmap_ids
+from services.meal_planner import MealCatalog, SubscriberProfiles, eligibility_matrix
+from services.recommendations import MealFeatures, top_k, top_meals, user_vectors
+
+
+def synthetic_history(seed: int, meal_ids, users: int, per_user: int):
+    generator = np.random.default_rng(seed)
+    size = users * per_user
+    return np.column_stack(
+        [
+            np.repeat(np.arange(1, users + 1), per_user),
+            generator.choice(meal_ids, size),
+            generator.integers(1, 4, size),
+            generator.random(size) < 0.05,
+        ]
+    ).astype(np.int64)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meals", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=400)
+    parser.add_argument("--history", type=int, default=20, help="History rows per user.")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    meals = with_macros(rng, build_catalog(rng, args.meals, args.vocabulary))
+    index = MealIndex()
+    index.load(meals)
+    features = MealFeatures()
+
+    started = time.perf_counter()
+    matrix = features.sync(index)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    edited = SimpleNamespace(**meals[0].__dict__)
+    edited.ingredients = edited.ingredients + ["brand-new-ingredient"]
+    index.upsert(edited)
+    started = time.perf_counter()
+    matrix = features.sync(index)
+    sync_ms = (time.perf_counter() - started) * 1000
+    assert features.rebuilt_rows == 1 and "brand-new-ingredient" in matrix.vocabulary, "incremental sync"
+
+    users = build_users(rng, args.users, args.vocabulary)
+    bodies = body_rows(rng, args.users)
+    profiles = [
+        (body[0], user.dietary_preference, user.spice_level, *body[1:])
+        for user, body in zip(users, bodies)
+    ]
+    history = synthetic_history(args.seed, [meal.id for meal in meals], args.users, args.history)
+    ends = np.searchsorted(history[:, 0], np.arange(1, args.users + 2))
+
+    latencies = []
+    for position in rng.sample(range(args.users), min(args.samples, args.users)):
+        user, profile = users[position], profiles[position]
+        started = time.perf_counter()
+        allowed = np.isin(
+            matrix.meal_ids,
+            bitmap_ids(index.compatible(user.allergies, user.disliked_foods, user.dietary_preference, user.spice_level)),
+        )
+        vector = user_vectors(matrix, [profile], history[ends[position]:ends[position + 1]])[0]
+        top_k((matrix.matrix @ vector)[None, :], allowed[None, :], args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+    catalog = MealCatalog.from_meals([IndexedMeal.from_meal(meal) for meal in meals])
+    rows = [
+        (profile[0], user.allergies, user.disliked_foods, user.dietary_preference, user.spice_level)
+        for user, profile in zip(users, profiles)
+    ]
+    eligible = eligibility_matrix(SubscriberProfiles.from_rows(rows, catalog), catalog)
+    started = time.perf_counter()
+    vectors = user_vectors(matrix, profiles, history)
+    vectors_seconds = time.perf_counter() - started
+    positions, _ = top_meals(matrix, vectors, eligible, args.k)
+    batch_seconds = time.perf_counter() - started
+    assert (positions[:, 0] >= 0).mean() > 0.5, "batch produced no recommendations"
+
+    print(f"{args.meals} meals x {matrix.matrix.shape[1]} features, {args.users:,} users")
+    print(f"full build        {build_ms:8.1f} ms")
+    print(f"incremental sync  {sync_ms:8.1f} ms  (1 row featurized)")
+    print(f"per user          p50 {p50:6.3f} ms   p99 {p99:6.3f} ms")
+    print(
+        f"batch             {batch_seconds:8.2f} s   ({args.users / batch_seconds:,.0f} users/s, "
+        f"{vectors_seconds:.2f} s of it building vectors)"
+    )
+    if p99 > args.max_ms:
+        print(f"FAIL: per-user p99 above {args.max_ms} ms")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Planning once per preference signature versus once per subscriber.
+
+Run from ``backend/``: ``python -m benchmarks.signatures --users 100000 --meals 2000``.
+No database is needed. The synthetic population is skewed the way real sign-ups
+are: most users share one of ``--profiles`` constraint sets (Zipf-weighted,
+many of them with no constraints at all) and ``--unique`` of them have a
+combination nobody else has. Times eligibility plus the daily rotation per
+subscriber against grouping by signature (computed from each user's constraint
+columns), eligibility per signature (cold and warm signature cache) and menu
+fan-out, and checks both pick the same meals.
+Exits non-zero if the picks differ or the cold dedup run is less than
+``--min-speedup`` times faster.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.meal_index import build_catalog, build_users
+from services import meal_planner
+from services.meal_planner import (
+    MealCatalog,
+    SubscriberProfiles,
+    eligibility_matrix,
+    group_by_signature,
+    select_meals,
+    select_menu_meals,
+    signature_eligibility,
+)
+
+
+def build_population(rng: random.Random, users: int, profiles: int, unique: float, vocabulary: int):
+    shared = build_users(rng, profiles, vocabulary)
+    # The most common profiles are the unconstrained ones.
+    for profile in shared[: max(1, profiles // 20)]:
+        profile.allergies, profile.disliked_foods = [], []
+    weights = [1 / rank for rank in range(1, profiles + 1)]
+    population = []
+    for _ in range(users):
+        if rng.random() < unique:
+            population.extend(build_users(rng, 1, vocabulary))
+        else:
+            population.append(SimpleNamespace(**rng.choices(shared, weights)[0].__dict__))
+    return population
+
+
+def dedup_plan(rows, user_ids, catalog, target_date):
+    groups = group_by_signature(rows)
+    eligible, hits = signature_eligibility(groups, catalog)
+    return select_menu_meals(eligible, groups.inverse, user_ids, catalog, target_date), len(groups), hits
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--meals", type=int, default=2000)
+    parser.add_argument("--vocabulary", type=int, default=400)
+    parser.add_argument("--profiles", type=int, default=2000, help="Shared constraint sets.")
+    parser.add_argument("--unique", type=float, default=0.05, help="Share of users with a one-off profile.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-speedup", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = MealCatalog.from_meals(build_catalog(rng, args.meals, args.vocabulary))
+    population = build_population(rng, args.users, args.profiles, args.unique, args.vocabulary)
+    rows = [
+        (user_id, user.allergies, user.disliked_foods, user.dietary_preference, user.spice_level)
+        for user_id, user in enumerate(population, start=1)
+    ]
+    user_ids = np.arange(1, args.users + 1, dtype=np.int64)
+    target_date = date(2025, 1, 31)
+
+    started = time.perf_counter()
+    eligible = eligibility_matrix(SubscriberProfiles.from_rows(rows, catalog), catalog)
+    baseline = select_meals(eligible, user_ids, catalog, target_date)
+    baseline_seconds = time.perf_counter() - started
+    del eligible
+
+    meal_planner._signature_eligibility.clear()
+    started = time.perf_counter()
+    cold, signatures, cold_hits = dedup_plan(rows, user_ids, catalog, target_date)
+    cold_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    warm, _, warm_hits = dedup_plan(rows, user_ids, catalog, target_date)
+    warm_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    group_by_signature(rows)
+    grouping_ms = (time.perf_counter() - started) * 1000
+
+    identical = all(
+        np.array_equal(baseline[type_code], cold[type_code]) and np.array_equal(baseline[type_code], warm[type_code])
+        for type_code in baseline
+    )
+    speedup = baseline_seconds / cold_seconds
+
+    print(f"{args.users:,} users x {args.meals} meals ({len(catalog.meal_types)} types)")
+    print(f"distinct signatures {signatures:,} ({signatures / args.users:.1%} of users)")
+    print(f"per subscriber      {baseline_seconds * 1000:8.1f} ms")
+    print(f"per signature cold  {cold_seconds * 1000:8.1f} ms   ({speedup:.1f}x, {grouping_ms:.1f} ms grouping)")
+    print(
+        f"per signature warm  {warm_seconds * 1000:8.1f} ms   ({baseline_seconds / warm_seconds:.1f}x, "
+        f"cache hit rate {warm_hits / signatures:.1%}, cold {cold_hits / signatures:.1%})"
+    )
+    if not identical:
+        print("FAIL: per-signature plan differs from the per-subscriber plan")
+        return 1
+    if speedup < args.min_speedup:
+        print(f"FAIL: speedup below {args.min_speedup}x")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
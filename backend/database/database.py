@@ -1,13 +1,174 @@
+import itertools
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from uuid import uuid4
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
 
+from utils import query_counter
+from utils.cache import TTLCache
+from utils.pool_stats import TimedAsyncQueuePool, TimedQueuePool, pool_status
 from utils.settings import get_settings
 
 settings = get_settings()
+T = TypeVar("T")
+
+
+def engine_options(use_asyncio: bool = False) -> Dict[str, Any]:
+    """Pool and driver arguments for ``create_engine`` from the ``DB_*`` settings."""
+    options: Dict[str, Any] = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if settings.db_pool == "null":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncQueuePool if use_asyncio else TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_recycle=settings.db_pool_recycle_seconds,
+        )
+    if use_asyncio and settings.db_pgbouncer:
+        # A transaction-mode PgBouncer may run each transaction on a different
+        # server connection, so asyncpg must not cache or reuse named statements.
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return options
 
-engine = create_engine(settings.database_url, future=True)
+
+engine = create_engine(settings.database_url, future=True, **engine_options())
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 Base = declarative_base()
+query_counter.install(engine)
+
+replica_urls = [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+replica_engines = [create_engine(url, future=True, **engine_options()) for url in replica_urls]
+ReplicaSessions = [
+    sessionmaker(bind=replica, autocommit=False, autoflush=False, future=True) for replica in replica_engines
+]
+for replica in replica_engines:
+    query_counter.install(replica)
+
+
+def async_database_url(url: str) -> str:
+    """Translate a libpq-style URL into its asyncpg equivalent."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.split("+")[0]
+    if scheme in ("postgres", "postgresql"):
+        scheme = "postgresql+asyncpg"
+    query = []
+    for key, value in parse_qsl(parts.query):
+        if key == "sslmode":
+            query.append(("ssl", value))
+        elif key != "channel_binding":
+            query.append((key, value))
+    return urlunsplit((scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+if settings.database_mode == "async":
+    async_engine = create_async_engine(async_database_url(settings.database_url), **engine_options(use_asyncio=True))
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    query_counter.install(async_engine.sync_engine)
+    async_replica_engines = [
+        create_async_engine(async_database_url(url), **engine_options(use_asyncio=True)) for url in replica_urls
+    ]
+    AsyncReplicaSessions = [
+        async_sessionmaker(bind=replica, autoflush=False, expire_on_commit=False) for replica in async_replica_engines
+    ]
+    for replica in async_replica_engines:
+        query_counter.install(replica.sync_engine)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+    async_replica_engines = []
+    AsyncReplicaSessions = []
+
+# Users who wrote recently read from the primary so they see their own change.
+# The pin is also sent to the client as a cookie, so a read served by another
+# worker (or host) is pinned as well; this cache covers clients that drop it.
+_primary_pins = TTLCache(maxsize=settings.auth_cache_size, ttl_seconds=settings.replica_pin_seconds)
+_next_replica = itertools.count()
+PIN_COOKIE = "primary_pin"
+# Per request, set by ``PrimaryPinMiddleware``: the cookie's pin and the one ``pin_to_primary`` sets.
+_request_pin: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_pin", default=None)
+
+
+def pin_to_primary(user_id: int) -> None:
+    """Route ``user_id``'s reads to the primary for ``REPLICA_PIN_SECONDS``; call after a write commits."""
+    if replica_urls:
+        _primary_pins.set(user_id, True)
+        state = _request_pin.get()
+        if state is not None:
+            state["set_until"] = time.time() + settings.replica_pin_seconds
+
+
+def _pinned(user_id: Optional[int]) -> bool:
+    state = _request_pin.get()
+    if state is not None and state["cookie_until"] > time.time():
+        return True
+    return user_id is not None and bool(_primary_pins.get(user_id))
+
+
+def read_sessionmaker(user_id: Optional[int] = None, use_asyncio: bool = settings.database_mode == "async"):
+    """Session factory for a read-only request: the next replica, or the primary
+    when none are configured or the client or ``user_id`` is pinned after a write."""
+    replicas = AsyncReplicaSessions if use_asyncio else ReplicaSessions
+    primary = AsyncSessionLocal if use_asyncio else SessionLocal
+    if not replicas or _pinned(user_id):
+        return primary
+    return replicas[next(_next_replica) % len(replicas)]
+
+
+class PrimaryPinMiddleware:
+    """Carries ``pin_to_primary`` in a short-lived ``primary_pin`` cookie.
+
+    The cookie holds the pin's expiry (epoch seconds). Any worker that gets it
+    back routes the request's reads to the primary until then, so the guarantee
+    does not depend on the write and the read landing on the same process.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            cookie_until = float(cookie_parser(Headers(scope=scope).get("cookie", "")).get(PIN_COOKIE, 0))
+        except ValueError:
+            cookie_until = 0.0
+        state = {"cookie_until": cookie_until, "set_until": 0.0}
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and state["set_until"]:
+                cookie = (
+                    f"{PIN_COOKIE}={state['set_until']:.3f}; Max-Age={math.ceil(settings.replica_pin_seconds)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                if settings.environment == "production":
+                    cookie += "; Secure"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = _request_pin.set(state)
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            _request_pin.reset(token)
 
 
 def get_db():
@@ -18,3 +179,67 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Async counterpart of ``get_db`` backed by asyncpg."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def read_db(user_id: Optional[int] = None) -> Iterator[Session]:
+    """``get_db`` for read-only routes, routed by ``read_sessionmaker``."""
+    db = read_sessionmaker(user_id)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def read_async_db(user_id: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+    async with read_sessionmaker(user_id)() as db:
+        yield db
+
+
+def named_engines() -> List[Tuple[str, Engine]]:
+    engines = [("sync", engine)]
+    if async_engine is not None:
+        engines.append(("async", async_engine.sync_engine))
+    engines.extend((f"replica{index}", replica) for index, replica in enumerate(replica_engines))
+    engines.extend((f"async_replica{index}", replica.sync_engine) for index, replica in enumerate(async_replica_engines))
+    return engines
+
+
+def pool_statistics() -> Dict[str, Any]:
+    """Live pool state for this process (every worker has its own pools)."""
+    statistics: Dict[str, Any] = {"pid": os.getpid(), "sync": None, "async": None}
+    for name, named_engine in named_engines():
+        statistics[name] = pool_status(named_engine)
+    return statistics
+
+
+def get_replica_db() -> Iterator[Session]:
+    yield from read_db()
+
+
+async def get_replica_async_db() -> AsyncIterator[AsyncSession]:
+    async for db in read_async_db():
+        yield db
+
+
+# Route dependencies selected by DATABASE_MODE; pair them with ``run_db``.
+get_session = get_async_db if settings.database_mode == "async" else get_db
+# Public read-only routes; authenticated ones use ``auth.jwt_handler.get_read_session``.
+get_replica_session = get_replica_async_db if settings.database_mode == "async" else get_replica_db
+
+
+async def run_db(db: Union[Session, AsyncSession], fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run ORM code ``fn(session, *args)`` without blocking the event loop.
+
+    With an ``AsyncSession`` the function runs through ``run_sync`` on asyncpg;
+    with a plain ``Session`` it runs in the threadpool. ``fn`` should return
+    fully loaded data (e.g. Pydantic models) since lazy loads are not allowed
+    once control is back on the event loop.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
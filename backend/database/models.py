@@ -3,28 +3,41 @@ from datetime import datetime, date
 import pytz
 from sqlalchemy import (
     ARRAY,
+    BigInteger,
     Boolean,
     Column,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    SmallInteger,
     String,
     Text,
+    text,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 from database.database import Base
 
 
 def utcnow():
-    """Return aware UTC timestamp."""
-    return datetime.now(pytz.UTC)
+    """Return the current UTC time as a naive timestamp.
+
+    The columns are ``TIMESTAMP WITHOUT TIME ZONE``; psycopg2 silently drops an
+    offset but asyncpg rejects aware values, so store naive UTC explicitly.
+    """
+    return datetime.now(pytz.UTC).replace(tzinfo=None)
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at", "created_at", "id"),
+        Index("ix_users_preference_signature", "preference_signature"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     google_id = Column(String(255), unique=True, nullable=False)
@@ -40,6 +53,9 @@ class User(Base):
     disliked_foods = Column(ARRAY(String))
     health_conditions = Column(ARRAY(String))
     health_goals = Column(String(100))
+    # services.meal_index.preference_signature of the eligibility constraints, kept current on profile writes.
+    # For reporting only; the planner recomputes it from the constraint columns.
+    preference_signature = Column(String(32))
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=utcnow)
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
@@ -65,6 +81,10 @@ class SubscriptionPlan(Base):
 
 class UserSubscription(Base):
     __tablename__ = "user_subscriptions"
+    __table_args__ = (
+        Index("ix_user_subscriptions_user_status_end", "user_id", "status", "end_date"),
+        Index("ix_user_subscriptions_active_end_date", "end_date", postgresql_where=text("status = 'ACTIVE'")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -102,6 +122,10 @@ class Meal(Base):
 
 class DailyMealAssignment(Base):
     __tablename__ = "daily_meal_assignments"
+    __table_args__ = (
+        Index("ix_daily_meal_assignments_user_date", "user_id", "assignment_date"),
+        Index("ix_daily_meal_assignments_assignment_date", "assignment_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -118,6 +142,11 @@ class DailyMealAssignment(Base):
 
 class Complaint(Base):
     __tablename__ = "complaints"
+    __table_args__ = (
+        Index("ix_complaints_user_id", "user_id"),
+        Index("ix_complaints_status", "status"),
+        Index("ix_complaints_created_at", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -135,6 +164,9 @@ class Complaint(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_subscription_id", "subscription_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -149,3 +181,61 @@ class Payment(Base):
     user = relationship("User", back_populates="payments")
     subscription = relationship("UserSubscription", back_populates="payments")
 
+
+class MetricCounter(Base):
+    __tablename__ = "metric_counters"
+
+    name = Column(String(100), primary_key=True)
+    # Writers add to a random slot so concurrent transactions do not queue on one row; readers sum.
+    slot = Column(SmallInteger, primary_key=True, server_default=text("0"))
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+
+class DailyMetric(Base):
+    __tablename__ = "daily_metrics"
+
+    metric_date = Column(Date, primary_key=True)
+    name = Column(String(100), primary_key=True)
+    slot = Column(SmallInteger, primary_key=True, server_default=text("0"))
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class Job(Base):
+    """A queued side effect; see ``services.jobs``. Finished jobs are deleted, failed ones kept."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_ready", "run_at", "id", postgresql_where=text("status IN ('QUEUED', 'RUNNING')")),
+        Index("ix_jobs_status_kind", "status", "kind"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default="QUEUED")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    # When a QUEUED job becomes due, or when a RUNNING job's lease expires.
+    run_at = Column(DateTime, nullable=False, default=utcnow)
+    locked_by = Column(String(100))
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+
+class IdempotencyKey(Base):
+    """The stored response of a write sent with an ``Idempotency-Key``; see ``services.idempotency``."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    # Written in the same transaction as the key row, so a committed row always has them.
+    status_code = Column(Integer)
+    response = Column(Text)  # the rendered JSON body, replayed byte for byte
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    expires_at = Column(DateTime, nullable=False)
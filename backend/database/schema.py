@@ -0,0 +1,63 @@
+"""Alembic helpers: apply migrations from code and adopt legacy databases.
+
+The schema is owned by ``migrations/``; deploys run ``python -m database.schema``
+(migrate + seed) once before starting the app, or let ``serve.py`` do it.
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from database.database import engine
+from database.seed import seed_metric_counters, seed_subscription_plans
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Revision matching the tables that ``Base.metadata.create_all`` used to build.
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(configure_logger: bool = True) -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    config.attributes["configure_logger"] = configure_logger
+    return config
+
+
+def upgrade_to_head(configure_logger: bool = True) -> None:
+    """Migrate to the latest revision.
+
+    A database created by the old ``create_all`` bootstrap has the tables but no
+    ``alembic_version`` row; it is stamped at the baseline first so only the
+    later revisions run against it.
+    """
+    config = alembic_config(configure_logger)
+    tables = set(inspect(engine).get_table_names())
+    if "alembic_version" not in tables and "users" in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+
+def ensure_at_head() -> None:
+    """Refuse to serve against a schema that is behind (or ahead of) the code."""
+    head = ScriptDirectory.from_config(alembic_config(configure_logger=False)).get_current_head()
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    if current != head:
+        raise RuntimeError(f"Database schema is at revision {current}, code expects {head}; run `alembic upgrade head`")
+
+
+def prepare_database(migrate: bool = True, configure_logger: bool = False) -> None:
+    """One-time deploy work: migrate (or verify) the schema, then seed reference data."""
+    if migrate:
+        upgrade_to_head(configure_logger)
+    else:
+        ensure_at_head()
+    seed_subscription_plans()
+    seed_metric_counters()
+
+
+if __name__ == "__main__":
+    prepare_database(configure_logger=True)
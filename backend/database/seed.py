@@ -0,0 +1,55 @@
+"""Reference data every deployment needs (default subscription plans, dashboard counters)."""
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from database.models import SubscriptionPlan
+from schemas import SubscriptionPlan as SubscriptionPlanSchema
+from services import metrics
+
+
+def seed_subscription_plans():
+    defaults: List[SubscriptionPlanSchema] = [
+        SubscriptionPlanSchema(
+            id=0,
+            name="Weekly Wellness",
+            duration_days=7,
+            price_per_day=18.0,
+            description="7-day sampler with balanced meals.",
+            is_active=True,
+        ),
+        SubscriptionPlanSchema(
+            id=0,
+            name="Monthly Momentum",
+            duration_days=28,
+            price_per_day=15.0,
+            description="Best for habit building with premium nutrition.",
+            is_active=True,
+        ),
+    ]
+    db: Session = SessionLocal()
+    try:
+        if db.query(SubscriptionPlan).count() == 0:
+            for plan in defaults:
+                db.add(
+                    SubscriptionPlan(
+                        name=plan.name,
+                        duration_days=plan.duration_days,
+                        price_per_day=plan.price_per_day,
+                        description=plan.description,
+                        is_active=plan.is_active,
+                    )
+                )
+            db.commit()
+    finally:
+        db.close()
+
+
+def seed_metric_counters():
+    """Store the dashboard counters on the primary so replica reads of the dashboard find them."""
+    db: Session = SessionLocal()
+    try:
+        metrics.bootstrap(db)
+    finally:
+        db.close()
@@ -1,20 +1,17 @@
 """FastAPI entrypoint for the VitalPlate backend service."""
-from typing import List
-
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse
 
-from database.database import Base, SessionLocal, engine, get_db
-from database.models import SubscriptionPlan
+from auth.google_oauth import close_http_client, start_http_client
+from database.database import PrimaryPinMiddleware, named_engines, replica_urls
 from routes import admin, auth, complaints, meals, subscriptions, users
-from schemas import SubscriptionPlan as SubscriptionPlanSchema
+from utils import invalidation, telemetry
+from utils.pagination import NEXT_CURSOR_HEADER
 from utils.settings import get_settings
 
 settings = get_settings()
 
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="Meal Personalization API",
     version="1.0.0",
@@ -27,7 +24,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+if replica_urls:
+    app.add_middleware(PrimaryPinMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(telemetry.MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/api/auth")
 app.include_router(users.router, prefix="/api/users")
@@ -37,46 +39,36 @@ app.include_router(complaints.router, prefix="/api/complaints")
 app.include_router(admin.router, prefix="/api/admin")
 
 
-def seed_subscription_plans():
-    defaults: List[SubscriptionPlanSchema] = [
-        SubscriptionPlanSchema(
-            id=0,
-            name="Weekly Wellness",
-            duration_days=7,
-            price_per_day=18.0,
-            description="7-day sampler with balanced meals.",
-            is_active=True,
-        ),
-        SubscriptionPlanSchema(
-            id=0,
-            name="Monthly Momentum",
-            duration_days=28,
-            price_per_day=15.0,
-            description="Best for habit building with premium nutrition.",
-            is_active=True,
-        ),
-    ]
-    db: Session = SessionLocal()
-    try:
-        if db.query(SubscriptionPlan).count() == 0:
-            for plan in defaults:
-                db.add(
-                    SubscriptionPlan(
-                        name=plan.name,
-                        duration_days=plan.duration_days,
-                        price_per_day=plan.price_per_day,
-                        description=plan.description,
-                        is_active=plan.is_active,
-                    )
-                )
-            db.commit()
-    finally:
-        db.close()
+@app.on_event("startup")
+def on_startup():
+    # One-time deploy work; ``serve.py`` runs it once in the master and disables it in workers.
+    if settings.startup_tasks:
+        from database.schema import prepare_database  # keeps alembic off the worker import path
+
+        prepare_database(migrate=settings.auto_migrate)
 
 
 @app.on_event("startup")
-def on_startup():
-    seed_subscription_plans()
+def start_metrics_writer():
+    # Runs in every worker after the fork; a no-op unless ``serve.py`` enabled multiprocess metrics.
+    if settings.metrics_enabled:
+        telemetry.start_writer(named_engines)
+
+
+@app.on_event("startup")
+def start_cache_invalidation_listener():
+    # One per worker, after the fork: writes from other workers, jobs and CLIs clear this worker's caches.
+    invalidation.start_listener()
+
+
+@app.on_event("startup")
+async def open_http_client():
+    await start_http_client()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_http_client()
 
 
 @app.get("/", summary="Service info")
@@ -88,3 +80,8 @@ def root():
 def health():
     return {"status": "healthy"}
 
+
+@app.get("/metrics", summary="Prometheus metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(telemetry.render(named_engines()), media_type=telemetry.CONTENT_TYPE)
+
@@ -0,0 +1,146 @@
+"""initial schema
+
+Tables as previously created by ``Base.metadata.create_all``. Databases that
+were bootstrapped that way are adopted by stamping this revision (see
+``database/schema.py``).
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:05:55.225881
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('meals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('meal_type', sa.String(length=50), nullable=False),
+    sa.Column('ingredients', sa.ARRAY(sa.String()), nullable=False),
+    sa.Column('calories', sa.Integer(), nullable=False),
+    sa.Column('protein_g', sa.Float(), nullable=True),
+    sa.Column('carbs_g', sa.Float(), nullable=True),
+    sa.Column('fats_g', sa.Float(), nullable=True),
+    sa.Column('dietary_tags', sa.ARRAY(sa.String()), nullable=True),
+    sa.Column('is_vegetarian', sa.Boolean(), nullable=True),
+    sa.Column('spice_level', sa.String(length=50), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_meals_id'), 'meals', ['id'], unique=False)
+    op.create_table('subscription_plans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('duration_days', sa.Integer(), nullable=False),
+    sa.Column('price_per_day', sa.Float(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_subscription_plans_id'), 'subscription_plans', ['id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('google_id', sa.String(length=255), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('gender', sa.String(length=50), nullable=True),
+    sa.Column('height_cm', sa.Float(), nullable=True),
+    sa.Column('weight_kg', sa.Float(), nullable=True),
+    sa.Column('dietary_preference', sa.String(length=50), nullable=True),
+    sa.Column('spice_level', sa.String(length=50), nullable=True),
+    sa.Column('allergies', sa.ARRAY(sa.String()), nullable=True),
+    sa.Column('disliked_foods', sa.ARRAY(sa.String()), nullable=True),
+    sa.Column('health_conditions', sa.ARRAY(sa.String()), nullable=True),
+    sa.Column('health_goals', sa.String(length=100), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('google_id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('daily_meal_assignments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('meal_id', sa.Integer(), nullable=False),
+    sa.Column('assignment_date', sa.Date(), nullable=False),
+    sa.Column('delivery_status', sa.String(length=50), nullable=True),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['meal_id'], ['meals.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_daily_meal_assignments_id'), 'daily_meal_assignments', ['id'], unique=False)
+    op.create_table('user_subscriptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['plan_id'], ['subscription_plans.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_subscriptions_id'), 'user_subscriptions', ['id'], unique=False)
+    op.create_table('complaints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('assignment_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('admin_notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['assignment_id'], ['daily_meal_assignments.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_complaints_id'), 'complaints', ['id'], unique=False)
+    op.create_table('payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(length=10), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('payment_method', sa.String(length=50), nullable=True),
+    sa.Column('transaction_id', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['subscription_id'], ['user_subscriptions.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_payments_id'), 'payments', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_payments_id'), table_name='payments')
+    op.drop_table('payments')
+    op.drop_index(op.f('ix_complaints_id'), table_name='complaints')
+    op.drop_table('complaints')
+    op.drop_index(op.f('ix_user_subscriptions_id'), table_name='user_subscriptions')
+    op.drop_table('user_subscriptions')
+    op.drop_index(op.f('ix_daily_meal_assignments_id'), table_name='daily_meal_assignments')
+    op.drop_table('daily_meal_assignments')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_subscription_plans_id'), table_name='subscription_plans')
+    op.drop_table('subscription_plans')
+    op.drop_index(op.f('ix_meals_id'), table_name='meals')
+    op.drop_table('meals')
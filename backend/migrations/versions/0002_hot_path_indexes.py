@@ -0,0 +1,51 @@
+"""hot path indexes
+
+Covers the per-user reads (today/upcoming meals, current subscription, own
+complaints), payment lookups by subscription, the admin complaint/customer
+listings and the date-keyed planner/expiry scans. Built ``CONCURRENTLY`` so
+applying this to a live database does not block writes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:20:12.104318
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_daily_meal_assignments_user_date", "daily_meal_assignments", ["user_id", "assignment_date"], None),
+    ("ix_daily_meal_assignments_assignment_date", "daily_meal_assignments", ["assignment_date"], None),
+    ("ix_user_subscriptions_user_status_end", "user_subscriptions", ["user_id", "status", "end_date"], None),
+    ("ix_user_subscriptions_active_end_date", "user_subscriptions", ["end_date"], "status = 'ACTIVE'"),
+    ("ix_complaints_user_id", "complaints", ["user_id"], None),
+    ("ix_complaints_status", "complaints", ["status"], None),
+    ("ix_complaints_created_at", "complaints", ["created_at", "id"], None),
+    ("ix_payments_subscription_id", "payments", ["subscription_id"], None),
+    ("ix_users_created_at", "users", ["created_at", "id"], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,89 @@
+"""user preference signature
+
+Adds ``users.preference_signature`` (see
+``services.meal_index.preference_signature``), backfills it in id batches and
+indexes it ``CONCURRENTLY`` so the planner and reports can group users by
+their effective dietary constraints. The backfill uses a frozen copy of the
+signature function, so later changes to the app code do not change what this
+revision writes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:02:41.518204
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 5000
+SPICE_LEVELS = {"MILD": 0, "MEDIUM": 1, "HOT": 2}
+NO_PREFERENCE = {"", "none", "any", "omnivore", "non-vegetarian", "non_vegetarian", "nonveg"}
+
+SELECT_BATCH = sa.text(
+    "SELECT id, dietary_preference, spice_level, allergies, disliked_foods FROM users "
+    "WHERE id > :after ORDER BY id LIMIT :limit"
+)
+UPDATE_BATCH = sa.text(
+    "UPDATE users SET preference_signature = v.signature "
+    "FROM unnest(:ids, :signatures) AS v(id, signature) WHERE users.id = v.id"
+).bindparams(
+    sa.bindparam("ids", type_=postgresql.ARRAY(sa.Integer())),
+    sa.bindparam("signatures", type_=postgresql.ARRAY(sa.String())),
+)
+
+
+def _normalize(value):
+    return " ".join((value or "").lower().split())
+
+
+def preference_signature(dietary_preference, spice_level, allergies, disliked_foods):
+    """``services.meal_index.preference_signature`` as of this revision."""
+    preference = _normalize(dietary_preference)
+    avoid = sorted({_normalize(term) for term in list(allergies or []) + list(disliked_foods or [])} - {""})
+    spice = SPICE_LEVELS.get((spice_level or "").strip().upper(), max(SPICE_LEVELS.values()))
+    canonical = "\x1f".join(["" if preference in NO_PREFERENCE else preference, str(spice)] + avoid)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('preference_signature', sa.String(length=32), nullable=True))
+    connection = op.get_bind()
+    after = 0
+    while True:
+        rows = connection.execute(SELECT_BATCH, {"after": after, "limit": BACKFILL_BATCH}).all()
+        if not rows:
+            break
+        connection.execute(
+            UPDATE_BATCH,
+            {
+                "ids": [row.id for row in rows],
+                "signatures": [
+                    preference_signature(row.dietary_preference, row.spice_level, row.allergies, row.disliked_foods)
+                    for row in rows
+                ],
+            },
+        )
+        after = rows[-1].id
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_preference_signature',
+            'users',
+            ['preference_signature'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_preference_signature', table_name='users', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('users', 'preference_signature')
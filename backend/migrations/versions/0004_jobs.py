@@ -0,0 +1,52 @@
+"""jobs
+
+Adds the ``jobs`` table behind ``services.jobs``: request handlers insert rows
+in their own transaction and worker processes claim due rows with
+``FOR UPDATE SKIP LOCKED``. The partial index covers only queued and running
+rows, so it stays small however many failed jobs are kept.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:14:09.337120
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(length=100), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_jobs_ready',
+        'jobs',
+        ['run_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')"),
+    )
+    op.create_index('ix_jobs_status_kind', 'jobs', ['status', 'kind'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_kind', table_name='jobs')
+    op.drop_index('ix_jobs_ready', table_name='jobs', postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')"))
+    op.drop_table('jobs')
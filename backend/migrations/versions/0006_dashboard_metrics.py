@@ -0,0 +1,45 @@
+"""dashboard metrics
+
+Adds ``metric_counters`` and ``daily_metrics`` (see ``services.metrics``).
+They are not part of the ``0001`` baseline, which is what a legacy database is
+stamped at. Databases that already have them (bootstrapped with ``create_all``
+after the tables were introduced, or migrated while ``0001`` still created
+them) keep theirs; only missing tables are created.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:21:09.640318
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'metric_counters' not in existing:
+        op.create_table(
+            'metric_counters',
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('value', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('name'),
+        )
+    if 'daily_metrics' not in existing:
+        op.create_table(
+            'daily_metrics',
+            sa.Column('metric_date', sa.Date(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('value', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('metric_date', 'name'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_metrics')
+    op.drop_table('metric_counters')
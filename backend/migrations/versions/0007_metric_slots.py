@@ -0,0 +1,60 @@
+"""metric slots
+
+Adds ``slot`` to the primary keys of ``metric_counters`` and ``daily_metrics``.
+Each ``services.metrics.record`` call adds its deltas to a random slot, so
+concurrent write transactions stop serializing on one row per metric. Readers
+sum the slots. Existing rows become slot 0.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:58:37.115902
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('metric_counters', sa.Column('slot', sa.SmallInteger(), server_default=sa.text('0'), nullable=False))
+    op.drop_constraint('metric_counters_pkey', 'metric_counters', type_='primary')
+    op.create_primary_key('metric_counters_pkey', 'metric_counters', ['name', 'slot'])
+    op.add_column('daily_metrics', sa.Column('slot', sa.SmallInteger(), server_default=sa.text('0'), nullable=False))
+    op.drop_constraint('daily_metrics_pkey', 'daily_metrics', type_='primary')
+    op.create_primary_key('daily_metrics_pkey', 'daily_metrics', ['metric_date', 'name', 'slot'])
+
+
+def downgrade() -> None:
+    # Fold the slots back into slot 0 before the column goes away.
+    op.execute(
+        "UPDATE metric_counters AS c SET value = s.value FROM ("
+        "SELECT name, sum(value) AS value FROM metric_counters GROUP BY name) AS s "
+        "WHERE c.name = s.name AND c.slot = 0"
+    )
+    op.execute(
+        "INSERT INTO metric_counters (name, slot, value, updated_at) "
+        "SELECT name, 0, sum(value), max(updated_at) FROM metric_counters GROUP BY name "
+        "HAVING bool_and(slot <> 0)"
+    )
+    op.execute("DELETE FROM metric_counters WHERE slot <> 0")
+    op.execute(
+        "UPDATE daily_metrics AS d SET value = s.value FROM ("
+        "SELECT metric_date, name, sum(value) AS value FROM daily_metrics GROUP BY metric_date, name) AS s "
+        "WHERE d.metric_date = s.metric_date AND d.name = s.name AND d.slot = 0"
+    )
+    op.execute(
+        "INSERT INTO daily_metrics (metric_date, name, slot, value) "
+        "SELECT metric_date, name, 0, sum(value) FROM daily_metrics GROUP BY metric_date, name "
+        "HAVING bool_and(slot <> 0)"
+    )
+    op.execute("DELETE FROM daily_metrics WHERE slot <> 0")
+    op.drop_constraint('daily_metrics_pkey', 'daily_metrics', type_='primary')
+    op.create_primary_key('daily_metrics_pkey', 'daily_metrics', ['metric_date', 'name'])
+    op.drop_column('daily_metrics', 'slot')
+    op.drop_constraint('metric_counters_pkey', 'metric_counters', type_='primary')
+    op.create_primary_key('metric_counters_pkey', 'metric_counters', ['name'])
+    op.drop_column('metric_counters', 'slot')
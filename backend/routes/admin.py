@@ -1,113 +1,467 @@
-from typing import Dict, List
+from datetime import date, datetime, time, timedelta
+from typing import List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, true
 from sqlalchemy.orm import Session
 
-from auth.jwt_handler import get_current_user
-from database.database import get_db
-from database.models import Complaint, Meal, User, UserSubscription
-from schemas import ComplaintResponse, MealCreate, MealResponse, MealUpdate, UserResponse
+from auth.jwt_handler import get_read_session
+from database.database import get_session, pin_to_primary, pool_statistics, run_db
+from database.models import Complaint, Meal, SubscriptionPlan, User, UserSubscription
+from schemas import (
+    AdminCustomer,
+    ComplaintResponse,
+    DeliveryStatusBatch,
+    DeliveryStatusBatchResponse,
+    JobQueueStats,
+    KitchenManifest,
+    MealCreate,
+    MealResponse,
+    MealUpdate,
+    NutritionFitReport,
+    SignatureReport,
+    UserResponse,
+)
+from services import jobs, manifest, meal_planner, metrics, nutrition, replanner, response_cache
+from services.deliveries import apply_transitions
+from services.exports import EXPORT_DATASETS, MEDIA_TYPES, stream_export_in_session
+from services.meal_index import IndexedMeal, meal_index, notify_meals
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    finish_page,
+    keyset_page,
+    parse_sort,
+    set_next_cursor,
+)
 from utils.security import admin_required
 
 router = APIRouter(tags=["admin"])
 
 
 @router.get("/dashboard", summary="Admin dashboard metrics")
-def dashboard_metrics(
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+async def dashboard_metrics(
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
 ):
-    total_users = db.query(func.count(User.id)).scalar()
-    active_subscriptions = (
-        db.query(func.count(UserSubscription.id))
-        .filter(UserSubscription.status == "ACTIVE")
-        .scalar()
-    )
-    pending_complaints = (
-        db.query(func.count(Complaint.id))
-        .filter(Complaint.status == "OPEN")
-        .scalar()
-    )
-    return {
-        "total_users": total_users,
-        "active_subscriptions": active_subscriptions,
-        "pending_complaints": pending_complaints,
-    }
+    return await run_db(db, metrics.dashboard)
 
 
-@router.get("/customers", response_model=List[UserResponse], summary="List customers")
-def list_customers(
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+@router.get(
+    "/dashboard/history",
+    summary="Daily dashboard series",
+    description="Signups, confirmed deliveries, complaints opened/resolved and subscriptions started/expired per day.",
+)
+async def dashboard_history(
+    days: int = Query(30, ge=1, le=365),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
 ):
-    return db.query(User).all()
+    return await run_db(db, metrics.history, days)
+
+
+@router.get(
+    "/pool",
+    summary="Database connection pool statistics",
+    description="Pool size, checked-out and overflow connections, checkout timeouts and a checkout wait-time "
+    "histogram (seconds). Figures are per worker process; `pid` identifies which one answered.",
+)
+async def pool_stats(_: UserResponse = Depends(admin_required)):
+    return pool_statistics()
+
+
+def customers_query(subscription_status: Optional[str] = None):
+    """Customers joined to their latest subscription (LATERAL, one index probe per user)."""
+    latest = (
+        select(
+            UserSubscription.status.label("subscription_status"),
+            UserSubscription.end_date.label("subscription_end"),
+            SubscriptionPlan.name.label("current_plan"),
+        )
+        .join(SubscriptionPlan, SubscriptionPlan.id == UserSubscription.plan_id)
+        .where(UserSubscription.user_id == User.id)
+        .order_by(UserSubscription.end_date.desc(), UserSubscription.id.desc())
+        .limit(1)
+        .lateral("latest_subscription")
+    )
+    query = select(
+        User.id,
+        User.name,
+        User.email,
+        User.is_admin,
+        User.created_at,
+        latest.c.current_plan,
+        latest.c.subscription_end,
+        latest.c.subscription_status,
+    ).outerjoin(latest, true())
+    if subscription_status == "NONE":
+        query = query.where(latest.c.subscription_status.is_(None))
+    elif subscription_status:
+        query = query.where(latest.c.subscription_status == subscription_status)
+    return query
 
 
-@router.get("/meals", response_model=List[MealResponse], summary="List meals")
-def list_meals(
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+def _list_customers(
+    db: Session,
+    limit: int,
+    cursor: Optional[str],
+    sort: str,
+    subscription_status: Optional[str],
+) -> Tuple[List[AdminCustomer], Optional[str]]:
+    field, descending = parse_sort(sort)
+    query = customers_query(subscription_status)
+    columns = [User.created_at, User.id] if field == "created_at" else [User.id]
+    rows = db.execute(keyset_page(query, columns, descending, cursor, limit)).all()
+    rows, next_cursor = finish_page(rows, [column.key for column in columns], limit)
+    return [AdminCustomer.model_validate(row) for row in rows], next_cursor
+
+
+@router.get(
+    "/customers",
+    response_model=List[AdminCustomer],
+    summary="List customers",
+    description="Keyset-paginated; pass the `X-Next-Cursor` response header back as `cursor` for the next page. "
+    "`subscription_status=NONE` selects customers who never subscribed.",
+)
+async def list_customers(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    sort: Literal["id", "-id", "created_at", "-created_at"] = Query("id"),
+    subscription_status: Optional[str] = Query(None),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
 ):
-    return db.query(Meal).all()
+    customers, next_cursor = await run_db(db, _list_customers, limit, cursor, sort, subscription_status)
+    set_next_cursor(response, next_cursor)
+    return customers
 
 
-@router.post("/meals", response_model=MealResponse, status_code=status.HTTP_201_CREATED, summary="Create meal")
-def create_meal(
-    payload: MealCreate,
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+def _list_meals(
+    db: Session,
+    limit: int,
+    cursor: Optional[str],
+    sort: str,
+    meal_type: Optional[str],
+    is_active: Optional[bool],
+) -> Tuple[List[MealResponse], Optional[str]]:
+    field, descending = parse_sort(sort)
+    query = select(Meal)
+    if meal_type:
+        query = query.where(Meal.meal_type == meal_type)
+    if is_active is not None:
+        query = query.where(Meal.is_active.is_(is_active))
+    columns = [Meal.created_at, Meal.id] if field == "created_at" else [Meal.id]
+    meals = db.scalars(keyset_page(query, columns, descending, cursor, limit)).all()
+    meals, next_cursor = finish_page(meals, [column.key for column in columns], limit)
+    return [MealResponse.model_validate(meal) for meal in meals], next_cursor
+
+
+@router.get(
+    "/meals",
+    response_model=List[MealResponse],
+    summary="List meals",
+    description="Keyset-paginated; pass the `X-Next-Cursor` response header back as `cursor` for the next page.",
+)
+async def list_meals(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    sort: Literal["id", "-id", "created_at", "-created_at"] = Query("id"),
+    meal_type: Optional[str] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
 ):
+    meals, next_cursor = await run_db(db, _list_meals, limit, cursor, sort, meal_type, is_active)
+    set_next_cursor(response, next_cursor)
+    return meals
+
+
+def _create_meal(db: Session, payload: MealCreate) -> MealResponse:
     meal = Meal(**payload.model_dump())
     db.add(meal)
+    db.flush()
+    notify_meals(db, [meal.id])
+    response_cache.notify_user_views(db)
     db.commit()
     db.refresh(meal)
-    return meal
+    if meal_index.is_loaded:
+        meal_index.upsert(meal)
+    response_cache.invalidate_all_user_views()  # recommendations include new meals
+    return MealResponse.model_validate(meal)
 
 
-@router.put("/meals/{meal_id}", response_model=MealResponse, summary="Update meal")
-def update_meal(
-    meal_id: int,
-    payload: MealUpdate,
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+@router.post("/meals", response_model=MealResponse, status_code=status.HTTP_201_CREATED, summary="Create meal")
+async def create_meal(
+    payload: MealCreate,
+    db: Session = Depends(get_session),
+    admin: UserResponse = Depends(admin_required),
 ):
+    meal = await run_db(db, _create_meal, payload)
+    pin_to_primary(admin.id)
+    return meal
+
+
+def _update_meal(db: Session, meal_id: int, payload: MealUpdate) -> MealResponse:
     meal = db.query(Meal).filter(Meal.id == meal_id).first()
     if not meal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Meal not found")
+    before = IndexedMeal.from_meal(meal)
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(meal, field, value)
     db.add(meal)
-    db.commit()
+    db.flush()
+    notify_meals(db, [meal.id])
+    response_cache.notify_user_views(db)
+    if replanner.meal_tightened(before, IndexedMeal.from_meal(meal)):
+        # Swap the meal out of schedules it is no longer safe for, in the same commit.
+        replanner.replan(db, meal_ids=[meal.id])
+    else:
+        db.commit()
     db.refresh(meal)
+    if meal_index.is_loaded:
+        meal_index.upsert(meal)
+    response_cache.invalidate_all_user_views()  # assignment views embed the meal
+    manifest.invalidate()
+    return MealResponse.model_validate(meal)
+
+
+@router.put("/meals/{meal_id}", response_model=MealResponse, summary="Update meal")
+async def update_meal(
+    meal_id: int,
+    payload: MealUpdate,
+    db: Session = Depends(get_session),
+    admin: UserResponse = Depends(admin_required),
+):
+    meal = await run_db(db, _update_meal, meal_id, payload)
+    pin_to_primary(admin.id)
     return meal
 
 
-@router.get("/complaints", response_model=List[ComplaintResponse], summary="List complaints")
-def list_all_complaints(
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+def _update_delivery_statuses(db: Session, payload: DeliveryStatusBatch) -> DeliveryStatusBatchResponse:
+    results, users = apply_transitions(db, payload.transitions)
+    response_cache.invalidate_user_views(*users)
+    return DeliveryStatusBatchResponse(results=results)
+
+
+@router.post(
+    "/deliveries/status",
+    response_model=DeliveryStatusBatchResponse,
+    summary="Bulk delivery status update",
+    description="Applies each transition (`OUT_FOR_DELIVERY`, `DELIVERED`, `FAILED`) to up to 50,000 `assignment_ids`, "
+    "or to every assignment on `assignment_date` (optionally one `meal_type`), in one transaction. Per transition the "
+    "response lists `updated` ids and, for id lists, ids that were `unchanged`, `rejected` (with their current status) "
+    "or `not_found`.",
+)
+async def update_delivery_statuses(
+    payload: DeliveryStatusBatch,
+    db: Session = Depends(get_session),
+    admin: UserResponse = Depends(admin_required),
 ):
-    return db.query(Complaint).all()
+    response = await run_db(db, _update_delivery_statuses, payload)
+    pin_to_primary(admin.id)
+    return response
 
 
-@router.put(
-    "/complaints/{complaint_id}/resolve",
-    response_model=ComplaintResponse,
-    summary="Resolve complaint",
+def _kitchen_manifest(db: Session, date_from: date, date_to: date) -> KitchenManifest:
+    try:
+        return manifest.build_manifest(db, date_from, date_to)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+
+
+@router.get(
+    "/manifest",
+    response_model=KitchenManifest,
+    summary="Kitchen production manifest",
+    description="Portions per meal and per ingredient, grouped by day and meal type, for `date_from`..`date_to` "
+    f"(inclusive, default today, at most {manifest.MAX_MANIFEST_DAYS} days). Past days are cached.",
 )
-def resolve_complaint(
-    complaint_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_required),
+async def kitchen_manifest(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
+):
+    date_from = date_from or date.today()
+    return await run_db(db, _kitchen_manifest, date_from, date_to or date_from)
+
+
+@router.get(
+    "/nutrition/fit",
+    response_model=NutritionFitReport,
+    summary="Nutrition fit audit",
+    description="How close each user's assigned meals on `date` (default today) come to their calorie/macro "
+    "targets, with the `worst` fits listed.",
+)
+async def nutrition_fit(
+    target_date: Optional[date] = Query(None, alias="date"),
+    worst: int = Query(20, ge=0, le=500),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
+):
+    return await run_db(db, nutrition.fit_report, target_date or date.today(), worst)
+
+
+@router.get(
+    "/planner/signatures",
+    response_model=SignatureReport,
+    summary="Preference signature groups",
+    description="Users, distinct preference signatures (the planner computes eligibility once per signature), "
+    "the `largest` groups and this worker's signature eligibility cache hit rate.",
+)
+async def planner_signatures(
+    largest: int = Query(20, ge=0, le=500),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
+):
+    return await run_db(db, meal_planner.signature_report, largest)
+
+
+@router.get(
+    "/jobs",
+    response_model=JobQueueStats,
+    summary="Background job queue",
+    description="Jobs per status and kind, how many are due and how long the oldest has waited, and the latest "
+    "`failures` (jobs that used up their attempts).",
+)
+async def job_queue(
+    failures: int = Query(20, ge=0, le=500),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
 ):
-    complaint = db.query(Complaint).filter(Complaint.id == complaint_id).first()
+    return await run_db(db, jobs.stats, failures)
+
+
+@router.post(
+    "/jobs/{job_id}/retry",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Retry a failed job",
+    description="Queues a FAILED job again with a fresh attempt budget.",
+)
+async def retry_job(
+    job_id: int,
+    db: Session = Depends(get_session),
+    admin: UserResponse = Depends(admin_required),
+):
+    if not await run_db(db, jobs.retry_failed, job_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Failed job not found")
+    pin_to_primary(admin.id)
+
+
+def _list_all_complaints(
+    db: Session,
+    limit: int,
+    cursor: Optional[str],
+    sort: str,
+    complaint_status: Optional[str],
+    complaint_type: Optional[str],
+    created_from: Optional[date],
+    created_to: Optional[date],
+) -> Tuple[List[ComplaintResponse], Optional[str]]:
+    field, descending = parse_sort(sort)
+    query = select(Complaint)
+    if complaint_status:
+        query = query.where(Complaint.status == complaint_status)
+    if complaint_type:
+        query = query.where(Complaint.type == complaint_type)
+    if created_from:
+        query = query.where(Complaint.created_at >= datetime.combine(created_from, time.min))
+    if created_to:
+        query = query.where(Complaint.created_at < datetime.combine(created_to + timedelta(days=1), time.min))
+    columns = [Complaint.created_at, Complaint.id] if field == "created_at" else [Complaint.id]
+    complaints = db.scalars(keyset_page(query, columns, descending, cursor, limit)).all()
+    complaints, next_cursor = finish_page(complaints, [column.key for column in columns], limit)
+    return [ComplaintResponse.model_validate(complaint) for complaint in complaints], next_cursor
+
+
+@router.get(
+    "/complaints",
+    response_model=List[ComplaintResponse],
+    summary="List complaints",
+    description="Keyset-paginated; pass the `X-Next-Cursor` response header back as `cursor` for the next page. "
+    "`created_from`/`created_to` are inclusive dates.",
+)
+async def list_all_complaints(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    sort: Literal["id", "-id", "created_at", "-created_at"] = Query("-created_at"),
+    complaint_status: Optional[str] = Query(None, alias="status"),
+    complaint_type: Optional[str] = Query(None, alias="type"),
+    created_from: Optional[date] = Query(None),
+    created_to: Optional[date] = Query(None),
+    db: Session = Depends(get_read_session),
+    _: UserResponse = Depends(admin_required),
+):
+    complaints, next_cursor = await run_db(
+        db,
+        _list_all_complaints,
+        limit,
+        cursor,
+        sort,
+        complaint_status,
+        complaint_type,
+        created_from,
+        created_to,
+    )
+    set_next_cursor(response, next_cursor)
+    return complaints
+
+
+def _resolve_complaint(db: Session, complaint_id: int) -> ComplaintResponse:
+    complaint = (
+        db.query(Complaint)
+        .filter(Complaint.id == complaint_id)
+        .with_for_update()  # concurrent resolves decrement pending_complaints once
+        .first()
+    )
     if not complaint:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Complaint not found")
+    if complaint.status == "OPEN":
+        metrics.record(db, counters={"pending_complaints": -1}, series={"complaints_resolved": 1})
+        complaint.resolved_at = datetime.utcnow()
     complaint.status = "RESOLVED"
     complaint.admin_notes = "Resolved by admin"
     db.add(complaint)
     db.commit()
     db.refresh(complaint)
+    return ComplaintResponse.model_validate(complaint)
+
+
+@router.put(
+    "/complaints/{complaint_id}/resolve",
+    response_model=ComplaintResponse,
+    summary="Resolve complaint",
+)
+async def resolve_complaint(
+    complaint_id: int,
+    db: Session = Depends(get_session),
+    admin: UserResponse = Depends(admin_required),
+):
+    complaint = await run_db(db, _resolve_complaint, complaint_id)
+    pin_to_primary(admin.id)
     return complaint
 
+
+@router.get(
+    "/export/{dataset}",
+    summary="Stream a bulk export",
+    description="Streams every row of `customers`, `complaints`, `assignments` or `payments` as CSV or NDJSON "
+    "with constant memory. `date_from`/`date_to` (inclusive) filter on `created_at`, or `assignment_date` for assignments.",
+)
+def export_dataset(
+    dataset: Literal[EXPORT_DATASETS],
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    _: UserResponse = Depends(admin_required),
+):
+    filename = f"{dataset}.{export_format}"
+    return StreamingResponse(
+        stream_export_in_session(dataset, export_format, date_from, date_to),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,3 +1,5 @@
+from typing import Any, Dict
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
@@ -6,11 +8,14 @@ from auth.jwt_handler import (
     create_access_token,
     create_refresh_token,
     decode_token,
-    get_current_user,
+    get_current_user_snapshot,
+    load_user,
 )
-from database.database import get_db
+from database.database import get_session, run_db
 from database.models import User
 from schemas import AuthResponse, GoogleAuthRequest, RefreshRequest, TokenResponse, UserResponse
+from services import metrics
+from services.meal_index import preference_signature
 
 router = APIRouter(tags=["auth"])
 
@@ -22,27 +27,35 @@ def _issue_tokens(user: User) -> TokenResponse:
     return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
-@router.post(
-    "/google",
-    response_model=AuthResponse,
-    summary="Authenticate with Google OAuth token",
-    description="Verifies the provided Google token, creates a user if necessary, and returns JWT tokens.",
-)
-async def google_auth(payload: GoogleAuthRequest, db: Session = Depends(get_db)):
-    google_profile = await verify_google_token(payload.google_token)
-    google_id = google_profile.get("sub")
-    if not google_id:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Google token missing subject")
+def _get_or_create_user(db: Session, google_id: str, google_profile: Dict[str, Any]) -> User:
     user = db.query(User).filter(User.google_id == google_id).first()
     if not user:
         user = User(
             google_id=google_id,
             email=google_profile.get("email"),
             name=google_profile.get("name") or google_profile.get("given_name") or "Unknown User",
+            preference_signature=preference_signature(None, None, None, None),
         )
         db.add(user)
+        db.flush()
+        metrics.record(db, counters={"total_users": 1}, series={"signups": 1})
         db.commit()
         db.refresh(user)
+    return user
+
+
+@router.post(
+    "/google",
+    response_model=AuthResponse,
+    summary="Authenticate with Google OAuth token",
+    description="Verifies the provided Google token, creates a user if necessary, and returns JWT tokens.",
+)
+async def google_auth(payload: GoogleAuthRequest, db: Session = Depends(get_session)):
+    google_profile = await verify_google_token(payload.google_token)
+    google_id = google_profile.get("sub")
+    if not google_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Google token missing subject")
+    user = await run_db(db, _get_or_create_user, google_id, google_profile)
     tokens = _issue_tokens(user)
     return AuthResponse(user=UserResponse.model_validate(user), **tokens.model_dump())
 
@@ -53,13 +66,11 @@ async def google_auth(payload: GoogleAuthRequest, db: Session = Depends(get_db))
     summary="Refresh JWT access token",
     description="Uses a refresh token to issue a new access and refresh token pair.",
 )
-def refresh_token(payload: RefreshRequest, db: Session = Depends(get_db)):
+async def refresh_token(payload: RefreshRequest, db: Session = Depends(get_session)):
     claims = decode_token(payload.refresh_token)
     if claims.get("token_type") != "refresh":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-    user = db.query(User).filter(User.id == claims.get("user_id")).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user = await run_db(db, load_user, claims.get("user_id"))
     return _issue_tokens(user)
 
 
@@ -69,6 +80,6 @@ def refresh_token(payload: RefreshRequest, db: Session = Depends(get_db)):
     summary="Fetch current user profile",
     description="Returns the authenticated user's profile data.",
 )
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: UserResponse = Depends(get_current_user_snapshot)):
     return current_user
 
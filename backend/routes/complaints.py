@@ -1,53 +1,81 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
 
-from auth.jwt_handler import get_current_user
-from database.database import get_db
-from database.models import Complaint, DailyMealAssignment, User
+from auth.jwt_handler import Principal, get_current_principal, get_read_session
+from database.database import get_session, pin_to_primary, run_db
+from database.models import Complaint, DailyMealAssignment
 from schemas import ComplaintCreate, ComplaintResponse
+from services import idempotency, metrics, response_cache
 
 router = APIRouter(tags=["complaints"])
 
 
-@router.post(
-    "/",
-    response_model=ComplaintResponse,
-    status_code=status.HTTP_201_CREATED,
-    summary="Submit a complaint",
-)
-def submit_complaint(
-    payload: ComplaintCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+def _submit_complaint(db: Session, user_id: int, payload: ComplaintCreate) -> ComplaintResponse:
     assignment = (
         db.query(DailyMealAssignment)
         .filter(
             DailyMealAssignment.id == payload.assignment_id,
-            DailyMealAssignment.user_id == current_user.id,
+            DailyMealAssignment.user_id == user_id,
         )
         .first()
     )
     if not assignment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Assignment not found")
-    complaint = Complaint(user_id=current_user.id, **payload.model_dump())
+    complaint = Complaint(user_id=user_id, **payload.model_dump())
     db.add(complaint)
-    db.commit()
+    metrics.record(db, counters={"pending_complaints": 1}, series={"complaints_opened": 1})
+    response_cache.notify_user_views(db, [user_id])
+    db.flush()
     db.refresh(complaint)
+    return ComplaintResponse.model_validate(complaint)
+
+
+@router.post(
+    "/",
+    response_model=ComplaintResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Submit a complaint",
+    description="Retries carrying the same `Idempotency-Key` header get the first response back.",
+)
+async def submit_complaint(
+    payload: ComplaintCreate,
+    db: Session = Depends(get_session),
+    principal: Principal = Depends(get_current_principal),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=idempotency.MAX_KEY_LENGTH),
+):
+    replay, complaint = await run_db(
+        db,
+        idempotency.execute,
+        principal.user_id,
+        idempotency_key,
+        "POST /api/complaints",
+        payload,
+        _submit_complaint,
+        principal.user_id,
+        payload,
+        status_code=status.HTTP_201_CREATED,
+    )
+    if replay:
+        return idempotency.replay_response(replay)
+    pin_to_primary(principal.user_id)
+    response_cache.invalidate_user_views(principal.user_id)  # complaints steer recommendations
     return complaint
 
 
+def _list_complaints(db: Session, user_id: int) -> List[ComplaintResponse]:
+    complaints = db.query(Complaint).filter(Complaint.user_id == user_id).all()
+    return [ComplaintResponse.model_validate(complaint) for complaint in complaints]
+
+
 @router.get(
     "/",
     response_model=List[ComplaintResponse],
     summary="List user's complaints",
 )
-def list_complaints(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_complaints(
+    db: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_current_principal),
 ):
-    complaints = db.query(Complaint).filter(Complaint.user_id == current_user.id).all()
-    return complaints
-
+    return await run_db(db, _list_complaints, principal.user_id)
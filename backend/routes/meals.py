@@ -1,80 +1,185 @@
 from datetime import date, datetime, timedelta
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session, joinedload
 
-from auth.jwt_handler import get_current_user
-from database.database import get_db
-from database.models import DailyMealAssignment, User
-from schemas import MealAssignment
+from auth.jwt_handler import Principal, get_current_principal, get_current_user_snapshot, get_read_session
+from database.database import get_session, pin_to_primary, run_db
+from database.models import DailyMealAssignment, Meal
+from schemas import MealAssignment, MealRecommendation, MealResponse, UserResponse
+from services import idempotency, metrics, recommendations, response_cache
+from services.deliveries import CANCELLED
+from services.meal_index import get_meal_index
 
 router = APIRouter(tags=["meals"])
 
 
-@router.get("/today", response_model=List[MealAssignment], summary="Today's meals")
-def get_today_meals(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+def _today_meals(db: Session, user_id: int) -> List[MealAssignment]:
     assignments = (
         db.query(DailyMealAssignment)
+        .options(joinedload(DailyMealAssignment.meal))
         .filter(
-            DailyMealAssignment.user_id == current_user.id,
+            DailyMealAssignment.user_id == user_id,
             DailyMealAssignment.assignment_date == date.today(),
+            DailyMealAssignment.delivery_status != CANCELLED,
         )
+        .order_by(DailyMealAssignment.id)
         .all()
     )
-    return assignments
+    return [MealAssignment.model_validate(assignment) for assignment in assignments]
 
 
-@router.get(
-    "/upcoming",
-    response_model=List[MealAssignment],
-    summary="Upcoming meals",
-)
-def get_upcoming_meals(
-    days: int = Query(7, gt=0, le=30),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+@router.get("/today", response_model=List[MealAssignment], summary="Today's meals")
+async def get_today_meals(
+    request: Request,
+    db: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_current_principal),
 ):
+    return await response_cache.user_response(
+        request, principal.user_id, "today", lambda: run_db(db, _today_meals, principal.user_id)
+    )
+
+
+def _upcoming_meals(db: Session, user_id: int, days: int) -> List[MealAssignment]:
     start = date.today()
     end = start + timedelta(days=days)
     assignments = (
         db.query(DailyMealAssignment)
+        .options(joinedload(DailyMealAssignment.meal))
         .filter(
-            DailyMealAssignment.user_id == current_user.id,
+            DailyMealAssignment.user_id == user_id,
             DailyMealAssignment.assignment_date >= start,
             DailyMealAssignment.assignment_date <= end,
+            DailyMealAssignment.delivery_status != CANCELLED,
         )
         .order_by(DailyMealAssignment.assignment_date.asc())
         .all()
     )
-    return assignments
+    return [MealAssignment.model_validate(assignment) for assignment in assignments]
 
 
-@router.post(
-    "/{assignment_id}/confirm-delivery",
-    summary="Confirm meal delivery",
+@router.get(
+    "/upcoming",
+    response_model=List[MealAssignment],
+    summary="Upcoming meals",
 )
-def confirm_delivery(
-    assignment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def get_upcoming_meals(
+    request: Request,
+    days: int = Query(7, gt=0, le=30),
+    db: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_current_principal),
 ):
+    return await response_cache.user_response(
+        request, principal.user_id, ("upcoming", days), lambda: run_db(db, _upcoming_meals, principal.user_id, days)
+    )
+
+
+def _compatible_meals(db: Session, user: UserResponse, meal_type: Optional[str]) -> List[MealResponse]:
+    meal_ids = get_meal_index(db).compatible_with_user(user, meal_type=meal_type)
+    if not meal_ids:
+        return []
+    meals = db.query(Meal).filter(Meal.id.in_(meal_ids)).order_by(Meal.id).all()
+    return [MealResponse.model_validate(meal) for meal in meals]
+
+
+@router.get(
+    "/compatible",
+    response_model=List[MealResponse],
+    summary="Meals compatible with the current user",
+    description="Active meals that avoid the user's allergies and dislikes and match their diet and spice level.",
+)
+async def get_compatible_meals(
+    meal_type: Optional[str] = Query(None),
+    db: Session = Depends(get_read_session),
+    current_user: UserResponse = Depends(get_current_user_snapshot),
+):
+    return await run_db(db, _compatible_meals, current_user, meal_type)
+
+
+def _recommended_meals(
+    db: Session, user: UserResponse, meal_type: Optional[str], limit: int
+) -> List[MealRecommendation]:
+    scored = recommendations.recommend(db, user, limit, meal_type=meal_type)
+    if not scored:
+        return []
+    meals = {meal.id: meal for meal in db.query(Meal).filter(Meal.id.in_([meal_id for meal_id, _ in scored]))}
+    return [
+        MealRecommendation(meal=MealResponse.model_validate(meals[meal_id]), score=score)
+        for meal_id, score in scored
+        if meal_id in meals
+    ]
+
+
+@router.get(
+    "/recommendations",
+    response_model=List[MealRecommendation],
+    summary="Recommended meals for the current user",
+    description="Safe meals ranked by similarity to the user's profile and recent deliveries, "
+    "away from meals they complained about.",
+)
+async def get_recommended_meals(
+    request: Request,
+    meal_type: Optional[str] = Query(None),
+    limit: int = Query(10, gt=0, le=50),
+    db: Session = Depends(get_read_session),
+    current_user: UserResponse = Depends(get_current_user_snapshot),
+):
+    return await response_cache.user_response(
+        request,
+        current_user.id,
+        ("recommendations", meal_type, limit),
+        lambda: run_db(db, _recommended_meals, current_user, meal_type, limit),
+    )
+
+
+def _confirm_delivery(db: Session, user_id: int, assignment_id: int) -> dict:
     assignment = (
         db.query(DailyMealAssignment)
         .filter(
             DailyMealAssignment.id == assignment_id,
-            DailyMealAssignment.user_id == current_user.id,
+            DailyMealAssignment.user_id == user_id,
         )
+        .with_for_update()  # concurrent confirmations count the delivery once
         .first()
     )
     if not assignment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Assignment not found")
+    if assignment.delivery_status == CANCELLED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Assignment was cancelled")
+    if assignment.delivery_status != "DELIVERED":
+        metrics.record(db, series={"deliveries_confirmed": 1})
     assignment.delivery_status = "DELIVERED"
     assignment.delivered_at = datetime.utcnow()
     db.add(assignment)
-    db.commit()
+    response_cache.notify_user_views(db, [user_id])
     return {"message": "Delivery confirmed"}
 
+
+@router.post(
+    "/{assignment_id}/confirm-delivery",
+    summary="Confirm meal delivery",
+    description="Retries carrying the same `Idempotency-Key` header get the first response back.",
+)
+async def confirm_delivery(
+    assignment_id: int,
+    db: Session = Depends(get_session),
+    principal: Principal = Depends(get_current_principal),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=idempotency.MAX_KEY_LENGTH),
+):
+    replay, confirmation = await run_db(
+        db,
+        idempotency.execute,
+        principal.user_id,
+        idempotency_key,
+        f"POST /api/meals/{assignment_id}/confirm-delivery",
+        None,
+        _confirm_delivery,
+        principal.user_id,
+        assignment_id,
+    )
+    if replay:
+        return idempotency.replay_response(replay)
+    response_cache.invalidate_user_views(principal.user_id)
+    pin_to_primary(principal.user_id)
+    return confirmation
@@ -1,81 +1,115 @@
 from datetime import date, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.orm import Session, joinedload
 
-from auth.jwt_handler import get_current_user
-from database.database import get_db
-from database.models import Payment, SubscriptionPlan, User, UserSubscription
+from auth.jwt_handler import Principal, get_current_principal, get_read_session
+from database.database import get_replica_session, get_session, pin_to_primary, run_db
+from database.models import Payment, SubscriptionPlan, UserSubscription
 from schemas import SubscriptionCreate, SubscriptionPlan as SubscriptionPlanSchema, SubscriptionResponse
+from services import idempotency, jobs, metrics, response_cache
 
 router = APIRouter(tags=["subscriptions"])
 
 
-@router.get("/plans", response_model=List[SubscriptionPlanSchema], summary="List subscription plans")
-def list_plans(db: Session = Depends(get_db)):
+def _list_plans(db: Session) -> List[SubscriptionPlanSchema]:
     plans = db.query(SubscriptionPlan).filter(SubscriptionPlan.is_active.is_(True)).all()
-    return plans
+    return [SubscriptionPlanSchema.model_validate(plan) for plan in plans]
 
 
-@router.post(
-    "/subscribe",
-    response_model=SubscriptionResponse,
-    summary="Subscribe to a plan",
-)
-def subscribe(
-    payload: SubscriptionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+@router.get("/plans", response_model=List[SubscriptionPlanSchema], summary="List subscription plans")
+async def list_plans(request: Request, db: Session = Depends(get_replica_session)):
+    return await response_cache.public_response(request, response_cache.PLANS_KEY, lambda: run_db(db, _list_plans))
+
+
+def _subscribe(db: Session, user_id: int, payload: SubscriptionCreate) -> SubscriptionResponse:
     plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.id == payload.plan_id, SubscriptionPlan.is_active.is_(True)).first()
     if not plan:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found")
     start = date.today()
     end = start + timedelta(days=plan.duration_days)
     subscription = UserSubscription(
-        user_id=current_user.id,
+        user_id=user_id,
         plan_id=plan.id,
         start_date=start,
         end_date=end,
         status="ACTIVE",
     )
     db.add(subscription)
-    db.commit()
-    db.refresh(subscription)
-
-    payment = Payment(
-        user_id=current_user.id,
-        subscription_id=subscription.id,
-        amount=plan.price_per_day * plan.duration_days,
-        currency="USD",
-        status="PENDING",
-        payment_method="ONLINE",
+    db.flush()
+    db.add(
+        Payment(
+            user_id=user_id,
+            subscription_id=subscription.id,
+            amount=plan.price_per_day * plan.duration_days,
+            currency="USD",
+            status="PENDING",
+            payment_method="ONLINE",
+        )
     )
-    db.add(payment)
-    db.commit()
+    metrics.record(db, counters={"active_subscriptions": 1}, series={"subscriptions_started": 1})
+    # Planning the first week is left to a job worker; the job commits with the subscription.
+    jobs.enqueue(db, "subscription.first_week", {"subscription_id": subscription.id})
+    db.flush()
     db.refresh(subscription)
-    return subscription
+    return SubscriptionResponse.model_validate(subscription)
 
 
-@router.get(
-    "/current",
-    response_model=Optional[SubscriptionResponse],
-    summary="Current subscription",
+@router.post(
+    "/subscribe",
+    response_model=SubscriptionResponse,
+    summary="Subscribe to a plan",
+    description="Send an `Idempotency-Key` header to make retries safe: a repeated key returns the first "
+    "response instead of subscribing again.",
 )
-def get_current_subscription(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def subscribe(
+    payload: SubscriptionCreate,
+    db: Session = Depends(get_session),
+    principal: Principal = Depends(get_current_principal),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER, max_length=idempotency.MAX_KEY_LENGTH),
 ):
+    replay, subscription = await run_db(
+        db,
+        idempotency.execute,
+        principal.user_id,
+        idempotency_key,
+        "POST /api/subscriptions/subscribe",
+        payload,
+        _subscribe,
+        principal.user_id,
+        payload,
+    )
+    if replay:
+        return idempotency.replay_response(replay)
+    pin_to_primary(principal.user_id)
+    # The first week lands later, from the job worker, which notifies every API worker.
+    response_cache.invalidate_user_views(principal.user_id)
+    return subscription
+
+
+def _current_subscription(db: Session, user_id: int) -> Optional[SubscriptionResponse]:
     subscription = (
         db.query(UserSubscription)
+        .options(joinedload(UserSubscription.plan))
         .filter(
-            UserSubscription.user_id == current_user.id,
+            UserSubscription.user_id == user_id,
             UserSubscription.status == "ACTIVE",
             UserSubscription.end_date >= date.today(),
         )
         .order_by(UserSubscription.end_date.desc())
         .first()
     )
-    return subscription
+    return SubscriptionResponse.model_validate(subscription) if subscription else None
+
 
+@router.get(
+    "/current",
+    response_model=Optional[SubscriptionResponse],
+    summary="Current subscription",
+)
+async def get_current_subscription(
+    db: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_current_principal),
+):
+    return await run_db(db, _current_subscription, principal.user_id)
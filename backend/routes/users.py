@@ -3,35 +3,93 @@ from datetime import datetime
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from auth.jwt_handler import get_current_user
-from database.database import get_db
+from auth.jwt_handler import get_current_user, get_current_user_snapshot, invalidate_user, notify_user
+from database.database import get_session, pin_to_primary, run_db
 from database.models import User
-from schemas import QuizResponse, QuizSubmission, UserResponse, UserUpdate
+from schemas import NutritionTargets, QuizResponse, QuizSubmission, UserResponse, UserUpdate
+from services import nutrition, replanner, response_cache
+from services.meal_index import signature_of
 
 router = APIRouter(tags=["users"])
 
 
 @router.get("/profile", response_model=UserResponse, summary="Current user profile")
-def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(current_user: UserResponse = Depends(get_current_user_snapshot)):
     return current_user
 
 
+@router.get(
+    "/nutrition",
+    response_model=NutritionTargets,
+    summary="Daily nutrition targets",
+    description="Calorie and macro targets from the profile's body data and health goal; "
+    "`estimated` is set when defaults filled in missing body data.",
+)
+async def get_nutrition_targets(current_user: UserResponse = Depends(get_current_user_snapshot)):
+    targets = nutrition.compute_targets(
+        [
+            (
+                current_user.id,
+                current_user.age,
+                current_user.gender,
+                current_user.height_cm,
+                current_user.weight_kg,
+                current_user.health_goals,
+            )
+        ]
+    )
+    calories, protein_g, carbs_g, fats_g = (round(float(value), 1) for value in targets.daily[0])
+    return NutritionTargets(
+        calories=calories,
+        protein_g=protein_g,
+        carbs_g=carbs_g,
+        fats_g=fats_g,
+        bmr=round(float(targets.bmr[0]), 1),
+        goal=str(targets.goals[0]),
+        estimated=bool(targets.estimated[0]),
+    )
+
+
+def _apply_profile_changes(db: Session, user: User, changes: dict) -> None:
+    """Save ``changes`` and, if they tighten meal constraints, replan the user's schedule in the same commit."""
+    before = replanner.constraints_of(user)
+    for field, value in changes.items():
+        setattr(user, field, value)
+    user.preference_signature = signature_of(user)
+    db.add(user)
+    notify_user(db, user.id)
+    response_cache.notify_user_views(db, [user.id])
+    if replanner.constraints_tightened(before, replanner.constraints_of(user)):
+        db.flush()
+        replanner.replan(db, user_ids=[user.id])
+    else:
+        db.commit()
+    pin_to_primary(user.id)
+    invalidate_user(user.id)
+    response_cache.invalidate_user_views(user.id)
+
+
+def _update_profile(db: Session, user: User, payload: UserUpdate) -> UserResponse:
+    _apply_profile_changes(db, user, payload.model_dump(exclude_unset=True))
+    db.refresh(user)
+    return UserResponse.model_validate(user)
+
+
 @router.put(
     "/profile",
     response_model=UserResponse,
     summary="Update current user profile",
 )
-def update_profile(
+async def update_profile(
     payload: UserUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(current_user, field, value)
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    return await run_db(db, _update_profile, current_user, payload)
+
+
+def _submit_quiz(db: Session, user: User, payload: QuizSubmission) -> None:
+    _apply_profile_changes(db, user, payload.model_dump(exclude_unset=True))
 
 
 @router.post(
@@ -40,14 +98,10 @@ def update_profile(
     summary="Submit personalization quiz",
     description="Stores personalization preferences to tailor future meal plans.",
 )
-def submit_quiz(
+async def submit_quiz(
     payload: QuizSubmission,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(current_user, field, value)
-    db.add(current_user)
-    db.commit()
+    await run_db(db, _submit_quiz, current_user, payload)
     return QuizResponse(message="Quiz submitted successfully", submitted_at=datetime.utcnow())
-
@@ -1,8 +1,36 @@
 from .auth import AuthResponse, GoogleAuthRequest, RefreshRequest, TokenResponse
 from .complaints import ComplaintCreate, ComplaintResponse
-from .meals import MealAssignment, MealCreate, MealResponse, MealUpdate
+from .jobs import FailedJob, JobQueueStats
+from .meals import (
+    DeliveryStatusBatch,
+    DeliveryStatusBatchResponse,
+    DeliveryTransition,
+    DeliveryTransitionResult,
+    KitchenManifest,
+    ManifestDay,
+    ManifestIngredient,
+    ManifestMeal,
+    ManifestMealType,
+    MealAssignment,
+    MealCreate,
+    MealRecommendation,
+    MealResponse,
+    MealUpdate,
+    NutritionFitReport,
+    NutritionFitUser,
+    RejectedTransition,
+)
 from .subscriptions import PaymentResponse, SubscriptionCreate, SubscriptionPlan, SubscriptionResponse
-from .users import AdminCustomer, QuizResponse, QuizSubmission, UserResponse, UserUpdate
+from .users import (
+    AdminCustomer,
+    NutritionTargets,
+    QuizResponse,
+    QuizSubmission,
+    SignatureGroup,
+    SignatureReport,
+    UserResponse,
+    UserUpdate,
+)
 
 __all__ = [
     "AuthResponse",
@@ -11,17 +39,35 @@ __all__ = [
     "TokenResponse",
     "ComplaintCreate",
     "ComplaintResponse",
+    "FailedJob",
+    "JobQueueStats",
+    "DeliveryStatusBatch",
+    "DeliveryStatusBatchResponse",
+    "DeliveryTransition",
+    "DeliveryTransitionResult",
+    "KitchenManifest",
+    "ManifestDay",
+    "ManifestIngredient",
+    "ManifestMeal",
+    "ManifestMealType",
     "MealAssignment",
     "MealCreate",
+    "MealRecommendation",
     "MealResponse",
     "MealUpdate",
+    "NutritionFitReport",
+    "NutritionFitUser",
+    "RejectedTransition",
     "PaymentResponse",
     "SubscriptionCreate",
     "SubscriptionPlan",
     "SubscriptionResponse",
     "AdminCustomer",
+    "NutritionTargets",
     "QuizResponse",
     "QuizSubmission",
+    "SignatureGroup",
+    "SignatureReport",
     "UserResponse",
     "UserUpdate",
 ]
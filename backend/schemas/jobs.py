@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class FailedJob(BaseModel):
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class JobQueueStats(BaseModel):
+    queued: int
+    running: int
+    failed: int
+    due: int
+    oldest_due_seconds: Optional[float] = None
+    by_kind: Dict[str, Dict[str, int]] = {}
+    failures: List[FailedJob] = []
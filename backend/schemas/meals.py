@@ -1,7 +1,7 @@
 from datetime import date, datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class MealBase(BaseModel):
@@ -55,3 +55,99 @@ class MealAssignment(BaseModel):
 
     model_config = {"from_attributes": True}
 
+
+DeliveryStatus = Literal["OUT_FOR_DELIVERY", "DELIVERED", "FAILED"]
+MAX_BULK_DELIVERY_IDS = 50_000
+
+
+class MealRecommendation(BaseModel):
+    meal: MealResponse
+    score: float
+
+
+class DeliveryTransition(BaseModel):
+    """Move assignments to ``status``: either the listed ids, or every assignment
+    on ``assignment_date`` (optionally only one ``meal_type``)."""
+
+    status: DeliveryStatus
+    assignment_ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=MAX_BULK_DELIVERY_IDS)
+    assignment_date: Optional[date] = None
+    meal_type: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _one_selector(self):
+        if (self.assignment_ids is None) == (self.assignment_date is None):
+            raise ValueError("give either assignment_ids or assignment_date")
+        if self.meal_type is not None and self.assignment_date is None:
+            raise ValueError("meal_type narrows an assignment_date selector")
+        return self
+
+
+class DeliveryStatusBatch(BaseModel):
+    transitions: List[DeliveryTransition] = Field(..., min_length=1, max_length=10)
+
+
+class RejectedTransition(BaseModel):
+    id: int
+    delivery_status: str
+
+
+class DeliveryTransitionResult(BaseModel):
+    status: DeliveryStatus
+    updated: List[int]
+    unchanged: List[int] = []
+    rejected: List[RejectedTransition] = []
+    not_found: List[int] = []
+
+
+class DeliveryStatusBatchResponse(BaseModel):
+    results: List[DeliveryTransitionResult]
+
+
+class ManifestMeal(BaseModel):
+    meal_id: int
+    name: str
+    portions: int
+
+
+class ManifestIngredient(BaseModel):
+    ingredient: str
+    portions: int
+
+
+class ManifestMealType(BaseModel):
+    meal_type: str
+    portions: int
+    meals: List[ManifestMeal]
+    ingredients: List[ManifestIngredient]
+
+
+class ManifestDay(BaseModel):
+    date: date
+    portions: int
+    finalized: bool
+    meal_types: List[ManifestMealType]
+
+
+class KitchenManifest(BaseModel):
+    date_from: date
+    date_to: date
+    portions: int
+    days: List[ManifestDay]
+
+
+class NutritionFitUser(BaseModel):
+    user_id: int
+    calories: float
+    target_calories: float
+    loss: float
+
+
+class NutritionFitReport(BaseModel):
+    date: date
+    users: int
+    mean_loss: Optional[float] = None
+    median_calorie_error: Optional[float] = None
+    p90_calorie_error: Optional[float] = None
+    within_10_percent: Optional[float] = None
+    worst: List[NutritionFitUser] = []
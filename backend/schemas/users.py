@@ -66,6 +66,30 @@ class AdminCustomer(BaseModel):
     is_admin: bool
     current_plan: Optional[str] = None
     subscription_end: Optional[date] = None
+    subscription_status: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
 
+
+class NutritionTargets(BaseModel):
+    calories: float
+    protein_g: float
+    carbs_g: float
+    fats_g: float
+    bmr: float
+    goal: str
+    estimated: bool
+
+
+class SignatureGroup(BaseModel):
+    signature: str
+    users: int
+
+
+class SignatureReport(BaseModel):
+    users: int
+    signatures: int
+    unsigned: int
+    largest: List[SignatureGroup] = []
+    cache: dict
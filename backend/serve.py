@@ -0,0 +1,88 @@
+"""Production entry point: a gunicorn master supervising preloaded uvicorn workers.
+
+    python serve.py [--workers N] [--no-prepare]
+
+The master runs the one-time deploy work (schema check or migration, plan
+seeding) exactly once, imports ``main`` once (``preload_app``) and forks
+``WEB_WORKERS`` workers, one per available CPU by default, so workers start
+without re-importing the app. Workers use uvloop and httptools when installed
+(``uvicorn[standard]``). On SIGTERM each worker stops accepting connections and
+finishes in-flight requests for up to ``GRACEFUL_TIMEOUT_SECONDS``. ``/metrics``
+sums every worker's counters (see ``utils/telemetry``).
+
+With several hosts, run ``python -m database.schema`` once as the release step
+and start every host with ``--no-prepare``.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+# Workers must not repeat the deploy work done below; set before settings load.
+os.environ["STARTUP_TASKS"] = "false"
+
+from gunicorn.app.base import BaseApplication  # noqa: E402
+
+from utils import telemetry  # noqa: E402
+from utils.settings import get_settings  # noqa: E402
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+
+        return app
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=settings.web_workers or available_cpus())
+    parser.add_argument("--host", default=settings.app_host)
+    parser.add_argument("--port", type=int, default=settings.app_port)
+    parser.add_argument("--no-prepare", action="store_true", help="skip migrations/seeding (done by a release step)")
+    args = parser.parse_args()
+
+    if not args.no_prepare:
+        from database.database import engine
+        from database.schema import prepare_database
+
+        prepare_database(migrate=settings.auto_migrate)
+        # Never hand pooled connections from the master to forked workers.
+        engine.dispose()
+
+    # Every worker publishes its /metrics registry here so any one of them can serve the sum.
+    metrics_dir = tempfile.mkdtemp(prefix="vitalplate-metrics-")
+    telemetry.enable_multiprocess(metrics_dir)
+    try:
+        Server(
+            {
+                "bind": f"{args.host}:{args.port}",
+                "workers": max(1, args.workers),
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "preload_app": True,
+                "graceful_timeout": settings.graceful_timeout_seconds,
+                "keepalive": settings.keepalive_seconds,
+            }
+        ).run()
+    finally:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Set-based delivery status transitions for dispatchers and kitchen ops.
+
+Each transition in a batch is a single ``UPDATE ... RETURNING`` over either an
+id array (bound as one ``= ANY(:ids)`` parameter, so 50k ids stay one
+statement) or an ``assignment_date``/``meal_type`` selector. Only rows whose
+current status allows the move are touched. Ids the UPDATE skipped are looked
+up once more to say why. The whole batch, plus the ``deliveries_confirmed``
+series, commits once.
+"""
+from typing import Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import Integer, any_, bindparam, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database.models import DailyMealAssignment, Meal, utcnow
+from schemas import DeliveryTransition, DeliveryTransitionResult, RejectedTransition
+from services import metrics, response_cache
+
+# Set by the replanner when no safe meal is left for a slot. Nothing leads out of it.
+CANCELLED = "CANCELLED"
+# Target status -> statuses it may be reached from. DELIVERED and CANCELLED are final.
+ALLOWED_FROM: Dict[str, Tuple[str, ...]] = {
+    "OUT_FOR_DELIVERY": ("PENDING", "FAILED"),
+    "DELIVERED": ("PENDING", "OUT_FOR_DELIVERY", "FAILED"),
+    "FAILED": ("PENDING", "OUT_FOR_DELIVERY"),
+}
+
+
+def _id_in(ids: Sequence[int]):
+    return DailyMealAssignment.id == any_(bindparam("ids", list(ids), type_=ARRAY(Integer)))
+
+
+def _apply(db: Session, transition: DeliveryTransition) -> Tuple[DeliveryTransitionResult, Set[int]]:
+    statement = update(DailyMealAssignment).where(DailyMealAssignment.delivery_status.in_(ALLOWED_FROM[transition.status]))
+    ids: List[int] = []
+    if transition.assignment_ids is not None:
+        ids = sorted(set(transition.assignment_ids))
+        statement = statement.where(_id_in(ids))
+    else:
+        statement = statement.where(DailyMealAssignment.assignment_date == transition.assignment_date)
+        if transition.meal_type:
+            statement = statement.where(
+                DailyMealAssignment.meal_id.in_(select(Meal.id).where(Meal.meal_type == transition.meal_type))
+            )
+    values = {"delivery_status": transition.status}
+    if transition.status == "DELIVERED":
+        values["delivered_at"] = utcnow()
+    rows = db.execute(
+        statement.values(**values).returning(DailyMealAssignment.id, DailyMealAssignment.user_id),
+        execution_options={"synchronize_session": False},
+    ).all()
+    result = DeliveryTransitionResult(status=transition.status, updated=sorted(row.id for row in rows))
+
+    skipped = sorted(set(ids) - set(result.updated))
+    if skipped:
+        current = dict(
+            db.execute(select(DailyMealAssignment.id, DailyMealAssignment.delivery_status).where(_id_in(skipped))).all()
+        )
+        for assignment_id in skipped:
+            status = current.get(assignment_id)
+            if status is None:
+                result.not_found.append(assignment_id)
+            elif status == transition.status:
+                result.unchanged.append(assignment_id)
+            else:
+                result.rejected.append(RejectedTransition(id=assignment_id, delivery_status=status))
+    return result, {row.user_id for row in rows}
+
+
+def apply_transitions(
+    db: Session, transitions: Sequence[DeliveryTransition]
+) -> Tuple[List[DeliveryTransitionResult], Set[int]]:
+    """Apply the transitions in order in one transaction; returns per-id results and the affected users."""
+    results: List[DeliveryTransitionResult] = []
+    users: Set[int] = set()
+    for transition in transitions:
+        result, touched = _apply(db, transition)
+        results.append(result)
+        users |= touched
+    delivered = sum(len(result.updated) for result in results if result.status == "DELIVERED")
+    if delivered:
+        metrics.record(db, series={"deliveries_confirmed": delivered})
+    response_cache.notify_user_views(db, users)
+    db.commit()
+    return results, users
@@ -0,0 +1,165 @@
+"""``Idempotency-Key`` support for retried POSTs.
+
+A client that may retry a write sends the same ``Idempotency-Key`` header on
+every attempt. The first attempt's response is stored under that key, scoped to
+the user, and duplicates get it replayed (with ``Idempotent-Replayed: true``)
+without touching the write path. Keys expire after ``IDEMPOTENCY_TTL_SECONDS``.
+
+``execute`` inserts the key row before the write, in the same transaction, and
+commits it together with the write and its response. A concurrent duplicate's
+insert therefore waits on the key until the first transaction ends. If that
+transaction committed, the duplicate rolls back and replays the stored
+response. If it rolled back (the write failed), the duplicate now owns the key
+and runs the write itself. Errors are never stored, so a retry after a failure
+runs again. Reusing a key for a different request is a 422.
+
+Expired rows are overwritten on reuse. ``python -m services.idempotency``
+deletes the rest; run it nightly.
+"""
+import argparse
+import hashlib
+import json
+from datetime import timedelta
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.models import IdempotencyKey, utcnow
+from utils.settings import get_settings
+
+settings = get_settings()
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+PURGE_BATCH_SIZE = 10000
+
+PURGE = text(
+    """
+    DELETE FROM idempotency_keys
+    WHERE (user_id, key) IN (
+        SELECT user_id, key FROM idempotency_keys WHERE expires_at <= :now LIMIT :limit
+    )
+    """
+)
+
+
+class Replay(NamedTuple):
+    status_code: int
+    body: str
+
+
+def request_hash(endpoint: str, request: Any) -> str:
+    canonical = json.dumps([endpoint, jsonable_encoder(request)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _claim(db: Session, user_id: int, key: str, endpoint: str, fingerprint: str) -> bool:
+    """Insert the key row (or take over an expired one); False if a live row exists."""
+    now = utcnow()
+    row = {
+        "user_id": user_id,
+        "key": key,
+        "endpoint": endpoint,
+        "request_hash": fingerprint,
+        "status_code": None,
+        "response": None,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=settings.idempotency_ttl_seconds),
+    }
+    statement = insert(IdempotencyKey).values(row)
+    statement = statement.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+        set_={name: statement.excluded[name] for name in row if name not in ("user_id", "key")},
+        where=IdempotencyKey.expires_at <= now,
+    )
+    return db.execute(statement.returning(IdempotencyKey.user_id)).first() is not None
+
+
+def execute(
+    db: Session,
+    user_id: int,
+    key: Optional[str],
+    endpoint: str,
+    request: Any,
+    fn: Callable[..., Any],
+    *args: Any,
+    status_code: int = status.HTTP_200_OK,
+) -> Tuple[Optional[Replay], Any]:
+    """Run ``fn(db, *args)`` and commit, at most once per ``key``.
+
+    Returns ``(None, result)`` when ``fn`` ran, or ``(replay, None)`` with the
+    stored response of an earlier request with the same key. ``fn`` must not
+    commit; without a key this is just ``fn`` plus the commit.
+    """
+    if key is None:
+        result = fn(db, *args)
+        db.commit()
+        return None, result
+    fingerprint = request_hash(endpoint, request)
+    # The earlier row can expire and be purged between the two statements; then the key is free again.
+    for _ in range(2):
+        if _claim(db, user_id, key, endpoint, fingerprint):
+            result = fn(db, *args)
+            db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                .values(status_code=status_code, response=JSONResponse(jsonable_encoder(result)).body.decode())
+            )
+            db.commit()
+            return None, result
+        stored = db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+            )
+        ).first()
+        db.rollback()
+        if stored is None:
+            continue
+        if stored.request_hash != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{HEADER} was already used for a different request",
+            )
+        return Replay(stored.status_code, stored.response), None
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{HEADER} is in use; retry the request")
+
+
+def replay_response(replay: Replay) -> Response:
+    return Response(
+        replay.body, status_code=replay.status_code, media_type="application/json", headers={REPLAYED_HEADER: "true"}
+    )
+
+
+def purge_expired(db: Session, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete expired keys in batches, committing each."""
+    purged = 0
+    while True:
+        deleted = db.execute(PURGE, {"now": utcnow(), "limit": batch_size}).rowcount
+        db.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Delete expired idempotency keys.")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        print(f"purged idempotency keys: {purge_expired(db, args.batch_size)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
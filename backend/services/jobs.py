@@ -0,0 +1,318 @@
+"""Durable Postgres job queue for side effects that should not run inside a request.
+
+Request handlers ``enqueue`` a job in the same transaction as the change that
+causes it (outbox style), so the job exists exactly when that change commits
+and the response does not wait for the work. Worker processes claim due jobs
+in batches with ``FOR UPDATE SKIP LOCKED``, so any number of them share the
+queue without blocking each other or taking the same job twice:
+
+    python -m services.jobs [--workers N] [--once]
+
+Claiming a job marks it RUNNING, bumps ``attempts`` and moves ``run_at`` to the
+end of the visibility timeout. If a worker dies mid-job the lease lapses and the
+job is due again. A batch shares one lease, and a worker never starts a job
+whose lease has lapsed; it hands the rest of the batch back instead. Each job
+runs in its own transaction, which ends by deleting the row. The delete is
+fenced on ``(id, attempts)``, so a worker whose lease was taken over cannot
+finish somebody else's attempt. A failing job is re-queued
+with exponential backoff and jitter until ``max_attempts``, then kept as FAILED
+for ``GET /api/admin/jobs`` and a manual retry.
+
+Delivery is at least once, so handlers must be idempotent.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import BigInteger, Integer, bindparam, func, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database.models import Job, UserSubscription, utcnow
+from schemas import FailedJob, JobQueueStats
+from services import meal_planner
+from utils.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+FIRST_WEEK_DAYS = 7
+MAX_ERROR_LENGTH = 2000
+
+CLAIM = text(
+    """
+    UPDATE jobs
+    SET status = 'RUNNING', attempts = jobs.attempts + 1, run_at = :lease_until, locked_by = :worker, updated_at = :now
+    FROM (
+        SELECT id FROM jobs
+        WHERE status IN ('QUEUED', 'RUNNING') AND run_at <= :now
+        ORDER BY run_at, id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) AS due
+    WHERE jobs.id = due.id
+    RETURNING jobs.id, jobs.kind, jobs.payload, jobs.attempts, jobs.max_attempts, jobs.run_at
+    """
+)
+COMPLETE = text("DELETE FROM jobs WHERE id = :id AND attempts = :attempts AND status = 'RUNNING'")
+RELEASE = text(
+    """
+    UPDATE jobs SET status = 'QUEUED', attempts = jobs.attempts - 1, run_at = :now, locked_by = NULL, updated_at = :now
+    FROM unnest(:ids, :attempts) AS v(id, attempts)
+    WHERE jobs.id = v.id AND jobs.attempts = v.attempts AND jobs.status = 'RUNNING'
+    """
+).bindparams(bindparam("ids", type_=ARRAY(BigInteger)), bindparam("attempts", type_=ARRAY(Integer)))
+
+# kind -> handler(db, payload). Handlers run inside the job's transaction and may commit.
+HANDLERS: Dict[str, Callable[[Session, dict], None]] = {}
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+    lease_until: datetime
+
+
+def handler(kind: str):
+    def register(fn: Callable[[Session, dict], None]) -> Callable[[Session, dict], None]:
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    delay_seconds: float = 0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """Add a job to ``db``'s transaction; it becomes visible to workers when the caller commits."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    now = utcnow()
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        status="QUEUED",
+        attempts=0,
+        max_attempts=max_attempts or settings.job_max_attempts,
+        run_at=now + timedelta(seconds=delay_seconds),
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(job)
+    return job
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number ``attempts``: doubling from ``JOB_RETRY_BASE_SECONDS``, capped, half of it jittered."""
+    delay = min(settings.job_retry_max_seconds, settings.job_retry_base_seconds * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim(db: Session, worker: str, limit: int, visibility_seconds: float) -> List[ClaimedJob]:
+    """Lease up to ``limit`` due jobs to ``worker`` and commit the lease."""
+    now = utcnow()
+    rows = db.execute(
+        CLAIM,
+        {"now": now, "lease_until": now + timedelta(seconds=visibility_seconds), "worker": worker, "limit": limit},
+    ).all()
+    db.commit()
+    return [ClaimedJob(*row) for row in rows]
+
+
+def release(db: Session, jobs: Sequence[ClaimedJob]) -> None:
+    """Hand claimed but unstarted jobs back without counting the attempt."""
+    if jobs:
+        db.execute(
+            RELEASE, {"now": utcnow(), "ids": [job.id for job in jobs], "attempts": [job.attempts for job in jobs]}
+        )
+        db.commit()
+
+
+def _retry_or_fail(db: Session, job: ClaimedJob, error: str) -> str:
+    outcome = "failed" if job.attempts >= job.max_attempts else "retried"
+    now = utcnow()
+    updated = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.attempts == job.attempts, Job.status == "RUNNING")
+        .values(
+            status="FAILED" if outcome == "failed" else "QUEUED",
+            run_at=now if outcome == "failed" else now + timedelta(seconds=backoff_seconds(job.attempts)),
+            locked_by=None,
+            last_error=error[:MAX_ERROR_LENGTH],
+            updated_at=now,
+        )
+    ).rowcount
+    db.commit()
+    return outcome if updated else "lost"
+
+
+def run(db: Session, job: ClaimedJob) -> str:
+    """Run one claimed job; returns ``done``, ``retried``, ``failed`` or ``lost`` (lease taken over)."""
+    if job.attempts > job.max_attempts:
+        # Claimed again after its final attempt's lease lapsed: the worker running it died or hung.
+        return _retry_or_fail(db, job, "visibility timeout expired on the final attempt")
+    try:
+        fn = HANDLERS.get(job.kind)
+        if fn is None:
+            raise LookupError(f"No handler for job kind {job.kind!r}")
+        fn(db, job.payload)
+        if not db.execute(COMPLETE, {"id": job.id, "attempts": job.attempts}).rowcount:
+            db.rollback()
+            return "lost"
+        db.commit()
+        return "done"
+    except Exception as exc:
+        db.rollback()
+        logger.exception("job %s (%s) attempt %s failed", job.id, job.kind, job.attempts)
+        return _retry_or_fail(db, job, f"{type(exc).__name__}: {exc}")
+
+
+def work(
+    worker: str,
+    stop=None,
+    once: bool = False,
+    batch_size: Optional[int] = None,
+    poll_seconds: Optional[float] = None,
+    visibility_seconds: Optional[float] = None,
+) -> Counter:
+    """Claim and run jobs until ``stop`` is set (or, with ``once``, until nothing is due)."""
+    from database.database import SessionLocal
+
+    stop = stop or multiprocessing.Event()
+    batch_size = batch_size or settings.job_batch_size
+    poll_seconds = settings.job_poll_seconds if poll_seconds is None else poll_seconds
+    visibility_seconds = visibility_seconds or settings.job_visibility_timeout_seconds
+    outcomes: Counter = Counter()
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            jobs = claim(db, worker, batch_size, visibility_seconds)
+            if not jobs:
+                if once:
+                    break
+                stop.wait(poll_seconds)
+                continue
+            for position, job in enumerate(jobs):
+                if stop.is_set():
+                    release(db, jobs[position:])
+                    break
+                # The batch shares one lease. Once it lapses another worker may hold these jobs,
+                # and handlers commit before the fenced delete, so starting one could run it twice.
+                if utcnow() >= job.lease_until:
+                    release(db, jobs[position:])
+                    outcomes["expired"] += len(jobs) - position
+                    break
+                outcomes[run(db, job)] += 1
+    finally:
+        db.close()
+    return outcomes
+
+
+def stats(db: Session, failures: int = 20) -> JobQueueStats:
+    """Jobs per status and kind, the backlog that is due now and the latest failures."""
+    now = utcnow()
+    by_kind: Dict[str, Dict[str, int]] = {}
+    totals: Counter = Counter()
+    for status, kind, count in db.execute(select(Job.status, Job.kind, func.count()).group_by(Job.status, Job.kind)):
+        by_kind.setdefault(kind, {})[status] = count
+        totals[status] += count
+    due, oldest = db.execute(
+        select(func.count(), func.min(Job.run_at)).where(Job.status.in_(("QUEUED", "RUNNING")), Job.run_at <= now)
+    ).one()
+    failed = db.execute(
+        select(Job).where(Job.status == "FAILED").order_by(Job.updated_at.desc(), Job.id.desc()).limit(failures)
+    ).scalars()
+    return JobQueueStats(
+        queued=totals["QUEUED"],
+        running=totals["RUNNING"],
+        failed=totals["FAILED"],
+        due=due,
+        oldest_due_seconds=round((now - oldest).total_seconds(), 1) if oldest else None,
+        by_kind=by_kind,
+        failures=[FailedJob.model_validate(job) for job in failed],
+    )
+
+
+def retry_failed(db: Session, job_id: int) -> bool:
+    """Queue a FAILED job again with a fresh attempt budget."""
+    now = utcnow()
+    retried = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "FAILED")
+        .values(status="QUEUED", attempts=0, run_at=now, locked_by=None, updated_at=now)
+    ).rowcount
+    db.commit()
+    return bool(retried)
+
+
+@handler("noop")
+def noop(db: Session, payload: dict) -> None:
+    """Does nothing; used by the queue benchmark and to check that workers are draining."""
+
+
+@handler("subscription.first_week")
+def plan_first_week(db: Session, payload: dict) -> None:
+    """Plan a new subscription's first ``FIRST_WEEK_DAYS`` days, from today on."""
+    subscription = db.get(UserSubscription, payload["subscription_id"])
+    if subscription is None or subscription.status != "ACTIVE":
+        return
+    day = max(subscription.start_date, date.today())
+    last = min(subscription.end_date, subscription.start_date + timedelta(days=FIRST_WEEK_DAYS - 1))
+    catalog = meal_planner.load_catalog(db)
+    while day <= last:
+        meal_planner.plan_assignments(db, day, catalog=catalog, user_ids=[subscription.user_id])
+        day += timedelta(days=1)
+
+
+def _worker_process(name: str, stop, once: bool) -> None:
+    from database.database import engine
+
+    # Connections opened before the fork belong to the parent.
+    engine.dispose(close=False)
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    outcomes = work(name, stop, once=once)
+    print(f"{name}: {dict(outcomes)}", flush=True)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=settings.job_workers)
+    parser.add_argument("--once", action="store_true", help="Exit once nothing is due instead of polling.")
+    args = parser.parse_args(argv)
+
+    stop = multiprocessing.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(f"{prefix}/{number}", stop, args.once), daemon=False)
+        for number in range(max(1, args.workers))
+    ]
+    # Workers finish their current job on SIGTERM/SIGINT; unstarted claims are released.
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print(f"workers stopped after {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Kitchen production manifest: portions per meal and ingredient per day.
+
+Both aggregates run in the database. Assignments are counted per (date, meal)
+through the ``assignment_date`` index, joined to the small ``meals`` table,
+and ``unnest(ingredients)`` turns the per-meal counts into ingredient totals.
+So a day with 100k assignments comes back as a few hundred rows. Days before
+today are final and cached per process until a meal is edited; the edit's
+``meals`` notice clears every API worker's copy (see ``utils.invalidation``).
+Used by ``/api/admin/manifest`` and runnable directly:
+
+    python -m services.manifest --from 2025-01-06 --to 2025-01-12 [--json]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Date, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from schemas import KitchenManifest, ManifestDay, ManifestIngredient, ManifestMeal, ManifestMealType
+from services.meal_index import MEALS_TOPIC
+from utils import invalidation
+from utils.cache import TTLCache
+
+MAX_MANIFEST_DAYS = 31
+MEAL_TYPE_ORDER = {"BREAKFAST": 0, "LUNCH": 1, "DINNER": 2}
+
+_PORTIONS = """
+WITH portions AS (
+    SELECT assignment_date, meal_id, count(*) AS portions
+    FROM daily_meal_assignments
+    WHERE assignment_date = ANY(:days) AND delivery_status <> 'CANCELLED'
+    GROUP BY assignment_date, meal_id
+)
+"""
+MEAL_TOTALS = text(
+    _PORTIONS
+    + """
+SELECT p.assignment_date, m.meal_type, m.id, m.name, p.portions
+FROM portions p JOIN meals m ON m.id = p.meal_id
+"""
+).bindparams(bindparam("days", type_=ARRAY(Date)))
+INGREDIENT_TOTALS = text(
+    _PORTIONS
+    + """
+SELECT p.assignment_date, m.meal_type, ingredient, sum(p.portions)::int AS portions
+FROM portions p
+JOIN meals m ON m.id = p.meal_id
+CROSS JOIN LATERAL unnest(m.ingredients) AS ingredient
+GROUP BY p.assignment_date, m.meal_type, ingredient
+"""
+).bindparams(bindparam("days", type_=ARRAY(Date)))
+
+# Finalized (past) days only; entries are dropped by ``invalidate`` when meals change.
+_finalized = TTLCache(maxsize=400, ttl_seconds=7 * 86400)
+
+
+def invalidate() -> None:
+    """Call after meal names, types or ingredients change."""
+    _finalized.clear()
+
+
+invalidation.subscribe(MEALS_TOPIC, lambda meal_ids: invalidate())
+
+
+def _type_key(meal_type: str):
+    return (MEAL_TYPE_ORDER.get(meal_type, len(MEAL_TYPE_ORDER)), meal_type)
+
+
+def _build_days(db: Session, days: List[date], today: date) -> Dict[date, ManifestDay]:
+    meals: Dict[date, Dict[str, List[ManifestMeal]]] = defaultdict(lambda: defaultdict(list))
+    ingredients: Dict[date, Dict[str, List[ManifestIngredient]]] = defaultdict(lambda: defaultdict(list))
+    for day, meal_type, meal_id, name, portions in db.execute(MEAL_TOTALS, {"days": days}):
+        meals[day][meal_type].append(ManifestMeal(meal_id=meal_id, name=name, portions=portions))
+    for day, meal_type, ingredient, portions in db.execute(INGREDIENT_TOTALS, {"days": days}):
+        ingredients[day][meal_type].append(ManifestIngredient(ingredient=ingredient, portions=portions))
+
+    built = {}
+    for day in days:
+        meal_types = []
+        for meal_type in sorted(meals[day], key=_type_key):
+            type_meals = sorted(meals[day][meal_type], key=lambda meal: (-meal.portions, meal.meal_id))
+            meal_types.append(
+                ManifestMealType(
+                    meal_type=meal_type,
+                    portions=sum(meal.portions for meal in type_meals),
+                    meals=type_meals,
+                    ingredients=sorted(
+                        ingredients[day][meal_type], key=lambda item: (-item.portions, item.ingredient)
+                    ),
+                )
+            )
+        built[day] = ManifestDay(
+            date=day,
+            portions=sum(meal_type.portions for meal_type in meal_types),
+            finalized=day < today,
+            meal_types=meal_types,
+        )
+    return built
+
+
+def build_manifest(db: Session, date_from: date, date_to: date) -> KitchenManifest:
+    """Manifest for ``date_from``..``date_to`` inclusive (at most ``MAX_MANIFEST_DAYS`` days)."""
+    if date_to < date_from:
+        raise ValueError("date_to is before date_from")
+    if (date_to - date_from).days >= MAX_MANIFEST_DAYS:
+        raise ValueError(f"a manifest covers at most {MAX_MANIFEST_DAYS} days")
+    today = date.today()
+    requested = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    days = {day: _finalized.get(day) for day in requested}
+    missing = [day for day, cached in days.items() if cached is None]
+    if missing:
+        for day, manifest_day in _build_days(db, missing, today).items():
+            days[day] = manifest_day
+            if manifest_day.finalized:
+                _finalized.set(day, manifest_day)
+    return KitchenManifest(
+        date_from=date_from,
+        date_to=date_to,
+        portions=sum(day.portions for day in days.values()),
+        days=[days[day] for day in requested],
+    )
+
+
+def format_manifest(manifest: KitchenManifest) -> str:
+    lines = []
+    for day in manifest.days:
+        lines.append(f"{day.date}  {day.portions} portions{'' if day.finalized else '  (open)'}")
+        for meal_type in day.meal_types:
+            lines.append(f"  {meal_type.meal_type}  {meal_type.portions}")
+            lines.extend(f"    {meal.portions:>7}  {meal.name}" for meal in meal_type.meals)
+            lines.append("    ingredients: " + ", ".join(f"{item.ingredient} x{item.portions}" for item in meal_type.ingredients))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Print the kitchen production manifest.")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--json", action="store_true", help="Print the API's JSON instead of a table.")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        manifest = build_manifest(db, args.date_from, args.date_to or args.date_from)
+    finally:
+        db.close()
+    print(manifest.model_dump_json(indent=2) if args.json else format_manifest(manifest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""In-process inverted index over the meal catalog.
+
+Each normalized ingredient and dietary tag maps to a bitmap (a Python ``int``
+whose bit ``n`` is set when meal ``n`` carries the term), so "meals compatible
+with this user" is a handful of AND / AND-NOT operations instead of a string
+scan over every meal. The index is built once per process and then maintained
+incrementally by the admin meal routes once their write commits. The same
+write sends ``notify_meals``, which makes every other API worker reload its
+index on next use (see ``utils.invalidation``).
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from database.models import Meal
+from utils import invalidation
+from utils.settings import get_settings
+
+settings = get_settings()
+
+SPICE_LEVELS = {"MILD": 0, "MEDIUM": 1, "HOT": 2}
+NO_PREFERENCE = {"", "none", "any", "omnivore", "non-vegetarian", "non_vegetarian", "nonveg"}
+VEGETARIAN_PREFERENCES = {"vegetarian", "veg", "vegan"}
+MEALS_TOPIC = "meals"
+
+
+def normalize_term(value: Optional[str]) -> str:
+    """Canonical form used when matching ingredients, tags, allergies and dislikes."""
+    return " ".join((value or "").lower().split())
+
+
+def spice_rank(value: Optional[str], default: int) -> int:
+    return SPICE_LEVELS.get((value or "").strip().upper(), default)
+
+
+def preference_signature(
+    dietary_preference: Optional[str],
+    spice_level: Optional[str],
+    allergies: Optional[Iterable[str]],
+    disliked_foods: Optional[Iterable[str]],
+) -> str:
+    """Canonical digest of the constraints that decide meal eligibility.
+
+    Users with equal signatures see exactly the same compatible meals:
+    allergies and dislikes both just exclude terms, so they are merged.
+    """
+    preference = normalize_term(dietary_preference)
+    avoid = sorted({normalize_term(term) for term in list(allergies or []) + list(disliked_foods or [])} - {""})
+    canonical = "\x1f".join(
+        ["" if preference in NO_PREFERENCE else preference, str(spice_rank(spice_level, max(SPICE_LEVELS.values())))]
+        + avoid
+    )
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def signature_of(user) -> str:
+    return preference_signature(user.dietary_preference, user.spice_level, user.allergies, user.disliked_foods)
+
+
+def meal_terms(meal) -> FrozenSet[str]:
+    terms = {normalize_term(term) for term in (meal.ingredients or []) + (meal.dietary_tags or [])}
+    terms.discard("")
+    return frozenset(terms)
+
+
+def bitmap_ids(bitmap: int) -> List[int]:
+    """Expand a bitmap into the sorted list of meal ids it contains."""
+    ids = []
+    while bitmap:
+        lowest = bitmap & -bitmap
+        ids.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return ids
+
+
+class IndexedMeal(NamedTuple):
+    """Catalog fields the index needs; attribute names mirror ``Meal``."""
+
+    id: int
+    meal_type: str
+    ingredients: List[str]
+    dietary_tags: List[str]
+    is_vegetarian: bool
+    spice_level: Optional[str]
+    is_active: bool
+    calories: Optional[int] = None
+    protein_g: Optional[float] = None
+    carbs_g: Optional[float] = None
+    fats_g: Optional[float] = None
+
+    @classmethod
+    def from_meal(cls, meal) -> "IndexedMeal":
+        return cls(
+            id=meal.id,
+            meal_type=meal.meal_type,
+            ingredients=list(meal.ingredients or []),
+            dietary_tags=list(meal.dietary_tags or []),
+            is_vegetarian=bool(meal.is_vegetarian),
+            spice_level=meal.spice_level,
+            is_active=meal.is_active is not False,
+            calories=meal.calories,
+            protein_g=meal.protein_g,
+            carbs_g=meal.carbs_g,
+            fats_g=meal.fats_g,
+        )
+
+
+class MealIndex:
+    """Term -> meal-id bitmaps plus per-attribute bitmaps for the active catalog."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._meals: Dict[int, IndexedMeal] = {}
+        self._postings: Dict[str, int] = {}
+        self._by_type: Dict[str, int] = {}
+        self._by_spice: Dict[int, int] = {}
+        self._vegetarian = 0
+        self._active = 0
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self, meals: Iterable) -> None:
+        """Replace the index contents with ``meals``."""
+        with self._lock:
+            self._meals.clear()
+            self._postings.clear()
+            self._by_type.clear()
+            self._by_spice.clear()
+            self._vegetarian = 0
+            self._active = 0
+            for meal in meals:
+                self._add(IndexedMeal.from_meal(meal))
+            self.version += 1
+            self.loaded_at = time.monotonic()
+
+    def expire(self) -> None:
+        """Make the next ``get_meal_index`` reload the catalog."""
+        self.loaded_at = None
+
+    def upsert(self, meal) -> None:
+        """Apply a created or updated meal without rebuilding the index."""
+        with self._lock:
+            self._remove(meal.id)
+            self._add(IndexedMeal.from_meal(meal))
+            self.version += 1
+
+    def remove(self, meal_id: int) -> None:
+        with self._lock:
+            self._remove(meal_id)
+            self.version += 1
+
+    def _add(self, meal: IndexedMeal) -> None:
+        self._meals[meal.id] = meal
+        if not meal.is_active:
+            return
+        bit = 1 << meal.id
+        self._active |= bit
+        for term in meal_terms(meal):
+            self._postings[term] = self._postings.get(term, 0) | bit
+        self._by_type[meal.meal_type] = self._by_type.get(meal.meal_type, 0) | bit
+        rank = spice_rank(meal.spice_level, 0)
+        self._by_spice[rank] = self._by_spice.get(rank, 0) | bit
+        if meal.is_vegetarian:
+            self._vegetarian |= bit
+
+    def _remove(self, meal_id: int) -> None:
+        meal = self._meals.pop(meal_id, None)
+        if meal is None or not meal.is_active:
+            return
+        mask = ~(1 << meal_id)
+        self._active &= mask
+        self._vegetarian &= mask
+        for term in meal_terms(meal):
+            self._postings[term] &= mask
+            if not self._postings[term]:
+                del self._postings[term]
+        self._by_type[meal.meal_type] &= mask
+        self._by_spice[spice_rank(meal.spice_level, 0)] &= mask
+
+    def compatible(
+        self,
+        allergies: Optional[Iterable[str]] = None,
+        disliked_foods: Optional[Iterable[str]] = None,
+        dietary_preference: Optional[str] = None,
+        spice_level: Optional[str] = None,
+        meal_type: Optional[str] = None,
+    ) -> int:
+        """Bitmap of active meals that satisfy the given constraints."""
+        with self._lock:
+            result = self._active
+            if meal_type is not None:
+                result &= self._by_type.get(meal_type, 0)
+            for term in list(allergies or []) + list(disliked_foods or []):
+                result &= ~self._postings.get(normalize_term(term), 0)
+            preference = normalize_term(dietary_preference)
+            if preference not in NO_PREFERENCE:
+                if preference in VEGETARIAN_PREFERENCES:
+                    result &= self._vegetarian
+                if preference not in ("vegetarian", "veg"):
+                    result &= self._postings.get(preference, 0)
+            limit = spice_rank(spice_level, max(SPICE_LEVELS.values()))
+            allowed_spice = 0
+            for rank, bitmap in self._by_spice.items():
+                if rank <= limit:
+                    allowed_spice |= bitmap
+            return result & allowed_spice
+
+    def compatible_with_user(self, user, meal_type: Optional[str] = None) -> List[int]:
+        return bitmap_ids(
+            self.compatible(
+                allergies=user.allergies,
+                disliked_foods=user.disliked_foods,
+                dietary_preference=user.dietary_preference,
+                spice_level=user.spice_level,
+                meal_type=meal_type,
+            )
+        )
+
+    def active_meals(self) -> List[IndexedMeal]:
+        """Active catalog entries ordered by id."""
+        with self._lock:
+            return [self._meals[meal_id] for meal_id in bitmap_ids(self._active)]
+
+
+meal_index = MealIndex()
+
+
+def get_meal_index(db: Session) -> MealIndex:
+    """Return the process-wide index, (re)loading it when missing or stale.
+
+    Writes made through this process update the index immediately and other
+    workers reload on their next call after the write's notice; the periodic
+    reload is the fallback while a listener is reconnecting.
+    """
+    loaded_at = meal_index.loaded_at
+    if loaded_at is None or time.monotonic() - loaded_at > settings.meal_index_refresh_seconds:
+        meal_index.load(db.query(Meal).all())
+    return meal_index
+
+
+def notify_meals(db: Session, meal_ids: Iterable[int]) -> None:
+    """Have every API worker reload its index once ``db`` commits the meal write."""
+    invalidation.notify(db, MEALS_TOPIC, meal_ids)
+
+
+invalidation.subscribe(MEALS_TOPIC, lambda meal_ids: meal_index.expire())
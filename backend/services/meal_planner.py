@@ -0,0 +1,530 @@
+"""Batch planner that fills ``daily_meal_assignments`` for active subscribers.
+
+Eligibility is computed as matrix math over the whole subscriber population:
+every meal and every subscriber is encoded against a shared vocabulary of
+normalized ingredients/tags, so filtering 100k users is a handful of NumPy
+operations instead of a Python loop per user.
+
+With ``strategy="nutrition"`` (``PLANNER_STRATEGY``) the per-type picks come
+from ``services.nutrition.fit_meals`` instead of the daily rotation, so each
+subscriber's day lands close to their calorie/macro targets. With
+``strategy="preference"`` they are the best-scored meals from
+``services.recommendations``, rotated by date.
+
+Run as ``python -m services.meal_planner --date 2025-01-31 [--strategy nutrition|preference]``.
+"""
+import argparse
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import BigInteger, bindparam, func, insert, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database.models import DailyMealAssignment, Meal, User, UserSubscription, utcnow
+from schemas import SignatureGroup, SignatureReport
+from services import nutrition, response_cache
+from services.meal_index import (
+    NO_PREFERENCE,
+    SPICE_LEVELS,
+    VEGETARIAN_PREFERENCES,
+    get_meal_index,
+    meal_terms,
+    normalize_term,
+    preference_signature,
+    spice_rank,
+)
+from utils.cache import TTLCache
+from utils.settings import get_settings
+
+settings = get_settings()
+
+INSERT_BATCH_SIZE = 5000
+PLANNER_STRATEGIES = ("rotate", "nutrition", "preference")
+ELIGIBILITY_CHUNK_SIZE = 20000
+SIGNATURE_CACHE_TTL_SECONDS = 86400
+PLANNER_LOCK_SPACE = 0x706C616E  # "plan"; first key of the two-int advisory locks on a date
+
+LOCK_DATE = text("SELECT pg_advisory_xact_lock(:space, :day)")
+LOCK_DATE_SHARED = text("SELECT pg_advisory_xact_lock_shared(:space, :day)")
+# One-bigint keys ``day << 32 | user_id``, a key space apart from the two-int form. Sorted, so runs cannot deadlock.
+LOCK_USERS = text("SELECT pg_advisory_xact_lock(key) FROM unnest(:keys) AS key").bindparams(
+    bindparam("keys", type_=ARRAY(BigInteger))
+)
+
+# (catalog fingerprint, preference signature) -> eligible row over that catalog.
+_signature_eligibility = TTLCache(maxsize=settings.signature_cache_size, ttl_seconds=SIGNATURE_CACHE_TTL_SECONDS)
+
+
+@dataclass
+class MealCatalog:
+    """Column-oriented view of the active meal catalog."""
+
+    meal_ids: np.ndarray
+    meal_types: List[str]
+    type_codes: np.ndarray
+    vegetarian: np.ndarray
+    spice: np.ndarray
+    vocabulary: Dict[str, int]
+    terms: np.ndarray
+    nutrients: np.ndarray
+    fingerprint: str
+
+    @classmethod
+    def from_meals(cls, meals: Sequence) -> "MealCatalog":
+        vocabulary: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        for position, meal in enumerate(meals):
+            for term in meal_terms(meal):
+                rows.append(position)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+        terms = np.zeros((len(meals), len(vocabulary)), dtype=bool)
+        terms[rows, cols] = True
+        meal_types = sorted({meal.meal_type for meal in meals})
+        type_lookup = {meal_type: code for code, meal_type in enumerate(meal_types)}
+        meal_ids = np.fromiter((meal.id for meal in meals), dtype=np.int64, count=len(meals))
+        type_codes = np.fromiter((type_lookup[meal.meal_type] for meal in meals), dtype=np.int16, count=len(meals))
+        vegetarian = np.fromiter((bool(meal.is_vegetarian) for meal in meals), dtype=bool, count=len(meals))
+        spice = np.fromiter((spice_rank(meal.spice_level, 0) for meal in meals), dtype=np.int8, count=len(meals))
+        # Identifies the eligibility-relevant content, so cached per-signature rows never outlive a catalog edit.
+        fingerprint = hashlib.blake2b(digest_size=16)
+        fingerprint.update(repr((meal_types, list(vocabulary))).encode())
+        for array in (meal_ids, type_codes, vegetarian, spice, terms):
+            fingerprint.update(array.tobytes())
+        return cls(
+            meal_ids=meal_ids,
+            meal_types=meal_types,
+            type_codes=type_codes,
+            vegetarian=vegetarian,
+            spice=spice,
+            vocabulary=vocabulary,
+            terms=terms,
+            nutrients=nutrition.meal_nutrients(meals),
+            fingerprint=fingerprint.hexdigest(),
+        )
+
+    def __len__(self) -> int:
+        return len(self.meal_ids)
+
+
+@dataclass
+class SubscriberProfiles:
+    """Constraint arrays for a batch of subscribers, aligned with a catalog vocabulary."""
+
+    user_ids: np.ndarray
+    avoid: np.ndarray
+    needs_vegetarian: np.ndarray
+    required_term: np.ndarray
+    spice_limit: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence, catalog: MealCatalog) -> "SubscriberProfiles":
+        """Build from ``(id, allergies, disliked_foods, dietary_preference, spice_level)`` rows."""
+        vocabulary = catalog.vocabulary
+        count = len(rows)
+        avoid_rows: List[int] = []
+        avoid_cols: List[int] = []
+        needs_vegetarian = np.zeros(count, dtype=bool)
+        # -1: no tag requirement, -2: requirement that no meal in the catalog satisfies.
+        required_term = np.full(count, -1, dtype=np.int64)
+        for position, (_, allergies, disliked, preference, _) in enumerate(row[:5] for row in rows):
+            for term in (allergies or []) + (disliked or []):
+                column = vocabulary.get(normalize_term(term))
+                if column is not None:
+                    avoid_rows.append(position)
+                    avoid_cols.append(column)
+            preference = normalize_term(preference)
+            if preference in NO_PREFERENCE:
+                continue
+            if preference in VEGETARIAN_PREFERENCES:
+                needs_vegetarian[position] = True
+            if preference not in ("vegetarian", "veg"):
+                required_term[position] = vocabulary.get(preference, -2)
+        avoid = np.zeros((count, len(vocabulary)), dtype=bool)
+        avoid[avoid_rows, avoid_cols] = True
+        return cls(
+            user_ids=np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+            avoid=avoid,
+            needs_vegetarian=needs_vegetarian,
+            required_term=required_term,
+            spice_limit=np.fromiter(
+                (spice_rank(row[4], max(SPICE_LEVELS.values())) for row in rows), dtype=np.int8, count=count
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+def eligibility_matrix(profiles: SubscriberProfiles, catalog: MealCatalog) -> np.ndarray:
+    """Return a ``(subscribers, meals)`` boolean matrix of safe, preference-matching meals."""
+    eligible = np.empty((len(profiles), len(catalog)), dtype=bool)
+    meal_terms = catalog.terms.astype(np.float32).T
+    padded_terms = np.vstack([catalog.terms.T, np.zeros((1, len(catalog)), dtype=bool)])
+    for start in range(0, len(profiles), ELIGIBILITY_CHUNK_SIZE):
+        stop = start + ELIGIBILITY_CHUNK_SIZE
+        conflicts = profiles.avoid[start:stop].astype(np.float32) @ meal_terms
+        block = conflicts == 0
+        block &= catalog.vegetarian[None, :] | ~profiles.needs_vegetarian[start:stop, None]
+        block &= catalog.spice[None, :] <= profiles.spice_limit[start:stop, None]
+        required = profiles.required_term[start:stop]
+        # Row -1 of ``padded_terms`` is all False, used for unsatisfiable requirements.
+        lookup = np.where(required == -2, len(catalog.vocabulary), required)
+        has_requirement = required != -1
+        block[has_requirement] &= padded_terms[lookup[has_requirement]]
+        eligible[start:stop] = block
+    return eligible
+
+
+@dataclass
+class SignatureGroups:
+    """Subscribers grouped by preference signature; ``inverse`` maps each subscriber to its group."""
+
+    signatures: List[str]
+    representatives: List
+    inverse: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+
+def group_by_signature(rows: Sequence) -> SignatureGroups:
+    """Group ``load_subscribers`` rows by the signature of their own constraint columns.
+
+    ``users.preference_signature`` is not trusted here: a write path that
+    skips it, or a stale backfill, would hand the user another group's
+    eligibility row and could schedule an allergen.
+    """
+    lookup: Dict[str, int] = {}
+    # Most users repeat someone's raw column values exactly; digest each distinct combination once.
+    digests: Dict[Tuple, str] = {}
+    representatives: List = []
+    inverse = np.empty(len(rows), dtype=np.int64)
+    for position, row in enumerate(rows):
+        raw = (row[3], row[4], tuple(row[1] or ()), tuple(row[2] or ()))
+        signature = digests.get(raw)
+        if signature is None:
+            signature = digests[raw] = preference_signature(row[3], row[4], row[1], row[2])
+        group = lookup.get(signature)
+        if group is None:
+            group = lookup[signature] = len(representatives)
+            representatives.append(row)
+        inverse[position] = group
+    return SignatureGroups(signatures=list(lookup), representatives=representatives, inverse=inverse)
+
+
+def signature_eligibility(groups: SignatureGroups, catalog: MealCatalog) -> Tuple[np.ndarray, int]:
+    """``(signatures, meals)`` eligibility and how many signatures came from the cache.
+
+    Only signatures missing from the cache are run through ``eligibility_matrix``.
+    """
+    eligible = np.empty((len(groups), len(catalog)), dtype=bool)
+    missing: List[int] = []
+    for group, signature in enumerate(groups.signatures):
+        row = _signature_eligibility.get((catalog.fingerprint, signature))
+        if row is None:
+            missing.append(group)
+        else:
+            eligible[group] = row
+    if missing:
+        profiles = SubscriberProfiles.from_rows([groups.representatives[group] for group in missing], catalog)
+        computed = eligibility_matrix(profiles, catalog)
+        eligible[missing] = computed
+        for group, row in zip(missing, computed):
+            _signature_eligibility.set((catalog.fingerprint, groups.signatures[group]), row)
+    return eligible, len(groups) - len(missing)
+
+
+def signature_report(db: Session, largest: int = 20) -> SignatureReport:
+    """How many distinct preference signatures users collapse into, plus this process's cache stats."""
+    users, signatures, unsigned = db.execute(
+        select(
+            func.count(User.id),
+            func.count(User.preference_signature.distinct()),
+            func.count(User.id).filter(User.preference_signature.is_(None)),
+        )
+    ).one()
+    size = func.count(User.id).label("users")
+    groups = db.execute(
+        select(User.preference_signature, size)
+        .where(User.preference_signature.is_not(None))
+        .group_by(User.preference_signature)
+        .order_by(size.desc(), User.preference_signature)
+        .limit(largest)
+    ).all()
+    return SignatureReport(
+        users=users,
+        signatures=signatures,
+        unsigned=unsigned,
+        largest=[SignatureGroup(signature=signature, users=count) for signature, count in groups],
+        cache=_signature_eligibility.stats(),
+    )
+
+
+def select_menu_meals(
+    eligible: np.ndarray,
+    inverse: np.ndarray,
+    user_ids: np.ndarray,
+    catalog: MealCatalog,
+    target_date: date,
+) -> Dict[int, np.ndarray]:
+    """``select_meals`` over per-signature eligibility; same picks, menus built once per signature.
+
+    Each signature's menu is its eligible meals of a type in catalog order;
+    subscribers then only index into their signature's menu.
+    """
+    selections: Dict[int, np.ndarray] = {}
+    offsets = user_ids + target_date.toordinal()
+    for type_code in range(len(catalog.meal_types)):
+        columns = np.flatnonzero(catalog.type_codes == type_code)
+        options = eligible[:, columns]
+        menus = np.argsort(~options, axis=1, kind="stable")
+        counts = options.sum(axis=1)[inverse]
+        rank = offsets % np.maximum(counts, 1)
+        picked = menus[inverse, rank] if len(columns) else np.zeros(len(inverse), dtype=np.int64)
+        selections[type_code] = np.where(counts > 0, columns[picked] if len(columns) else -1, -1)
+    return selections
+
+
+def select_meals(
+    eligible: np.ndarray,
+    user_ids: np.ndarray,
+    catalog: MealCatalog,
+    target_date: date,
+) -> Dict[int, np.ndarray]:
+    """Pick one eligible meal per subscriber for each meal type.
+
+    Returns ``{type_code: meal_position}`` arrays where ``-1`` marks subscribers
+    with no eligible meal of that type. The choice rotates through each user's
+    eligible meals day by day so consecutive days differ.
+    """
+    selections: Dict[int, np.ndarray] = {}
+    offsets = user_ids + target_date.toordinal()
+    for type_code in range(len(catalog.meal_types)):
+        columns = np.flatnonzero(catalog.type_codes == type_code)
+        options = eligible[:, columns]
+        counts = options.sum(axis=1)
+        rank = offsets % np.maximum(counts, 1)
+        picked = np.argmax(np.cumsum(options, axis=1) > rank[:, None], axis=1)
+        selections[type_code] = np.where(counts > 0, columns[picked], -1)
+    return selections
+
+
+def choose_meals(
+    db: Session,
+    eligible: np.ndarray,
+    user_ids: np.ndarray,
+    catalog: MealCatalog,
+    target_date: date,
+    strategy: Optional[str] = None,
+) -> Tuple[Dict[int, np.ndarray], Optional[Dict[str, float]]]:
+    """Per-type picks for ``strategy`` (default ``PLANNER_STRATEGY``), plus fit quality for ``nutrition``."""
+    strategy = strategy or settings.planner_strategy
+    if strategy == "preference":
+        from services.recommendations import preferred_meals
+
+        return preferred_meals(db, eligible, user_ids, catalog, target_date), None
+    if strategy != "nutrition":
+        return select_meals(eligible, user_ids, catalog, target_date), None
+    targets = nutrition.load_targets(db, user_ids)
+    fitted = nutrition.fit_meals(eligible, catalog.type_codes, len(catalog.meal_types), catalog.nutrients, targets, target_date)
+    fitted_users = np.isfinite(fitted.loss)
+    return fitted.selections, nutrition.fit_quality(fitted.totals[fitted_users], targets.daily[fitted_users])
+
+
+@dataclass
+class PlanResult:
+    target_date: date
+    subscribers: int = 0
+    assigned: int = 0
+    already_planned: int = 0
+    unplannable: int = 0
+    by_meal_type: Dict[str, int] = field(default_factory=dict)
+    fit: Optional[Dict[str, float]] = None
+    signatures: int = 0
+    signature_cache_hits: int = 0
+
+
+def load_catalog(db: Session) -> MealCatalog:
+    return MealCatalog.from_meals(get_meal_index(db).active_meals())
+
+
+def load_subscribers(db: Session, target_date: date, user_ids: Optional[Iterable[int]] = None) -> List:
+    active = select(UserSubscription.user_id).where(
+        UserSubscription.status == "ACTIVE",
+        UserSubscription.start_date <= target_date,
+        UserSubscription.end_date >= target_date,
+    )
+    query = (
+        select(
+            User.id,
+            User.allergies,
+            User.disliked_foods,
+            User.dietary_preference,
+            User.spice_level,
+        )
+        .where(User.id.in_(active))
+        .order_by(User.id)
+    )
+    if user_ids is not None:
+        query = query.where(User.id.in_(list(user_ids)))
+    return db.execute(query).all()
+
+
+def _lock_slots(db: Session, target_date: date, user_ids: Optional[Sequence[int]]) -> None:
+    """Serialize writers of ``target_date`` assignments until the transaction ends.
+
+    A run for every subscriber takes the date exclusively. A run for some users
+    (the first-week job) shares the date and locks each (date, user). Checking
+    for existing assignments after this sees whatever a concurrent run
+    committed, so the nightly planner and a job never both fill one slot.
+    """
+    day = target_date.toordinal()
+    if user_ids is None:
+        db.execute(LOCK_DATE, {"space": PLANNER_LOCK_SPACE, "day": day})
+        return
+    db.execute(LOCK_DATE_SHARED, {"space": PLANNER_LOCK_SPACE, "day": day})
+    db.execute(LOCK_USERS, {"keys": [day << 32 | user_id for user_id in sorted(set(user_ids))]})
+
+
+def _existing_keys(
+    db: Session, target_date: date, catalog: MealCatalog, user_ids: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """Encoded ``user_id * n_types + type_code`` keys already assigned on ``target_date``."""
+    type_lookup = {meal_type: code for code, meal_type in enumerate(catalog.meal_types)}
+    query = (
+        select(DailyMealAssignment.user_id, Meal.meal_type)
+        .join(Meal, Meal.id == DailyMealAssignment.meal_id)
+        .where(DailyMealAssignment.assignment_date == target_date)
+    )
+    if user_ids is not None:
+        query = query.where(DailyMealAssignment.user_id.in_(user_ids))
+    rows = db.execute(query).all()
+    width = len(catalog.meal_types)
+    return np.array(
+        [user_id * width + type_lookup[meal_type] for user_id, meal_type in rows if meal_type in type_lookup],
+        dtype=np.int64,
+    )
+
+
+def plan_assignments(
+    db: Session,
+    target_date: date,
+    catalog: Optional[MealCatalog] = None,
+    user_ids: Optional[Iterable[int]] = None,
+    dry_run: bool = False,
+    strategy: Optional[str] = None,
+) -> PlanResult:
+    """Create the ``target_date`` assignments for every active subscriber.
+
+    Subscribers that already have an assignment for a meal type on that date are
+    left untouched, so the planner is safe to re-run, also concurrently with
+    itself (see ``_lock_slots``). Eligibility (and, for the
+    rotation, the per-type menus) is worked out once per distinct preference
+    signature and fanned out to the subscribers sharing it.
+    """
+    catalog = catalog if catalog is not None else load_catalog(db)
+    result = PlanResult(target_date=target_date)
+    only = None if user_ids is None else list(user_ids)
+    rows = load_subscribers(db, target_date, only)
+    result.subscribers = len(rows)
+    if not rows or not len(catalog):
+        result.unplannable = len(rows)
+        return result
+
+    subscriber_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    groups = group_by_signature(rows)
+    signature_eligible, result.signature_cache_hits = signature_eligibility(groups, catalog)
+    result.signatures = len(groups)
+    if (strategy or settings.planner_strategy) == "rotate":
+        selections = select_menu_meals(signature_eligible, groups.inverse, subscriber_ids, catalog, target_date)
+    else:
+        eligible = signature_eligible[groups.inverse]
+        selections, result.fit = choose_meals(db, eligible, subscriber_ids, catalog, target_date, strategy)
+
+    width = len(catalog.meal_types)
+    if not dry_run:
+        _lock_slots(db, target_date, None if only is None else subscriber_ids.tolist())
+    existing = _existing_keys(db, target_date, catalog, None if only is None else subscriber_ids.tolist())
+    unplannable = np.zeros(len(rows), dtype=bool)
+    user_columns: List[np.ndarray] = []
+    meal_columns: List[np.ndarray] = []
+    for type_code, positions in selections.items():
+        planned = np.isin(subscriber_ids * width + type_code, existing)
+        missing = positions < 0
+        unplannable |= missing & ~planned
+        keep = ~planned & ~missing
+        result.already_planned += int(planned.sum())
+        result.by_meal_type[catalog.meal_types[type_code]] = int(keep.sum())
+        user_columns.append(subscriber_ids[keep])
+        meal_columns.append(catalog.meal_ids[positions[keep]])
+    result.unplannable = int(unplannable.sum())
+
+    new_users = np.concatenate(user_columns)
+    new_meals = np.concatenate(meal_columns)
+    result.assigned = len(new_users)
+    if dry_run or not result.assigned:
+        return result
+
+    created_at = utcnow()
+    for start in range(0, result.assigned, INSERT_BATCH_SIZE):
+        stop = start + INSERT_BATCH_SIZE
+        db.execute(
+            insert(DailyMealAssignment),
+            [
+                {
+                    "user_id": user_id,
+                    "meal_id": meal_id,
+                    "assignment_date": target_date,
+                    "delivery_status": "PENDING",
+                    "created_at": created_at,
+                }
+                for user_id, meal_id in zip(new_users[start:stop].tolist(), new_meals[start:stop].tolist())
+            ],
+        )
+    response_cache.notify_user_views(db, None if only is None else new_users.tolist())
+    db.commit()
+    if only is None:
+        response_cache.invalidate_all_user_views()
+    else:
+        response_cache.invalidate_user_views(*only)
+    return result
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Generate daily meal assignments for active subscribers.")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today() + timedelta(days=1))
+    parser.add_argument("--days", type=int, default=1, help="Number of consecutive days to plan.")
+    parser.add_argument("--dry-run", action="store_true", help="Compute the plan without writing it.")
+    parser.add_argument("--strategy", choices=PLANNER_STRATEGIES, help="Defaults to PLANNER_STRATEGY.")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        catalog = load_catalog(db)
+        for offset in range(args.days):
+            started = datetime.utcnow()
+            result = plan_assignments(
+                db, args.date + timedelta(days=offset), catalog=catalog, dry_run=args.dry_run, strategy=args.strategy
+            )
+            elapsed = (datetime.utcnow() - started).total_seconds()
+            print(
+                f"{result.target_date}: subscribers={result.subscribers} assigned={result.assigned} "
+                f"already_planned={result.already_planned} unplannable={result.unplannable} "
+                f"by_type={result.by_meal_type} signatures={result.signatures} "
+                f"signature_cache_hits={result.signature_cache_hits} in {elapsed:.2f}s"
+            )
+            if result.fit:
+                print(f"  nutrition fit: {result.fit}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
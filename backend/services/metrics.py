@@ -0,0 +1,176 @@
+"""Incrementally maintained dashboard counters and daily time series.
+
+Write paths call ``record`` inside their own transaction, so a counter moves
+exactly when the row it describes is committed. Each call adds to one of
+``METRIC_SLOTS`` rows per metric, picked at random, so concurrent writers do
+not wait on each other's row lock. The dashboard then sums a few rows from
+``metric_counters`` instead of counting whole tables. ``reconcile``
+recomputes the counters from source tables and ``expire_subscriptions`` closes
+out lapsed subscriptions; run both nightly:
+
+    python -m services.metrics --expire --reconcile
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import BigInteger, cast, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.models import Complaint, DailyMetric, MetricCounter, User, UserSubscription, utcnow
+from utils.settings import get_settings
+
+settings = get_settings()
+
+COUNTERS = ("total_users", "active_subscriptions", "pending_complaints")
+SERIES = (
+    "signups",
+    "deliveries_confirmed",
+    "complaints_opened",
+    "complaints_resolved",
+    "subscriptions_started",
+    "subscriptions_expired",
+)
+
+
+def record(
+    db: Session,
+    counters: Optional[Dict[str, int]] = None,
+    series: Optional[Dict[str, int]] = None,
+    day: Optional[date] = None,
+) -> None:
+    """Add deltas to counters and to today's series within the caller's transaction."""
+    slot = random.randrange(settings.metric_slots)
+    # Rows are locked in name order, so two transactions never wait on each other in a cycle.
+    if counters:
+        statement = insert(MetricCounter).values(
+            [
+                {"name": name, "slot": slot, "value": delta, "updated_at": utcnow()}
+                for name, delta in sorted(counters.items())
+                if delta
+            ]
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[MetricCounter.name, MetricCounter.slot],
+                set_={"value": MetricCounter.value + statement.excluded.value, "updated_at": statement.excluded.updated_at},
+            )
+        )
+    if series:
+        metric_date = day or date.today()
+        statement = insert(DailyMetric).values(
+            [
+                {"metric_date": metric_date, "name": name, "slot": slot, "value": delta}
+                for name, delta in sorted(series.items())
+                if delta
+            ]
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[DailyMetric.metric_date, DailyMetric.name, DailyMetric.slot],
+                set_={"value": DailyMetric.value + statement.excluded.value},
+            )
+        )
+
+
+def recount(db: Session) -> Dict[str, int]:
+    """Count the counters from source tables; read-only, so it also runs on a replica."""
+    return {
+        "total_users": db.scalar(select(func.count(User.id))),
+        "active_subscriptions": db.scalar(
+            select(func.count(UserSubscription.id)).where(UserSubscription.status == "ACTIVE")
+        ),
+        "pending_complaints": db.scalar(select(func.count(Complaint.id)).where(Complaint.status == "OPEN")),
+    }
+
+
+def reconcile(db: Session) -> Dict[str, int]:
+    """Recount the counters from source tables and overwrite the stored values."""
+    values = recount(db)
+    db.execute(delete(MetricCounter).where(MetricCounter.name.in_(list(values))))
+    db.execute(
+        insert(MetricCounter).values(
+            [{"name": name, "slot": 0, "value": value, "updated_at": utcnow()} for name, value in values.items()]
+        )
+    )
+    db.commit()
+    return values
+
+
+def bootstrap(db: Session) -> bool:
+    """Store the counters if any is missing; runs on the primary as part of ``database.schema``."""
+    if all(name in _stored(db) for name in COUNTERS):
+        return False
+    reconcile(db)
+    return True
+
+
+def expire_subscriptions(db: Session, today: Optional[date] = None) -> int:
+    """Mark ACTIVE subscriptions that ended before ``today`` as EXPIRED."""
+    today = today or date.today()
+    expired = db.execute(
+        update(UserSubscription)
+        .where(UserSubscription.status == "ACTIVE", UserSubscription.end_date < today)
+        .values(status="EXPIRED")
+        .returning(UserSubscription.id)
+    ).all()
+    if expired:
+        record(db, counters={"active_subscriptions": -len(expired)}, series={"subscriptions_expired": len(expired)})
+    db.commit()
+    return len(expired)
+
+
+def _stored(db: Session) -> Dict[str, int]:
+    return dict(
+        db.execute(
+            select(MetricCounter.name, cast(func.sum(MetricCounter.value), BigInteger)).group_by(MetricCounter.name)
+        ).all()
+    )
+
+
+def dashboard(db: Session) -> Dict[str, int]:
+    """Current counter values. Never writes, so it can read from a replica; counters
+    not stored yet (before ``bootstrap``) are counted from the source tables."""
+    values = _stored(db)
+    if any(name not in values for name in COUNTERS):
+        values = recount(db)
+    return {name: values[name] for name in COUNTERS}
+
+
+def history(db: Session, days: int) -> List[Dict]:
+    """Daily series for the last ``days`` days, oldest first, with zeros for quiet days."""
+    start = date.today() - timedelta(days=days - 1)
+    rows = db.execute(
+        select(DailyMetric.metric_date, DailyMetric.name, cast(func.sum(DailyMetric.value), BigInteger))
+        .where(DailyMetric.metric_date >= start)
+        .group_by(DailyMetric.metric_date, DailyMetric.name)
+    ).all()
+    by_day = {start + timedelta(days=offset): dict.fromkeys(SERIES, 0) for offset in range(days)}
+    for metric_date, name, value in rows:
+        if metric_date in by_day and name in by_day[metric_date]:
+            by_day[metric_date][name] = value
+    return [{"date": metric_date, **values} for metric_date, values in by_day.items()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain dashboard metrics.")
+    parser.add_argument("--expire", action="store_true", help="Expire subscriptions that ended before today.")
+    parser.add_argument("--reconcile", action="store_true", help="Recount counters from source tables.")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.expire:
+            print(f"expired subscriptions: {expire_subscriptions(db)}")
+        if args.reconcile:
+            print(f"counters: {reconcile(db)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
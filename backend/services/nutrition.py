@@ -0,0 +1,283 @@
+"""Daily calorie/macro targets and nutrition-fitted meal selection.
+
+Targets come from the Mifflin-St Jeor BMR and are computed as column arithmetic
+over every subscriber at once. The BMR is scaled by a fixed activity factor,
+shifted by the user's goal (loss, gain or maintain), and split into protein
+(g per kg of body weight), fat (a share of calories) and carbs (the rest).
+Missing body data falls back to population defaults, and such targets are
+flagged ``estimated``.
+
+``fit_meals`` chooses one meal per meal type so that the day's totals land
+closest to the targets. A per-user search over every combination would be
+``prod(meals per type)`` per user, so the work is batched in two steps:
+
+1. Every eligible meal is scored against a per-slot share of the targets,
+   using two small matrix products over the whole population. Each type is
+   then pruned to its ``top_k`` candidates with ``argpartition``.
+2. The ``top_k ** types`` candidate combinations are enumerated for every
+   user at once, and the best few are kept, rotating by date for variety.
+
+Fit quality is the weighted relative squared error of the day's totals.
+``fit_quality`` turns totals into the audit numbers the admin report shows.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Integer, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database.models import DailyMealAssignment, Meal, User
+from schemas import NutritionFitReport, NutritionFitUser
+
+NUTRIENTS = ("calories", "protein_g", "carbs_g", "fats_g")
+# Relative weight of each nutrient's error in the fit; calories matter most.
+FIT_WEIGHTS = np.array([1.0, 0.6, 0.3, 0.3], dtype=np.float32)
+ACTIVITY_FACTOR = 1.375
+MIN_CALORIES = 1200.0
+DEFAULT_AGE, DEFAULT_HEIGHT_CM, DEFAULT_WEIGHT_KG = 35.0, 170.0, 70.0
+SEX_OFFSET = {"male": 5.0, "m": 5.0, "man": 5.0, "female": -161.0, "f": -161.0, "woman": -161.0}
+UNSPECIFIED_SEX_OFFSET = -78.0  # midpoint of the two published constants
+GOALS = ("maintain", "loss", "gain")
+GOAL_CALORIE_ADJUSTMENT = np.array([0.0, -500.0, 300.0])
+GOAL_PROTEIN_PER_KG = np.array([1.6, 2.0, 2.0])
+GOAL_KEYWORDS = (("loss", ("loss", "lose", "cut", "lean", "fat")), ("gain", ("gain", "muscle", "bulk", "build")))
+FAT_SHARE = 0.30
+MAX_PROTEIN_SHARE = 0.35
+# When a meal lacks macros, assume this split of its calories (protein, carbs, fat).
+FALLBACK_MACRO_SHARES = (0.20, 0.50, 0.30)
+TOP_K = 4
+VARIETY = 3
+FIT_CHUNK_SIZE = 20000
+
+
+def goal_of(text: Optional[str]) -> str:
+    words = (text or "").lower()
+    for goal, keywords in GOAL_KEYWORDS:
+        if any(keyword in words for keyword in keywords):
+            return goal
+    return "maintain"
+
+
+def _map_strings(values: Sequence[Optional[str]], lookup) -> np.ndarray:
+    """Apply ``lookup`` once per distinct string and broadcast the results."""
+    distinct, inverse = np.unique(np.array([value or "" for value in values], dtype=object), return_inverse=True)
+    return np.array([lookup(value) for value in distinct], dtype=np.float64)[inverse]
+
+
+@dataclass
+class Targets:
+    """Daily targets aligned with ``user_ids``; ``daily`` columns follow ``NUTRIENTS``."""
+
+    user_ids: np.ndarray
+    bmr: np.ndarray
+    daily: np.ndarray
+    goals: np.ndarray
+    estimated: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+def compute_targets(rows: Sequence) -> Targets:
+    """Targets for ``(id, age, gender, height_cm, weight_kg, health_goals)`` rows."""
+    count = len(rows)
+    if not count:
+        return Targets(
+            user_ids=np.zeros(0, dtype=np.int64),
+            bmr=np.zeros(0),
+            daily=np.zeros((0, len(NUTRIENTS))),
+            goals=np.zeros(0, dtype=object),
+            estimated=np.zeros(0, dtype=bool),
+        )
+    user_ids, age, gender, height, weight, health_goals = zip(*rows)
+    age, height, weight = (np.array(column, dtype=np.float64) for column in (age, height, weight))
+    sex = _map_strings(gender, lambda value: SEX_OFFSET.get(value.strip().lower(), np.nan))
+    estimated = np.isnan(age) | np.isnan(height) | np.isnan(weight) | np.isnan(sex)
+    age = np.where(np.isnan(age), DEFAULT_AGE, age)
+    height = np.where(np.isnan(height), DEFAULT_HEIGHT_CM, height)
+    weight = np.where(np.isnan(weight), DEFAULT_WEIGHT_KG, weight)
+    sex = np.where(np.isnan(sex), UNSPECIFIED_SEX_OFFSET, sex)
+    goal = _map_strings(health_goals, lambda value: GOALS.index(goal_of(value))).astype(np.int64)
+
+    bmr = 10.0 * weight + 6.25 * height - 5.0 * age + sex
+    calories = np.maximum(bmr * ACTIVITY_FACTOR + GOAL_CALORIE_ADJUSTMENT[goal], MIN_CALORIES)
+    protein = np.minimum(GOAL_PROTEIN_PER_KG[goal] * weight, MAX_PROTEIN_SHARE * calories / 4.0)
+    fats = FAT_SHARE * calories / 9.0
+    carbs = (calories - 4.0 * protein - 9.0 * fats) / 4.0
+    return Targets(
+        user_ids=np.array(user_ids, dtype=np.int64),
+        bmr=bmr,
+        daily=np.column_stack([calories, protein, carbs, fats]),
+        goals=np.array(GOALS, dtype=object)[goal],
+        estimated=estimated,
+    )
+
+
+def load_targets(db: Session, user_ids: Optional[Sequence[int]] = None) -> Targets:
+    query = select(User.id, User.age, User.gender, User.height_cm, User.weight_kg, User.health_goals).order_by(User.id)
+    if user_ids is not None:
+        ids = bindparam("user_ids", [int(user_id) for user_id in user_ids], type_=ARRAY(Integer))
+        query = query.where(User.id == any_(ids))
+    return compute_targets(db.execute(query).all())
+
+
+def meal_nutrients(meals: Sequence) -> np.ndarray:
+    """``(meals, 4)`` float32 matrix in ``NUTRIENTS`` order, filling missing macros from calories."""
+    values = np.array(
+        [[meal.calories, meal.protein_g, meal.carbs_g, meal.fats_g] for meal in meals], dtype=np.float64
+    ).reshape(len(meals), len(NUTRIENTS))
+    calories = values[:, 0]
+    for column, (share, per_gram) in enumerate(zip(FALLBACK_MACRO_SHARES, (4.0, 4.0, 9.0)), start=1):
+        values[:, column] = np.where(np.isnan(values[:, column]), calories * share / per_gram, values[:, column])
+    return values.astype(np.float32)
+
+
+@dataclass
+class FitResult:
+    """Per-user outcome of ``fit_meals``, aligned with the targets' ``user_ids``."""
+
+    selections: Dict[int, np.ndarray]  # type_code -> meal position, -1 when nothing is eligible
+    totals: np.ndarray
+    loss: np.ndarray
+
+
+def fit_loss(totals: np.ndarray, daily: np.ndarray) -> np.ndarray:
+    """Weighted relative squared error of ``totals`` against ``daily`` targets (last axis = nutrients)."""
+    return (((totals / daily) - 1.0) ** 2 * FIT_WEIGHTS).sum(axis=-1)
+
+
+def _slot_candidates(
+    eligible: np.ndarray, nutrients: np.ndarray, slot_targets: np.ndarray, top_k: int
+) -> np.ndarray:
+    """Positions (into ``nutrients``) of each user's ``top_k`` best-scoring eligible meals; -1 pads."""
+    weights = FIT_WEIGHTS[None, :]
+    # sum_j w_j (n_j / t_j - 1)^2 expanded into two matrix products.
+    scores = (weights / slot_targets**2) @ (nutrients**2).T - (2.0 * weights / slot_targets) @ nutrients.T
+    scores[~eligible] = np.inf
+    k = min(top_k, nutrients.shape[0])
+    candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    return np.where(np.isfinite(np.take_along_axis(scores, candidates, axis=1)), candidates, -1)
+
+
+def fit_meals(
+    eligible: np.ndarray,
+    type_codes: np.ndarray,
+    type_count: int,
+    nutrients: np.ndarray,
+    targets: Targets,
+    target_date: date,
+    top_k: int = TOP_K,
+    variety: int = VARIETY,
+) -> FitResult:
+    """Pick one meal per type for every user so the day's totals best fit their targets.
+
+    ``eligible`` is the planner's ``(users, meals)`` matrix, ``type_codes`` the
+    meal type of each catalog column and ``nutrients`` the ``meal_nutrients``
+    matrix. Among the ``variety`` best combinations the pick rotates with the
+    date so consecutive days differ.
+    """
+    users = len(targets)
+    selections = {code: np.full(users, -1, dtype=np.int64) for code in range(type_count)}
+    totals = np.zeros((users, len(NUTRIENTS)), dtype=np.float32)
+    loss = np.full(users, np.inf, dtype=np.float32)
+    columns = [np.flatnonzero(type_codes == code) for code in range(type_count)]
+    active_types = [code for code in range(type_count) if len(columns[code])]
+    if not users or not active_types:
+        return FitResult(selections, totals, loss)
+    k = max(1, min(top_k, max(len(columns[code]) for code in active_types)))
+    grid = np.indices((k,) * len(active_types)).reshape(len(active_types), -1)
+    offsets = targets.user_ids + target_date.toordinal()
+    padded = np.vstack([nutrients, np.zeros((1, len(NUTRIENTS)), dtype=np.float32)])
+
+    for start in range(0, users, FIT_CHUNK_SIZE):
+        stop = min(users, start + FIT_CHUNK_SIZE)
+        rows = np.arange(stop - start)
+        daily = targets.daily[start:stop].astype(np.float32)
+        slot_targets = daily / len(active_types)
+        # Totals are accumulated as ratios to the targets, so the loss needs no division per combination.
+        combo_ratio = np.zeros((stop - start, grid.shape[1], len(NUTRIENTS)), dtype=np.float32)
+        combo_valid = np.ones((stop - start, grid.shape[1]), dtype=bool)
+        anything = np.zeros(stop - start, dtype=bool)
+        candidates = []
+        for slot, code in enumerate(active_types):
+            local = _slot_candidates(eligible[start:stop, columns[code]], nutrients[columns[code]], slot_targets, k)
+            if local.shape[1] < k:
+                local = np.hstack([local, np.full((len(local), k - local.shape[1]), -1)])
+            # A type with no eligible meal is skipped (contributes nothing) rather than sinking the day.
+            nothing = (local < 0).all(axis=1)
+            positions = np.where(local >= 0, columns[code][np.maximum(local, 0)], -1)
+            ratios = padded[np.where(positions >= 0, positions, len(nutrients))] / daily[:, None, :]
+            combo_ratio += ratios[:, grid[slot]]
+            combo_valid &= (positions >= 0)[:, grid[slot]] | nothing[:, None]
+            anything |= ~nothing
+            candidates.append(positions)
+
+        combo_valid &= anything[:, None]
+        combo_loss = np.where(combo_valid, ((combo_ratio - 1.0) ** 2) @ FIT_WEIGHTS, np.inf)
+        keep = min(variety, combo_loss.shape[1])
+        order = np.argpartition(combo_loss, keep - 1, axis=1)[:, :keep]
+        order = np.take_along_axis(order, np.argsort(np.take_along_axis(combo_loss, order, axis=1), axis=1), axis=1)
+        finite = np.isfinite(np.take_along_axis(combo_loss, order, axis=1)).sum(axis=1)
+        best = order[rows, offsets[start:stop] % np.maximum(finite, 1)]
+        for slot, code in enumerate(active_types):
+            picked = candidates[slot][rows, grid[slot][best]]
+            selections[code][start:stop] = picked
+            totals[start:stop] += padded[np.where(picked >= 0, picked, len(nutrients))]
+        loss[start:stop] = combo_loss[rows, best]
+    return FitResult(selections, totals, loss)
+
+
+def fit_quality(totals: np.ndarray, daily: np.ndarray) -> Dict[str, float]:
+    """Audit summary: loss and calorie deviation percentiles over the users given."""
+    if not len(totals):
+        return {"users": 0}
+    loss = fit_loss(totals, daily)
+    calorie_error = np.abs(totals[:, 0] / daily[:, 0] - 1.0)
+    return {
+        "users": int(len(totals)),
+        "mean_loss": round(float(loss.mean()), 4),
+        "median_calorie_error": round(float(np.median(calorie_error)), 4),
+        "p90_calorie_error": round(float(np.percentile(calorie_error, 90)), 4),
+        "within_10_percent": round(float((calorie_error <= 0.10).mean()), 4),
+    }
+
+
+def assigned_totals(db: Session, target_date: date):
+    """``(user_ids, totals)`` of the meals actually assigned on ``target_date``, summed per user."""
+    macro = [
+        func.coalesce(column, Meal.calories * share / per_gram)
+        for column, share, per_gram in zip((Meal.protein_g, Meal.carbs_g, Meal.fats_g), FALLBACK_MACRO_SHARES, (4, 4, 9))
+    ]
+    rows = db.execute(
+        select(DailyMealAssignment.user_id, func.sum(Meal.calories), *(func.sum(value) for value in macro))
+        .join(Meal, Meal.id == DailyMealAssignment.meal_id)
+        .where(DailyMealAssignment.assignment_date == target_date)
+        .group_by(DailyMealAssignment.user_id)
+        .order_by(DailyMealAssignment.user_id)
+    ).all()
+    user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    totals = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(NUTRIENTS))
+    return user_ids, totals
+
+
+def fit_report(db: Session, target_date: date, worst: int = 20) -> NutritionFitReport:
+    """``fit_quality`` of the assignments on ``target_date`` plus the ``worst`` fitting users."""
+    user_ids, totals = assigned_totals(db, target_date)
+    targets = load_targets(db, user_ids.tolist())
+    loss = fit_loss(totals, targets.daily)
+    return NutritionFitReport(
+        date=target_date,
+        **fit_quality(totals, targets.daily),
+        worst=[
+            NutritionFitUser(
+                user_id=int(user_ids[row]),
+                calories=round(float(totals[row, 0]), 1),
+                target_calories=round(float(targets.daily[row, 0]), 1),
+                loss=round(float(loss[row]), 4),
+            )
+            for row in np.argsort(-loss)[:worst]
+        ],
+    )
@@ -0,0 +1,334 @@
+"""Content-based meal recommendations from precomputed feature matrices.
+
+Every active meal is a row of one feature matrix. The first columns are
+fixed: spice level one-hot, the protein/carbs/fat shares of the meal's
+calories, and its calories in thousands. After them comes one column per
+normalized ingredient, dietary tag and ``type:<meal_type>`` term, weighted by
+``1/sqrt(terms)`` so that long ingredient lists do not dominate. The matrix
+follows the meal index. ``sync`` compares the index's entries by identity
+(``upsert`` replaces them) and featurizes only rows that changed.
+
+A user vector lives in the same space. It is built from the profile (diet
+term, spice level, macro needs relative to the default split, calorie
+direction of the goal) plus history. Delivered meals pull towards their
+features and meals the user complained about push away.
+
+Scoring is one matrix product followed by the hard mask (the meal index's
+allergy/dislike/diet/spice filter) and an ``argpartition`` top-k.
+``recommend`` serves one user. ``user_vectors`` / ``top_meals`` /
+``preferred_meals`` do the same for a whole batch, and ``preferred_meals``
+backs the planner's ``preference`` strategy.
+"""
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, any_, bindparam, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database.models import User
+from services import nutrition
+from services.meal_index import (
+    NO_PREFERENCE,
+    SPICE_LEVELS,
+    IndexedMeal,
+    MealIndex,
+    bitmap_ids,
+    get_meal_index,
+    meal_terms,
+    normalize_term,
+    spice_rank,
+)
+
+SPICE_COLUMNS = len(SPICE_LEVELS)
+MACRO_COLUMNS = 4  # protein, carbs and fat shares of calories, then calories / 1000
+FIXED_COLUMNS = SPICE_COLUMNS + MACRO_COLUMNS
+MACRO_ENERGY = np.array([4.0, 4.0, 9.0], dtype=np.float32)
+DEFAULT_SHARES = np.array(nutrition.FALLBACK_MACRO_SHARES, dtype=np.float32)
+
+PREFERENCE_WEIGHT = 1.0
+SPICE_WEIGHT = 0.5
+MACRO_WEIGHT = 2.0
+GOAL_CALORIE_DIRECTION = {"maintain": 0.0, "loss": -0.5, "gain": 0.5}
+HISTORY_DAYS = 90
+DELIVERED_WEIGHT = 1.0
+COMPLAINT_WEIGHT = -3.0
+SCORE_CHUNK_SIZE = 20000
+HISTORY_CHUNK_SIZE = 65536
+PROFILE_COLUMNS = (
+    "id", "dietary_preference", "spice_level", "age", "gender", "height_cm", "weight_kg", "health_goals",
+)
+VARIETY = 3
+
+HISTORY = text(
+    """
+    SELECT a.user_id, a.meal_id,
+           count(*) FILTER (WHERE a.delivery_status = 'DELIVERED') AS delivered,
+           coalesce(sum(c.complaints), 0) AS complaints
+    FROM daily_meal_assignments a
+    -- One row per assignment, so an assignment with several complaints is still one delivery.
+    LEFT JOIN (
+        SELECT assignment_id, count(*) AS complaints
+        FROM complaints
+        WHERE user_id = ANY(:user_ids)
+        GROUP BY assignment_id
+    ) c ON c.assignment_id = a.id
+    WHERE a.user_id = ANY(:user_ids) AND a.assignment_date >= :since AND a.assignment_date <= :today
+    GROUP BY a.user_id, a.meal_id
+    """
+).bindparams(bindparam("user_ids", type_=ARRAY(Integer)))
+
+
+def type_term(meal_type: str) -> str:
+    return "type:" + normalize_term(meal_type)
+
+
+class FeatureMatrix(NamedTuple):
+    """One consistent version of the features; swapped as a whole so readers never see a half update."""
+
+    meal_ids: np.ndarray
+    matrix: np.ndarray
+    vocabulary: Dict[str, int]
+    # CSR form of ``matrix`` (meal rows have few non-zero columns), for history aggregation.
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+
+    @classmethod
+    def build(cls, meal_ids: np.ndarray, matrix: np.ndarray, vocabulary: Dict[str, int]) -> "FeatureMatrix":
+        meal_of, column_of = np.nonzero(matrix)
+        indptr = np.zeros(len(meal_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(meal_of, minlength=len(meal_ids)), out=indptr[1:])
+        return cls(meal_ids, matrix, vocabulary, indptr, column_of, matrix[meal_of, column_of])
+
+    def __len__(self) -> int:
+        return len(self.meal_ids)
+
+    def positions(self, meal_ids: Sequence[int]) -> np.ndarray:
+        """Row of each meal id (``meal_ids`` is sorted), ``-1`` when the meal is not active."""
+        meal_ids = np.asarray(meal_ids, dtype=np.int64)
+        if not len(self.meal_ids):
+            return np.full(len(meal_ids), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self.meal_ids, meal_ids), len(self.meal_ids) - 1)
+        return np.where(self.meal_ids[found] == meal_ids, found, -1)
+
+
+def _featurize(meal: IndexedMeal, vocabulary: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Fixed columns and term columns of one meal, adding unseen terms to ``vocabulary``."""
+    terms = sorted(meal_terms(meal) | {type_term(meal.meal_type)})
+    columns = np.array([vocabulary.setdefault(term, FIXED_COLUMNS + len(vocabulary)) for term in terms])
+    fixed = np.zeros(FIXED_COLUMNS, dtype=np.float32)
+    fixed[spice_rank(meal.spice_level, 0)] = 1.0
+    calories, *macros = nutrition.meal_nutrients([meal])[0]
+    if calories > 0:
+        fixed[SPICE_COLUMNS:SPICE_COLUMNS + 3] = np.asarray(macros) * MACRO_ENERGY / calories
+        fixed[SPICE_COLUMNS + 3] = calories / 1000.0
+    return fixed, columns
+
+
+class MealFeatures:
+    """Row-per-active-meal feature matrix kept in step with a ``MealIndex``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source: Dict[int, IndexedMeal] = {}
+        self.current = FeatureMatrix.build(np.zeros(0, dtype=np.int64), np.zeros((0, FIXED_COLUMNS), dtype=np.float32), {})
+        self.version: Optional[int] = None
+        self.rebuilt_rows = 0
+
+    def sync(self, index: MealIndex) -> FeatureMatrix:
+        """Bring the matrix up to date with ``index``, featurizing only new or changed meals."""
+        if self.version == index.version:
+            return self.current
+        with self._lock:
+            version = index.version
+            meals = index.active_meals()
+            fresh = np.array([self._source.get(meal.id) is not meal for meal in meals], dtype=bool)
+            if fresh.any() or len(meals) != len(self._source):
+                old = self.current
+                vocabulary = dict(old.vocabulary)
+                meal_ids = np.array([meal.id for meal in meals], dtype=np.int64)
+                rows = [_featurize(meals[position], vocabulary) for position in np.flatnonzero(fresh)]
+                matrix = np.zeros((len(meals), FIXED_COLUMNS + len(vocabulary)), dtype=np.float32)
+                matrix[~fresh, : old.matrix.shape[1]] = old.matrix[old.positions(meal_ids[~fresh])]
+                for position, (fixed, columns) in zip(np.flatnonzero(fresh), rows):
+                    matrix[position, :FIXED_COLUMNS] = fixed
+                    matrix[position, columns] = 1.0 / np.sqrt(len(columns))
+                self.current = FeatureMatrix.build(meal_ids, matrix, vocabulary)
+                self._source = {meal.id: meal for meal in meals}
+                self.rebuilt_rows = len(rows)
+            self.version = version
+            return self.current
+
+
+meal_features = MealFeatures()
+
+
+def get_meal_features(db: Session) -> FeatureMatrix:
+    return meal_features.sync(get_meal_index(db))
+
+
+def load_history(db: Session, user_ids: Sequence[int], today: Optional[date] = None) -> np.ndarray:
+    """``(user_id, meal_id, delivered, complaints)`` rows over the last ``HISTORY_DAYS`` days."""
+    today = today or date.today()
+    rows = db.execute(
+        HISTORY,
+        {"user_ids": [int(user_id) for user_id in user_ids], "since": today - timedelta(days=HISTORY_DAYS), "today": today},
+    ).all()
+    return np.array(rows, dtype=np.int64).reshape(len(rows), 4)
+
+
+def _map_strings(values: Sequence[Optional[str]], lookup) -> np.ndarray:
+    """Integer ``lookup`` applied once per distinct string."""
+    distinct, inverse = np.unique(np.array([value or "" for value in values], dtype=object), return_inverse=True)
+    return np.array([lookup(value) for value in distinct], dtype=np.int64)[inverse]
+
+
+def _history_taste(
+    features: FeatureMatrix, rows: np.ndarray, positions: np.ndarray, weights: np.ndarray, count: int
+) -> np.ndarray:
+    """``sum(weight * matrix[position])`` per user row, using the matrix's sparsity.
+
+    Each history entry is expanded to its meal's non-zero columns and summed
+    with one ``bincount`` per block, instead of densifying a users x meals
+    weight matrix.
+    """
+    width = features.matrix.shape[1]
+    per_meal = np.diff(features.indptr)
+    meal_start, column_of, value_of = features.indptr[:-1], features.indices, features.data
+    taste = np.zeros((count, width), dtype=np.float32)
+    for start in range(0, len(rows), HISTORY_CHUNK_SIZE):
+        block = slice(start, start + HISTORY_CHUNK_SIZE)
+        block_rows, block_positions = rows[block], positions[block]
+        repeats = per_meal[block_positions]
+        entry_starts = np.cumsum(repeats) - repeats
+        entries = np.repeat(meal_start[block_positions] - entry_starts, repeats) + np.arange(repeats.sum())
+        first, last = block_rows[0], block_rows[-1] + 1
+        flat = (np.repeat(block_rows, repeats) - first) * width + column_of[entries]
+        summed = np.bincount(flat, weights=np.repeat(weights[block], repeats) * value_of[entries], minlength=(last - first) * width)
+        taste[first:last] += summed.reshape(last - first, width)
+    return taste
+
+
+def user_vectors(features: FeatureMatrix, users: Sequence, history: Sequence) -> np.ndarray:
+    """``(users, columns)`` preference vectors.
+
+    ``users`` are ``PROFILE_COLUMNS`` rows ordered by id; ``history`` is
+    ``load_history`` output (or equivalent rows) for the same users.
+    """
+    count = len(users)
+    vectors = np.zeros((count, features.matrix.shape[1]), dtype=np.float32)
+    if not count:
+        return vectors
+    user_ids = np.array([row[0] for row in users], dtype=np.int64)
+    everyone = np.arange(count)
+    preference_column = _map_strings(
+        [row[1] for row in users],
+        lambda value: -1 if normalize_term(value) in NO_PREFERENCE else features.vocabulary.get(normalize_term(value), -1),
+    )
+    has_preference = preference_column >= 0
+    vectors[everyone[has_preference], preference_column[has_preference]] = PREFERENCE_WEIGHT
+    spice_column = _map_strings([row[2] for row in users], lambda value: spice_rank(value, 0) if value else -1)
+    has_spice = spice_column >= 0
+    vectors[everyone[has_spice], spice_column[has_spice]] = SPICE_WEIGHT
+
+    targets = nutrition.compute_targets([(row[0], *row[3:8]) for row in users])
+    shares = targets.daily[:, 1:] * MACRO_ENERGY / targets.daily[:, :1]
+    vectors[:, SPICE_COLUMNS:SPICE_COLUMNS + 3] = MACRO_WEIGHT * (shares - DEFAULT_SHARES)
+    vectors[:, SPICE_COLUMNS + 3] = [GOAL_CALORIE_DIRECTION[goal] for goal in targets.goals]
+
+    history = np.asarray(history, dtype=np.int64).reshape(-1, 4)
+    if len(history):
+        history_users, meal_ids, delivered, complaints = history.T
+        rows = np.searchsorted(user_ids, history_users)
+        positions = features.positions(meal_ids)
+        known = (positions >= 0) & (rows < count)
+        order = np.argsort(rows[known], kind="stable")
+        rows, positions = rows[known][order], positions[known][order]
+        weights = (DELIVERED_WEIGHT * delivered + COMPLAINT_WEIGHT * complaints)[known][order].astype(np.float32)
+        served = np.bincount(rows, weights=(delivered + complaints)[known], minlength=count)
+        vectors += _history_taste(features, rows, positions, weights / np.maximum(served[rows], 1.0), count)
+    return vectors
+
+
+def top_k(scores: np.ndarray, allowed: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``k`` allowed columns per row, best first; ``-1`` pads rows with fewer allowed."""
+    scores = np.where(allowed, scores, -np.inf)
+    k = min(k, scores.shape[1])
+    if not k:
+        return np.zeros((len(scores), 0), dtype=np.int64), np.zeros((len(scores), 0), dtype=np.float32)
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    return np.where(np.isfinite(best_scores), best, -1), best_scores
+
+
+def top_meals(features: FeatureMatrix, vectors: np.ndarray, allowed: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Batch scoring: ``vectors @ matrix.T`` in chunks, masked by ``allowed`` (users x meals)."""
+    positions = np.full((len(vectors), min(k, len(features))), -1, dtype=np.int64)
+    scores = np.full(positions.shape, -np.inf, dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_CHUNK_SIZE):
+        stop = start + SCORE_CHUNK_SIZE
+        positions[start:stop], scores[start:stop] = top_k(
+            vectors[start:stop] @ features.matrix.T, allowed[start:stop], k
+        )
+    return positions, scores
+
+
+def recommend(db: Session, user, k: int, meal_type: Optional[str] = None) -> List[Tuple[int, float]]:
+    """``(meal_id, score)`` of the ``k`` best safe meals for ``user`` (a profile snapshot)."""
+    index = get_meal_index(db)
+    features = meal_features.sync(index)
+    allowed_ids = bitmap_ids(
+        index.compatible(
+            allergies=user.allergies,
+            disliked_foods=user.disliked_foods,
+            dietary_preference=user.dietary_preference,
+            spice_level=user.spice_level,
+            meal_type=meal_type,
+        )
+    )
+    if not allowed_ids or not len(features):
+        return []
+    allowed = np.isin(features.meal_ids, allowed_ids)
+    profile = tuple(getattr(user, column) for column in PROFILE_COLUMNS)
+    vector = user_vectors(features, [profile], load_history(db, [user.id]))[0]
+    positions, scores = top_k((features.matrix @ vector)[None, :], allowed[None, :], k)
+    return [
+        (int(features.meal_ids[position]), round(float(score), 4))
+        for position, score in zip(positions[0], scores[0])
+        if position >= 0
+    ]
+
+
+def preferred_meals(
+    db: Session, eligible: np.ndarray, user_ids: np.ndarray, catalog, target_date: date
+) -> Dict[int, np.ndarray]:
+    """Planner picks: per meal type, rotate by date among each user's ``VARIETY`` best-scored eligible meals."""
+    features = get_meal_features(db)
+    users = db.execute(
+        select(*(getattr(User, column) for column in PROFILE_COLUMNS))
+        .where(User.id == any_(bindparam("user_ids", user_ids.tolist(), type_=ARRAY(Integer))))
+        .order_by(User.id)
+    ).all()
+    vectors = user_vectors(features, users, load_history(db, user_ids.tolist(), target_date))
+    rows = features.positions(catalog.meal_ids)
+    # Catalog meals the feature matrix has not seen yet score 0.
+    catalog_matrix = np.where((rows >= 0)[:, None], features.matrix[np.maximum(rows, 0)], 0.0)
+    selections: Dict[int, np.ndarray] = {}
+    offsets = user_ids + target_date.toordinal()
+    for type_code in range(len(catalog.meal_types)):
+        columns = np.flatnonzero(catalog.type_codes == type_code)
+        picks = np.full(len(user_ids), -1, dtype=np.int64)
+        for start in range(0, len(user_ids), SCORE_CHUNK_SIZE):
+            stop = start + SCORE_CHUNK_SIZE
+            best, _ = top_k(vectors[start:stop] @ catalog_matrix[columns].T, eligible[start:stop, columns], VARIETY)
+            available = (best >= 0).sum(axis=1)
+            choice = best[np.arange(len(best)), offsets[start:stop] % np.maximum(available, 1)]
+            picks[start:stop] = np.where(choice >= 0, columns[np.maximum(choice, 0)], -1)
+        selections[type_code] = picks
+    return selections
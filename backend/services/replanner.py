@@ -0,0 +1,261 @@
+"""Change-driven re-planning of already scheduled assignments.
+
+The nightly planner only fills empty days, so a profile edit (a new allergy,
+a stricter diet) or a catalog edit (a meal gains an ingredient or is
+deactivated) would leave unsafe meals on the schedule. Regenerating every
+future day would be wasteful. Instead the change is first diffed:
+``constraints_tightened`` / ``meal_tightened`` say whether anything could
+have become ineligible. ``replan`` then loads only the matching PENDING rows
+from today on, checks them against the planner's eligibility matrix and
+swaps out the ones that now fail. Replacements are chosen by the planner's
+strategy for that user and date. Rows that are out for delivery or delivered
+are never touched. All swaps are one ``UPDATE ... FROM unnest`` and the rows
+with no eligible replacement are one ``DELETE``, committed together. A row with
+no replacement that a complaint refers to is kept as ``CANCELLED`` instead.
+``unsafe_pending`` re-checks a scope afterwards; the CLI fails if it finds any.
+"""
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, any_, bindparam, delete, exists, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database.models import Complaint, DailyMealAssignment, Meal, User
+from services import response_cache
+from services.deliveries import CANCELLED
+from services.meal_index import NO_PREFERENCE, IndexedMeal, meal_terms, normalize_term, spice_rank
+from services.meal_planner import (
+    MealCatalog,
+    SubscriberProfiles,
+    choose_meals,
+    eligibility_matrix,
+    load_catalog,
+)
+
+REPLACE = text(
+    """
+    UPDATE daily_meal_assignments AS a
+    SET meal_id = v.meal_id
+    FROM unnest(:ids, :meal_ids) AS v(id, meal_id)
+    WHERE a.id = v.id AND a.delivery_status = 'PENDING'
+    """
+).bindparams(bindparam("ids", type_=ARRAY(Integer)), bindparam("meal_ids", type_=ARRAY(Integer)))
+
+
+def constraints_of(user) -> Tuple:
+    """Normalized allergies, dislikes, dietary preference and spice level of a user."""
+    return (
+        frozenset(normalize_term(term) for term in user.allergies or []) - {""},
+        frozenset(normalize_term(term) for term in user.disliked_foods or []) - {""},
+        normalize_term(user.dietary_preference),
+        user.spice_level,
+    )
+
+
+def constraints_tightened(old: Tuple, new: Tuple) -> bool:
+    """True when ``new`` can rule out a meal that ``old`` allowed."""
+    old_allergies, old_dislikes, old_preference, old_spice = old
+    new_allergies, new_dislikes, new_preference, new_spice = new
+    if new_allergies - old_allergies or new_dislikes - old_dislikes:
+        return True
+    if new_preference != old_preference and new_preference not in NO_PREFERENCE:
+        return True
+    # Unset spice level means no limit, so it ranks above HOT.
+    return spice_rank(new_spice, 3) < spice_rank(old_spice, 3)
+
+
+def meal_tightened(old: IndexedMeal, new: IndexedMeal) -> bool:
+    """True when the edit can make the meal ineligible for someone it was assigned to."""
+    return (
+        not new.is_active
+        or new.meal_type != old.meal_type
+        or meal_terms(new) != meal_terms(old)  # dropped tags matter to diets that require them
+        or (old.is_vegetarian and not new.is_vegetarian)
+        or spice_rank(new.spice_level, 0) > spice_rank(old.spice_level, 0)
+    )
+
+
+@dataclass
+class ReplanResult:
+    checked: int = 0
+    replaced: int = 0
+    removed: int = 0
+    cancelled: int = 0
+    users: Set[int] = field(default_factory=set)
+
+
+def _ids(name: str, values: Iterable[int]):
+    return bindparam(name, [int(value) for value in values], type_=ARRAY(Integer))
+
+
+def _pending(user_ids: Optional[Iterable[int]], meal_ids: Optional[Iterable[int]], start_date: Optional[date]):
+    query = (
+        select(
+            DailyMealAssignment.id,
+            DailyMealAssignment.user_id,
+            DailyMealAssignment.meal_id,
+            DailyMealAssignment.assignment_date,
+            Meal.meal_type,
+        )
+        .join(Meal, Meal.id == DailyMealAssignment.meal_id)
+        .where(
+            DailyMealAssignment.assignment_date >= (start_date or date.today()),
+            DailyMealAssignment.delivery_status == "PENDING",
+        )
+        .order_by(DailyMealAssignment.user_id, DailyMealAssignment.assignment_date)
+    )
+    if user_ids is not None:
+        query = query.where(DailyMealAssignment.user_id == any_(_ids("user_ids", user_ids)))
+    if meal_ids is not None:
+        query = query.where(DailyMealAssignment.meal_id == any_(_ids("meal_ids", meal_ids)))
+    return query
+
+
+def _check(db: Session, rows, row_users: np.ndarray, catalog: MealCatalog):
+    """``(profiles, eligible, user_rows, still_ok)``: whether each row's meal is still eligible for its user."""
+    users = db.execute(
+        select(User.id, User.allergies, User.disliked_foods, User.dietary_preference, User.spice_level)
+        .where(User.id == any_(_ids("user_ids", np.unique(row_users).tolist())))
+        .order_by(User.id)
+    ).all()
+    profiles = SubscriberProfiles.from_rows(users, catalog)
+    eligible = eligibility_matrix(profiles, catalog)
+    user_rows = np.searchsorted(profiles.user_ids, row_users)
+    # Deactivated meals are missing from the catalog and so never eligible.
+    position_of = {meal_id: position for position, meal_id in enumerate(catalog.meal_ids.tolist())}
+    positions = np.array([position_of.get(row.meal_id, -1) for row in rows], dtype=np.int64)
+    in_catalog = positions >= 0
+    still_ok = np.zeros(len(rows), dtype=bool)
+    still_ok[in_catalog] = eligible[user_rows[in_catalog], positions[in_catalog]]
+    return profiles, eligible, user_rows, still_ok
+
+
+def replan(
+    db: Session,
+    user_ids: Optional[Iterable[int]] = None,
+    meal_ids: Optional[Iterable[int]] = None,
+    start_date: Optional[date] = None,
+    catalog: Optional[MealCatalog] = None,
+) -> ReplanResult:
+    """Replace PENDING assignments from ``start_date`` (default today) that are no longer eligible.
+
+    Narrowed to ``user_ids`` and/or ``meal_ids``. Commits, so pending changes
+    in ``db`` (the profile or meal edit that triggered this) land in the same
+    transaction.
+    """
+    result = ReplanResult()
+    rows = db.execute(_pending(user_ids, meal_ids, start_date).with_for_update(of=DailyMealAssignment)).all()
+    result.checked = len(rows)
+    if not rows:
+        db.commit()
+        return result
+
+    catalog = catalog if catalog is not None else load_catalog(db)
+    assignment_ids = np.array([row.id for row in rows], dtype=np.int64)
+    row_users = np.array([row.user_id for row in rows], dtype=np.int64)
+    row_dates = np.array([row.assignment_date.toordinal() for row in rows], dtype=np.int64)
+    type_of = {meal_type: code for code, meal_type in enumerate(catalog.meal_types)}
+    row_types = np.array([type_of.get(row.meal_type, -1) for row in rows], dtype=np.int64)
+    profiles, eligible, user_rows, still_ok = _check(db, rows, row_users, catalog)
+
+    stale = np.flatnonzero(~still_ok)
+    replacements = np.full(len(rows), -1, dtype=np.int64)
+    for ordinal in np.unique(row_dates[stale]):
+        day_rows = stale[row_dates[stale] == ordinal]
+        day_users = np.unique(user_rows[day_rows])
+        selections, _ = choose_meals(
+            db, eligible[day_users], profiles.user_ids[day_users], catalog, date.fromordinal(int(ordinal))
+        )
+        for row in day_rows:
+            if row_types[row] < 0:
+                continue
+            picked = selections[row_types[row]][np.searchsorted(day_users, user_rows[row])]
+            if picked >= 0:
+                replacements[row] = catalog.meal_ids[picked]
+
+    swap = stale[replacements[stale] >= 0]
+    drop = stale[replacements[stale] < 0]
+    if len(swap):
+        db.execute(REPLACE, {"ids": assignment_ids[swap].tolist(), "meal_ids": replacements[swap].tolist()})
+    if len(drop):
+        drop_ids = assignment_ids[drop].tolist()
+        # Nothing safe is left for that slot. An assignment somebody complained about is kept for the
+        # record but cancelled, so it is neither shown nor delivered; the rest are deleted.
+        removed = db.execute(
+            delete(DailyMealAssignment)
+            .where(
+                DailyMealAssignment.id == any_(_ids("drop_ids", drop_ids)),
+                DailyMealAssignment.delivery_status == "PENDING",
+                ~exists().where(Complaint.assignment_id == DailyMealAssignment.id),
+            )
+            .returning(DailyMealAssignment.id),
+            execution_options={"synchronize_session": False},
+        ).scalars().all()
+        cancelled = db.execute(
+            update(DailyMealAssignment)
+            .where(
+                DailyMealAssignment.id == any_(_ids("drop_ids", drop_ids)),
+                DailyMealAssignment.delivery_status == "PENDING",
+            )
+            .values(delivery_status=CANCELLED)
+            .returning(DailyMealAssignment.id),
+            execution_options={"synchronize_session": False},
+        ).scalars().all()
+        result.removed = len(removed)
+        result.cancelled = len(cancelled)
+    result.replaced = len(swap)
+    result.users = set(row_users[stale].tolist())
+    response_cache.notify_user_views(db, result.users)
+    db.commit()
+    return result
+
+
+def unsafe_pending(
+    db: Session,
+    user_ids: Optional[Iterable[int]] = None,
+    meal_ids: Optional[Iterable[int]] = None,
+    start_date: Optional[date] = None,
+    catalog: Optional[MealCatalog] = None,
+) -> List[int]:
+    """Ids of PENDING assignments from ``start_date`` on whose meal is not eligible; empty after ``replan``."""
+    rows = db.execute(_pending(user_ids, meal_ids, start_date)).all()
+    if not rows:
+        return []
+    catalog = catalog if catalog is not None else load_catalog(db)
+    row_users = np.array([row.user_id for row in rows], dtype=np.int64)
+    still_ok = _check(db, rows, row_users, catalog)[3]
+    return [row.id for row, ok in zip(rows, still_ok.tolist()) if not ok]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Re-check scheduled assignments and replace ineligible ones.")
+    parser.add_argument("--users", type=int, nargs="*", help="Only these users.")
+    parser.add_argument("--meals", type=int, nargs="*", help="Only assignments of these meals.")
+    parser.add_argument("--from", dest="start_date", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        result = replan(db, user_ids=args.users, meal_ids=args.meals, start_date=args.start_date)
+        unsafe = unsafe_pending(db, user_ids=args.users, meal_ids=args.meals, start_date=args.start_date)
+    finally:
+        db.close()
+    print(
+        f"checked={result.checked} replaced={result.replaced} removed={result.removed} "
+        f"cancelled={result.cancelled} users={len(result.users)} unsafe={len(unsafe)}"
+    )
+    if unsafe:
+        print(f"FAIL: ineligible assignments are still PENDING: {unsafe[:20]}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
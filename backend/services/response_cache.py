@@ -0,0 +1,158 @@
+"""Cached JSON bodies with strong ETags for read-mostly GET routes.
+
+Public data (the plan list) lives in one shared entry per key. Assignment
+views are cached per user, keyed by view, parameters and the current date.
+Either way a hit skips the query and the Pydantic serialization. A request
+whose ``If-None-Match`` (or, without one, ``If-Modified-Since``) matches gets
+an empty 304.
+
+Writers call ``invalidate_*`` after committing, which clears this process,
+and ``notify_user_views`` inside their transaction, which clears every API
+worker once it commits (see ``utils.invalidation``). Job workers and the
+planner CLIs have no cache, so notifying is all they do. ETags come from the
+body either way, so a stale worker can never hand out a 304 for content the
+client has not seen.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from utils import invalidation
+from utils.cache import TTLCache
+from utils.settings import get_settings
+
+settings = get_settings()
+
+PLANS_KEY = "plans"
+PUBLIC_CACHE_CONTROL = "public, max-age={ttl}"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+VIEWS_TOPIC = "views"
+
+_public = TTLCache(maxsize=64, ttl_seconds=settings.public_cache_ttl_seconds)
+# user_id -> {(view, day): CachedBody}; dropping the user drops every view.
+_per_user = TTLCache(maxsize=settings.response_cache_size, ttl_seconds=settings.response_cache_ttl_seconds)
+# Bumped by every invalidation; a body built across a bump is served but not stored.
+_epoch = 0
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def _build_entry(value: Any) -> CachedBody:
+    body = JSONResponse(jsonable_encoder(value)).body
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return CachedBody(body=body, etag=etag, last_modified=datetime.now(timezone.utc).replace(microsecond=0))
+
+
+def _not_modified(request: Request, entry: CachedBody) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return entry.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(request: Request, entry: CachedBody, cache_control: str) -> Response:
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": format_datetime(entry.last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def _cached(
+    lookup: Callable[[], Optional[CachedBody]],
+    store: Callable[[CachedBody], None],
+    build: Callable[[], Awaitable[Any]],
+) -> CachedBody:
+    entry = lookup()
+    if entry is None:
+        epoch = _epoch
+        entry = _build_entry(await build())
+        if epoch == _epoch:
+            store(entry)
+    return entry
+
+
+async def public_response(request: Request, key: Hashable, build: Callable[[], Awaitable[Any]]) -> Response:
+    """Serve a body shared by every caller, building it with ``build()`` on a miss."""
+    entry = await _cached(lambda: _public.get(key), lambda value: _public.set(key, value), build)
+    return respond(request, entry, PUBLIC_CACHE_CONTROL.format(ttl=settings.public_cache_ttl_seconds))
+
+
+async def user_response(
+    request: Request, user_id: int, view: Hashable, build: Callable[[], Awaitable[Any]]
+) -> Response:
+    """Serve one user's view of date-relative data; the key includes today's date."""
+    key = (view, date.today())
+
+    def lookup() -> Optional[CachedBody]:
+        views = _per_user.get(user_id)
+        return views.get(key) if views else None
+
+    def store(entry: CachedBody) -> None:
+        views = _per_user.get(user_id)
+        if views is None:
+            views = {}
+            _per_user.set(user_id, views)
+        views[key] = entry
+
+    entry = await _cached(lookup, store, build)
+    return respond(request, entry, PRIVATE_CACHE_CONTROL)
+
+
+def _bump() -> None:
+    global _epoch
+    _epoch += 1
+
+
+def invalidate_user_views(*user_ids: int) -> None:
+    """Call after a user's assignments or their delivery status change."""
+    _bump()
+    for user_id in user_ids:
+        _per_user.pop(user_id)
+
+
+def invalidate_all_user_views() -> None:
+    """Call after changes that show up in every user's views (meal edits, planner runs)."""
+    _bump()
+    _per_user.clear()
+
+
+def notify_user_views(db: Session, user_ids: Optional[Iterable[int]] = None) -> None:
+    """Have every API worker drop these users' views (every user's for ``None``) when ``db`` commits."""
+    invalidation.notify(db, VIEWS_TOPIC, user_ids)
+
+
+def _drop_user_views(user_ids: Optional[List[int]]) -> None:
+    if user_ids is None:
+        invalidate_all_user_views()
+    else:
+        invalidate_user_views(*user_ids)
+
+
+invalidation.subscribe(VIEWS_TOPIC, _drop_user_views)
+
+
+def stats() -> Dict[str, Any]:
+    return {"public": _public.stats(), "per_user": _per_user.stats()}
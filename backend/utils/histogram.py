@@ -0,0 +1,33 @@
+"""Fixed-bucket histogram shared by the pool and request metrics."""
+import threading
+from bisect import bisect_left
+from typing import Dict, Sequence, Union
+
+
+class Histogram:
+    """Cumulative ``le`` buckets in the Prometheus style, safe to update from threads."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(sorted(bounds))
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, Union[int, float, Dict[str, int]]]:
+        with self._lock:
+            counts = list(self._counts)
+            total, value_sum = self.count, self.sum
+        buckets, running = {}, 0
+        for bound, count in zip(self.bounds, counts):
+            running += count
+            buckets[f"{bound:g}"] = running
+        buckets["+Inf"] = total
+        return {"count": total, "sum": round(value_sum, 6), "buckets": buckets}
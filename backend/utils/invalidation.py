@@ -0,0 +1,105 @@
+"""Cross-process cache invalidation over Postgres ``LISTEN/NOTIFY``.
+
+Each process keeps its own caches (user snapshots, response bodies, the meal
+index), so a write handled by one worker, a job worker or a CLI has to reach
+every API worker. The writer calls ``notify(db, topic, keys)`` inside its
+transaction: the notice is delivered on commit and dropped on rollback. Every
+API worker runs ``start_listener``, a daemon thread that hands each notice to
+the handlers ``subscribe``d to its topic, with the integer keys or ``None`` for
+"everything".
+
+A listener that (re)connects calls every handler with ``None``, since notices
+sent while it was not listening are lost. Until it is back, the caches' TTLs
+bound staleness.
+"""
+import logging
+import select
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from utils.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+ALL = "*"
+MAX_PAYLOAD_BYTES = 7999  # Postgres rejects NOTIFY payloads of 8000 bytes or more
+LISTEN_HEARTBEAT_SECONDS = 30.0
+LISTEN_RETRY_SECONDS = 5.0
+
+NOTIFY = text("SELECT pg_notify(:channel, :payload)")
+
+Handler = Callable[[Optional[List[int]]], None]
+_handlers: Dict[str, List[Handler]] = {}
+
+
+def subscribe(topic: str, handler: Handler) -> None:
+    """Call ``handler(keys)`` for every notice on ``topic``; ``keys`` is ``None`` for all of them."""
+    _handlers.setdefault(topic, []).append(handler)
+
+
+def notify(db: Session, topic: str, keys: Optional[Iterable[int]] = None) -> None:
+    """Invalidate ``keys`` (everything for ``None``) of ``topic`` in every API worker when ``db`` commits."""
+    body = ALL if keys is None else ",".join(str(key) for key in sorted(set(keys)))
+    if not body:
+        return
+    payload = f"{topic}:{body}"
+    if len(payload) > MAX_PAYLOAD_BYTES:
+        payload = f"{topic}:{ALL}"
+    db.execute(NOTIFY, {"channel": CHANNEL, "payload": payload})
+
+
+def apply(payload: str) -> None:
+    topic, _, body = payload.partition(":")
+    keys = None if body == ALL else [int(key) for key in body.split(",")]
+    for handler in _handlers.get(topic, ()):
+        handler(keys)
+
+
+def _reset() -> None:
+    for handlers in _handlers.values():
+        for handler in handlers:
+            handler(None)
+
+
+def _listen(url: str) -> None:
+    listen_engine = create_engine(url, poolclass=NullPool)
+    while True:
+        try:
+            connection = listen_engine.raw_connection()
+        except Exception:
+            logger.warning("cache invalidation listener cannot connect; retrying", exc_info=True)
+            time.sleep(LISTEN_RETRY_SECONDS)
+            continue
+        try:
+            driver = connection.driver_connection
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+                # Writes committed while nobody was listening went unannounced.
+                _reset()
+                while True:
+                    if select.select([driver], [], [], LISTEN_HEARTBEAT_SECONDS)[0]:
+                        driver.poll()
+                    else:
+                        cursor.execute("SELECT 1")  # notices a dead connection
+                    while driver.notifies:
+                        apply(driver.notifies.pop(0).payload)
+        except Exception:
+            logger.warning("cache invalidation listener lost its connection; reconnecting", exc_info=True)
+            connection.invalidate()
+        finally:
+            connection.close()
+        time.sleep(LISTEN_RETRY_SECONDS)
+
+
+def start_listener() -> None:
+    """Apply other processes' ``notify`` calls to this process's caches, from a daemon thread."""
+    url = settings.cache_listen_url or settings.database_url
+    threading.Thread(target=_listen, args=(url,), name="cache-invalidation-listener", daemon=True).start()
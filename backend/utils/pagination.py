@@ -0,0 +1,89 @@
+"""Keyset (cursor) pagination helpers for list endpoints.
+
+Pages are ordered by a sort column plus the primary key as tiebreaker; the
+cursor is the opaque, URL-safe encoding of the last row's key values, so each
+page is an index range scan instead of an ``OFFSET`` over the whole table.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_value(value: Any, python_type: type) -> Any:
+    if value is None:
+        return value
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(value)
+    # ``isinstance(True, int)`` holds, so a bool must not pass for an integer key.
+    if not isinstance(value, python_type) or (isinstance(value, bool) and python_type is not bool):
+        raise ValueError("cursor value type mismatch")
+    return value
+
+
+def decode_cursor(cursor: str, columns: Sequence[ColumnElement]) -> List[Any]:
+    """Decode ``cursor`` back into typed values for ``columns``."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor shape mismatch")
+        return [_decode_value(value, column.type.python_type) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, NotImplementedError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exc
+
+
+def parse_sort(sort: str) -> Tuple[str, bool]:
+    """Split ``"-created_at"`` into ``("created_at", True)``."""
+    return sort.lstrip("-"), sort.startswith("-")
+
+
+def keyset_page(
+    query: Select,
+    columns: Sequence[ColumnElement],
+    descending: bool,
+    cursor: Optional[str],
+    limit: int,
+) -> Select:
+    """Restrict ``query`` to the page after ``cursor`` ordered by ``columns``.
+
+    One extra row is fetched so ``finish_page`` can tell whether another page exists.
+    """
+    key = tuple_(*columns)
+    if cursor:
+        values = tuple_(*decode_cursor(cursor, columns))
+        query = query.where(key < values if descending else key > values)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def finish_page(rows: List[Any], columns: Sequence[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim the look-ahead row and return ``(rows, next_cursor)``."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], name) for name in columns])
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,59 @@
+"""Connection-pool checkout timing and a JSON view of pool state.
+
+``TimedQueuePool``/``TimedAsyncQueuePool`` behave exactly like SQLAlchemy's
+queue pools but record how long each checkout waited (for a free connection or
+for a new one to open) and how many gave up with ``pool_timeout``.
+"""
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from utils.histogram import Histogram
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class _TimedCheckout:
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_seconds.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout_seconds=pool.timeout(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(0, pool.overflow()),
+        )
+    if isinstance(pool, _TimedCheckout):
+        status["timeouts"] = pool.timeouts
+        status["wait_seconds"] = pool.wait_seconds.snapshot()
+    return status
@@ -0,0 +1,73 @@
+"""Count SQL statements issued inside a scope, via SQLAlchemy cursor events.
+
+``install(engine)`` registers the listeners once per engine; ``count_queries``
+then collects every statement executed in the current context (including work
+handed to the threadpool or to ``AsyncSession.run_sync``). Scopes nest: the
+per-request metrics scope and e.g. a test's ``assert_max_queries`` both see
+every statement.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_current: ContextVar[Tuple["QueryStats", ...]] = ContextVar("query_stats", default=())
+_installed = set()
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+    statements: List[str] = field(default_factory=list)
+    record_statements: bool = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get():
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scopes = _current.get()
+    if not scopes:
+        return
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    for stats in scopes:
+        stats.count += 1
+        stats.duration += elapsed
+        if stats.record_statements:
+            stats.statements.append(statement)
+
+
+def install(engine: Engine) -> None:
+    """Attach the counting listeners to ``engine`` (idempotent)."""
+    if id(engine) in _installed:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _installed.add(id(engine))
+
+
+@contextmanager
+def count_queries(record_statements: bool = False) -> Iterator[QueryStats]:
+    stats = QueryStats(record_statements=record_statements)
+    token = _current.set(_current.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "block") -> Iterator[QueryStats]:
+    """Fail when the wrapped block issues more than ``limit`` statements."""
+    with count_queries(record_statements=True) as stats:
+        yield stats
+    if stats.count > limit:
+        listing = "\n".join(f"  {index + 1}. {sql}" for index, sql in enumerate(stats.statements))
+        raise AssertionError(f"{label} issued {stats.count} queries (budget {limit}):\n{listing}")
@@ -4,10 +4,10 @@ from typing import Dict
 from fastapi import Depends
 
 from auth.jwt_handler import require_admin
-from database.models import User
+from schemas import UserResponse
 
 
-def admin_required(current_user: User = Depends(require_admin)) -> User:
+def admin_required(current_user: UserResponse = Depends(require_admin)) -> UserResponse:
     """Dependency alias for admin-protected routes."""
     return current_user
 
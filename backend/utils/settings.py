@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -7,16 +7,53 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     database_url: str = Field(..., alias="DATABASE_URL")
+    database_mode: Literal["sync", "async"] = Field("sync", alias="DATABASE_MODE")
+    database_replica_urls: str = Field("", alias="DATABASE_REPLICA_URLS")
+    replica_pin_seconds: float = Field(5.0, alias="REPLICA_PIN_SECONDS")
+    db_pool: Literal["queue", "null"] = Field("queue", alias="DB_POOL")
+    db_pool_size: int = Field(5, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout_seconds: float = Field(30.0, alias="DB_POOL_TIMEOUT_SECONDS")
+    db_pool_pre_ping: bool = Field(False, alias="DB_POOL_PRE_PING")
+    db_pool_recycle_seconds: int = Field(-1, alias="DB_POOL_RECYCLE_SECONDS")
+    db_pgbouncer: bool = Field(False, alias="DB_PGBOUNCER")
+    auto_migrate: bool = Field(False, alias="AUTO_MIGRATE")
+    startup_tasks: bool = Field(True, alias="STARTUP_TASKS")
     jwt_secret_key: str = Field(..., alias="JWT_SECRET_KEY")
     jwt_algorithm: str = Field("HS256", alias="JWT_ALGORITHM")
     jwt_expiration_minutes: int = Field(30, alias="JWT_EXPIRATION_MINUTES")
+    auth_cache_size: int = Field(10000, alias="AUTH_CACHE_SIZE")
+    user_cache_ttl_seconds: int = Field(60, alias="USER_CACHE_TTL_SECONDS")
+    response_cache_size: int = Field(10000, alias="RESPONSE_CACHE_SIZE")
+    response_cache_ttl_seconds: int = Field(30, alias="RESPONSE_CACHE_TTL_SECONDS")
+    cache_listen_url: Optional[str] = Field(None, alias="CACHE_LISTEN_URL")
+    public_cache_ttl_seconds: int = Field(300, alias="PUBLIC_CACHE_TTL_SECONDS")
     google_client_id: str = Field(..., alias="GOOGLE_CLIENT_ID")
     google_client_secret: str = Field(..., alias="GOOGLE_CLIENT_SECRET")
+    google_token_verification: Literal["local", "tokeninfo"] = Field("local", alias="GOOGLE_TOKEN_VERIFICATION")
+    google_jwks_url: str = Field("https://www.googleapis.com/oauth2/v3/certs", alias="GOOGLE_JWKS_URL")
+    google_jwks_file: Optional[str] = Field(None, alias="GOOGLE_JWKS_FILE")
     app_host: str = Field("0.0.0.0", alias="APP_HOST")
     app_port: int = Field(8000, alias="APP_PORT")
+    web_workers: int = Field(0, alias="WEB_WORKERS")
+    graceful_timeout_seconds: int = Field(30, alias="GRACEFUL_TIMEOUT_SECONDS")
+    keepalive_seconds: int = Field(5, alias="KEEPALIVE_SECONDS")
     environment: Literal["development", "staging", "production"] = Field(
         "development", alias="ENVIRONMENT"
     )
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    metric_slots: int = Field(16, alias="METRIC_SLOTS")
+    meal_index_refresh_seconds: int = Field(300, alias="MEAL_INDEX_REFRESH_SECONDS")
+    planner_strategy: Literal["rotate", "nutrition", "preference"] = Field("rotate", alias="PLANNER_STRATEGY")
+    signature_cache_size: int = Field(50000, alias="SIGNATURE_CACHE_SIZE")
+    job_workers: int = Field(2, alias="JOB_WORKERS")
+    job_batch_size: int = Field(20, alias="JOB_BATCH_SIZE")
+    job_poll_seconds: float = Field(1.0, alias="JOB_POLL_SECONDS")
+    job_visibility_timeout_seconds: int = Field(300, alias="JOB_VISIBILITY_TIMEOUT_SECONDS")
+    job_max_attempts: int = Field(5, alias="JOB_MAX_ATTEMPTS")
+    job_retry_base_seconds: float = Field(5.0, alias="JOB_RETRY_BASE_SECONDS")
+    job_retry_max_seconds: float = Field(3600.0, alias="JOB_RETRY_MAX_SECONDS")
+    idempotency_ttl_seconds: int = Field(86400, alias="IDEMPOTENCY_TTL_SECONDS")
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
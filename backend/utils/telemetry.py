@@ -0,0 +1,280 @@
+"""In-process request telemetry rendered in the Prometheus text format.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no ``BaseHTTPMiddleware``
+task hop) that records, per route template, a latency histogram, response
+counts by status, and the SQL statements/time the request issued (through the
+``utils/query_counter`` cursor hooks). ``render()`` adds the in-flight gauge and
+the connection-pool state.
+
+The registry is per process, like the pools. Behind ``serve.py``'s pre-forked
+workers a scrape lands on one random worker, so ``serve.py`` calls
+``enable_multiprocess`` with a fresh directory before forking. Each worker then
+writes its ``snapshot()`` there every ``WRITE_SECONDS`` and ``render()`` sums
+every worker's file. Files of exited workers are kept so counters never go
+backwards; their gauges are dropped. Other workers' values lag by up to
+``WRITE_SECONDS``. Any other multi-worker launcher (``uvicorn --workers``)
+gets per-worker numbers, so scrape a single-worker deployment there.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+from utils import query_counter
+from utils.histogram import Histogram
+from utils.pool_stats import pool_status
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"
+WRITE_SECONDS = 1.0
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "statuses", "db_statements", "db_seconds")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+        self.db_statements = 0
+        self.db_seconds = 0.0
+
+
+class Registry:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        key = (method, path)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes.setdefault(key, RouteMetrics())
+        return metrics
+
+    def clear(self) -> None:
+        self.routes.clear()
+        self.in_flight = 0
+
+
+registry = Registry()
+# Shared by every worker of one server; set by ``enable_multiprocess`` before the fork.
+_directory: Optional[Path] = None
+# A file is only ever replaced by a later snapshot, so each worker's share never shrinks.
+_write_lock = threading.Lock()
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            with query_counter.count_queries() as queries:
+                await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.in_flight -= 1
+            route = scope.get("route")
+            metrics = registry.route(scope["method"], getattr(route, "path", UNMATCHED_ROUTE))
+            metrics.latency.observe(elapsed)
+            metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+            metrics.db_statements += queries.count
+            metrics.db_seconds += queries.duration
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _header(lines: List[str], name: str, kind: str, text: str) -> None:
+    lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _histogram(lines: List[str], name: str, snapshot: Dict[str, Any], **labels: Any) -> None:
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+
+
+def _add_histograms(total: Optional[Dict[str, Any]], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    if total is None:
+        return {"count": snapshot["count"], "sum": snapshot["sum"], "buckets": dict(snapshot["buckets"])}
+    total["count"] += snapshot["count"]
+    total["sum"] = round(total["sum"] + snapshot["sum"], 6)
+    for bound, count in snapshot["buckets"].items():
+        total["buckets"][bound] = total["buckets"].get(bound, 0) + count
+    return total
+
+
+def snapshot(engines: Iterable[Tuple[str, Engine]] = ()) -> Dict[str, Any]:
+    """This process's metrics as plain JSON-ready data."""
+    routes = [
+        {
+            "method": method,
+            "route": path,
+            "statuses": {str(status_code): count for status_code, count in metrics.statuses.items()},
+            "latency": metrics.latency.snapshot(),
+            "db_statements": metrics.db_statements,
+            "db_seconds": metrics.db_seconds,
+        }
+        for (method, path), metrics in list(registry.routes.items())
+    ]
+    pools = {}
+    for name, engine in engines:
+        status = pool_status(engine)
+        pools[name] = {key: status[key] for key in ("checked_out", "wait_seconds") if key in status}
+    return {"pid": os.getpid(), "routes": routes, "in_flight": registry.in_flight, "pools": pools}
+
+
+def enable_multiprocess(directory: str) -> None:
+    """Aggregate ``render()`` over every process writing to ``directory``; call before forking."""
+    global _directory
+    _directory = Path(directory)
+
+
+def write_snapshot(engines: Iterable[Tuple[str, Engine]] = ()) -> None:
+    if _directory is None:
+        return
+    path = _directory / f"{os.getpid()}.json"
+    partial = path.with_suffix(".tmp")
+    with _write_lock:
+        try:
+            partial.write_text(json.dumps(snapshot(engines)))
+            partial.replace(path)
+        except FileNotFoundError:
+            pass  # serve.py removed the directory on shutdown
+
+
+def start_writer(engines: Callable[[], Iterable[Tuple[str, Engine]]]) -> None:
+    """Publish this worker's snapshot every ``WRITE_SECONDS`` and at exit; no-op unless multiprocess."""
+    if _directory is None:
+        return
+
+    def loop() -> None:
+        while True:
+            write_snapshot(engines())
+            time.sleep(WRITE_SECONDS)
+
+    threading.Thread(target=loop, name="metrics-writer", daemon=True).start()
+    atexit.register(lambda: write_snapshot(engines()))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshots(engines: Iterable[Tuple[str, Engine]]) -> List[Dict[str, Any]]:
+    """The last snapshot written by every worker, this one's refreshed first.
+
+    This process is read back from its file rather than live: mixing one live
+    value with other workers' older files could sum lower than a previous
+    scrape served by another worker.
+    """
+    if _directory is None:
+        return [snapshot(engines)]
+    write_snapshot(engines)
+    snapshots = []
+    for path in _directory.glob("*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum counters and histograms over all snapshots, gauges over live processes only."""
+    routes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    pools: Dict[str, Dict[str, Any]] = {}
+    in_flight = 0
+    own_pid = os.getpid()
+    for data in snapshots:
+        live = data["pid"] == own_pid or _alive(data["pid"])
+        for entry in data["routes"]:
+            merged = routes.setdefault(
+                (entry["method"], entry["route"]),
+                {"statuses": {}, "latency": None, "db_statements": 0, "db_seconds": 0.0},
+            )
+            for status_code, count in entry["statuses"].items():
+                merged["statuses"][int(status_code)] = merged["statuses"].get(int(status_code), 0) + count
+            merged["latency"] = _add_histograms(merged["latency"], entry["latency"])
+            merged["db_statements"] += entry["db_statements"]
+            merged["db_seconds"] += entry["db_seconds"]
+        if live:
+            in_flight += data["in_flight"]
+        for name, status in data["pools"].items():
+            merged = pools.setdefault(name, {})
+            if "checked_out" in status and live:
+                merged["checked_out"] = merged.get("checked_out", 0) + status["checked_out"]
+            if "wait_seconds" in status:
+                merged["wait_seconds"] = _add_histograms(merged.get("wait_seconds"), status["wait_seconds"])
+    return {"routes": routes, "in_flight": in_flight, "pools": pools}
+
+
+def render(engines: Iterable[Tuple[str, Engine]] = ()) -> str:
+    lines: List[str] = []
+    merged = _merge(_snapshots(engines))
+    routes = sorted(merged["routes"].items())
+
+    _header(lines, "http_requests_total", "counter", "Responses by route template and status code.")
+    for (method, path), metrics in routes:
+        for status_code, count in sorted(metrics["statuses"].items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=path, status=status_code)} {count}")
+
+    _header(lines, "http_request_duration_seconds", "histogram", "Request latency by route template.")
+    for (method, path), metrics in routes:
+        _histogram(lines, "http_request_duration_seconds", metrics["latency"], method=method, route=path)
+
+    _header(lines, "http_requests_in_flight", "gauge", "Requests currently being served.")
+    lines.append(f"http_requests_in_flight {merged['in_flight']}")
+
+    _header(lines, "db_statements_total", "counter", "SQL statements issued while serving each route.")
+    for (method, path), metrics in routes:
+        lines.append(f"db_statements_total{_labels(method=method, route=path)} {metrics['db_statements']}")
+
+    _header(lines, "db_statement_seconds_total", "counter", "Time spent executing SQL while serving each route.")
+    for (method, path), metrics in routes:
+        seconds = round(metrics["db_seconds"], 6)
+        lines.append(f"db_statement_seconds_total{_labels(method=method, route=path)} {seconds}")
+
+    pools = sorted(merged["pools"].items())
+    _header(lines, "db_pool_checked_out", "gauge", "Connections currently checked out of the pool.")
+    for name, status in pools:
+        if "checked_out" in status:
+            lines.append(f"db_pool_checked_out{_labels(engine=name)} {status['checked_out']}")
+    _header(lines, "db_pool_checkout_wait_seconds", "histogram", "Time spent waiting for a pooled connection.")
+    for name, status in pools:
+        if "wait_seconds" in status:
+            _histogram(lines, "db_pool_checkout_wait_seconds", status["wait_seconds"], engine=name)
+    return "\n".join(lines) + "\n"